@@ -0,0 +1,253 @@
+#! /usr/bin/env python3
+# asyncTracker.py - Runs the whole tracker on a single asyncio event loop.
+
+import asyncio, contextvars, datetime, functools, time
+from concurrent.futures import ThreadPoolExecutor
+from gameTracker import GameTracker, MAX_LIVE_GAMES, MAX_GAME_LENGTH
+from gameFeed import GameFeedError, GameFeedEnded, HTTP_CONNECTIONS
+from pollScheduler import PollScheduler
+from pollHandler import PollHandler
+from browserPool import POOL_SIZE
+from metrics import metrics, setGame
+
+class AsyncGameTracker(GameTracker):
+    """
+    Tracks every game of a set of teams on one event loop. Loading the
+    schedule, waiting for games to start, polling each live game and sending
+    texts are all coroutines, so a game between polls costs a timer instead of
+    a thread. The calls that still block run on two bounded executors: one for
+    requests made over the shared session, and one the size of the browser
+    pool for Selenium, so a slow page never holds up the stats api games.
+    """
+
+    def __init__(self, teams, makeFeed, registry, textEvent, notifications,
+                 maxLiveGames=MAX_LIVE_GAMES, httpWorkers=HTTP_CONNECTIONS,
+                 browserWorkers=POOL_SIZE, scheduleCache=None, checkpoints=None, eventStore=None,
+                 alerts=None, scoreboard=None, coordinator=None, daemon=False):
+        """
+        param teams: the teams to track, see resolveTeams().
+        param makeFeed: callable that returns a new GameFeed for each game.
+        param registry: the SubscriptionRegistry of who to text.
+        param textEvent: callable taking (event, notifications, recipients,
+        delivery) that queues the texts about an event, see baseballUpdates.textEvent().
+        param notifications: the AsyncNotificationQueue texts are sent through.
+        param maxLiveGames: the most games that are followed at the same time.
+        param httpWorkers: threads making requests, at most the connections
+        of the shared session.
+        param browserWorkers: threads driving browsers, the BrowserPool size.
+        param scheduleCache: the ScheduleCache schedules are read through.
+        param checkpoints: the CheckpointStore handled events are saved to and
+        games are resumed from, nothing is saved if None.
+        param eventStore: the EventStore every event is kept in, nothing is kept if None.
+        param alerts: the AlertEngine situations are checked with, none are if None.
+        param scoreboard: the Scoreboard every poll is published to, nothing is if None.
+        param coordinator: the Coordinator that shares the games with other
+        workers, every game is followed here if None.
+        param daemon: True to keep running when there are no games left.
+        """
+        super().__init__(teams, None, makeFeed, maxLiveGames, scheduleCache, coordinator, daemon)
+        self.registry = registry
+        self.notifications = notifications
+        self.handler = PollHandler(registry, textEvent, notifications, checkpoints, eventStore,
+                                   alerts, scoreboard, self.submitCheckpoint)
+        self.httpExecutor = ThreadPoolExecutor(httpWorkers, thread_name_prefix='http')
+        self.browserExecutor = ThreadPoolExecutor(browserWorkers, thread_name_prefix='browser')
+        # One thread, so the checkpoint writes are made in order and never on the loop.
+        self.checkpointExecutor = ThreadPoolExecutor(1, thread_name_prefix='checkpoint')
+        self.liveSlots = None # Semaphore of maxLiveGames, made on the loop.
+        self.loop = None
+
+    def scheduleChanged(self):
+        # Called from other threads too, e.g. the control api's, and the
+        # event belongs to the loop.
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.changed.set)
+
+    def executorFor(self, feed):
+        """
+        This function picks the executor the blocking calls of a feed run on.
+        A game is opened on the http executor since the stats api is tried
+        first, once it is open browser feeds are polled on their own executor.
+        param feed: an opened GameFeed.
+        return: a ThreadPoolExecutor.
+        """
+        return self.browserExecutor if feed.kind == 'page' else self.httpExecutor
+
+    def submitCheckpoint(self, function, *args):
+        """
+        This function makes a checkpoint write on the checkpoint executor
+        without waiting for it, e.g. from a text's delivery on the loop.
+        param function: the CheckpointStore method.
+        param args: its arguments.
+        """
+        def reportFailure(future):
+            if future.exception() is not None:
+                print('Could not checkpoint: ' + repr(future.exception()))
+        future = self.checkpointExecutor.submit(contextvars.copy_context().run, function, *args)
+        future.add_done_callback(reportFailure)
+
+    async def call(self, executor, function, *args):
+        # Runs in a copy of the task's context, so metrics recorded on the
+        # executor are labelled with the task's game.
+        call = functools.partial(contextvars.copy_context().run, function, *args)
+        return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+    async def pollGame(self, team, startTime, feed, scheduler, gameId=None) -> str:
+        """
+        This function follows a single game until it is over, the coroutine
+        version of baseballUpdates.trackGame().
+        param team: the team whose game is followed.
+        param startTime: the time the game starts, timezone aware.
+        param feed: the GameFeed object the game is read from.
+        param scheduler: the PollScheduler that paces the polls.
+        param gameId: the id of the game on the schedule.
+        return: 'POSTPONED' if the game was postponed, 'FINAL' otherwise.
+        """
+        executor = self.httpExecutor
+        game = None
+        try:
+            with metrics.timer('open'):
+                if not await self.call(executor, feed.open, team, startTime):
+                    return 'POSTPONED'
+            executor = self.executorFor(feed)
+            with metrics.timer('fetch'):
+                state = await self.call(executor, feed.fetch)
+            delay = scheduler.succeeded(state)
+
+            # Two tracked teams playing each other share the same game, only follow it once.
+            if not self.claimGame(state.homeTeam, state.awayTeam, startTime):
+                return 'FINAL'
+
+            game = await self.call(self.checkpointExecutor, self.handler.start, team, startTime, state,
+                                   scheduler, gameId)
+            if game is None:
+                return 'FINAL'
+            totalTime = 0
+            while totalTime < MAX_GAME_LENGTH:
+                status = self.handler.handle(game, state)
+                if status is not None:
+                    return status
+                await asyncio.sleep(delay)
+                try:
+                    with metrics.timer('fetch'):
+                        state = await self.call(executor, feed.fetch)
+                    delay = scheduler.succeeded(state)
+                except GameFeedEnded:
+                    break
+                except GameFeedError as exc:
+                    metrics.increment('tracker_poll_errors_total')
+                    delay = scheduler.failed(exc.retryAfter)
+                totalTime = (datetime.datetime.now(startTime.tzinfo) - startTime).total_seconds()
+        finally:
+            await self.call(executor, feed.close)
+            self.handler.stop(game)
+        return 'FINAL'
+
+    async def followGame(self, team, game):
+        """
+        This function follows one game as a task on the event loop.
+        param team: the team whose page is used to follow the game.
+        param game: the ScheduledGame to follow.
+        """
+        setGame(game.gameId) # Only for this task, every task runs in its own context.
+        scheduler = PollScheduler()
+        with self.lock:
+            self.schedulers[game.gameId] = (team, scheduler)
+        self.schedule.setStatus(game.gameId, 'LIVE')
+        status = None
+        try:
+            async with self.liveSlots:
+                status = await self.pollGame(team, game.startTime, self.newFeed(game), scheduler, game.gameId)
+        except Exception as exc:
+            # One broken game should not stop the other games from being followed.
+            print('Stopped tracking ' + team + ' game: ' + repr(exc))
+        finally:
+            with self.lock:
+                self.schedulers.pop(game.gameId, None)
+            # The coordinator's calls wait on SQLite, never on the loop.
+            await self.call(self.httpExecutor, self.gameStopped, game, status)
+
+    async def sleep(self, seconds, follow):
+        """
+        This function is the coroutine version of GameTracker.wait().
+        """
+        deadline = time.monotonic() + seconds
+        while True:
+            if self.coordinator is not None:
+                await self.call(self.httpExecutor, self.takeOver, follow)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if self.coordinator is not None:
+                remaining = min(remaining, self.coordinator.ttl / 3)
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                continue
+            self.changed.clear()
+            return
+
+    async def startGames(self):
+        """
+        This function sleeps until the earliest game on the schedule starts
+        and starts a task following it, until there are no games left (never
+        for a daemon), then waits for the tasks to finish.
+        """
+        started = set() # Ids of the games a task was started for.
+        following = set()
+        def startTask(team, game):
+            task = asyncio.create_task(self.followGame(team, game))
+            following.add(task)
+            task.add_done_callback(following.discard)
+        def follow(team, game):
+            # Called from the executor startGame() and takeOver() run on, since
+            # they wait on the coordinator's database. The task starts on the loop
+            # before the call returns.
+            self.loop.call_soon_threadsafe(startTask, team, game)
+
+        while True:
+            if self.reloadDue():
+                await self.call(self.httpExecutor, self.reload)
+            game, timeUntilStart = self.nextStart(started)
+            if timeUntilStart is None:
+                break
+            if game is None or timeUntilStart > 0:
+                if game is not None:
+                    print('Sleeping until next game starts...' + str(timeUntilStart))
+                await self.sleep(max(timeUntilStart, 0), follow)
+                continue # Games may have been added or removed while sleeping.
+
+            started.add(game.gameId)
+            await self.call(self.httpExecutor, self.startGame, game, follow)
+
+        # Games other workers are following are watched until they are over.
+        while self.waiting:
+            await self.sleep(self.coordinator.ttl, follow)
+        if following:
+            await asyncio.wait(following)
+
+    async def main(self):
+        """
+        This function loads the schedule, follows every game and sends the
+        last texts before returning.
+        """
+        self.liveSlots = asyncio.Semaphore(self.maxWorkers)
+        self.changed = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        delivery = asyncio.create_task(self.notifications.deliver())
+        try:
+            if not len(self.schedule):
+                await self.call(self.httpExecutor, self.buildSlate)
+            await self.startGames()
+        finally:
+            self.notifications.close() # Sends what is left before returning.
+            await delivery
+            self.httpExecutor.shutdown()
+            self.browserExecutor.shutdown()
+            self.checkpointExecutor.shutdown() # After the last texts, so their deliveries are recorded.
+
+    def run(self):
+        """
+        This function runs the tracker until there are no games left.
+        """
+        asyncio.run(self.main())
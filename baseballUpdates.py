@@ -1,270 +1,31 @@
 #! /usr/bin/env python3 
 # baseballUpdates.py - Texts my phone live updates on the padres baseball game.
 
-import threading, time, re, datetime, chromedriver_binary
-from textMyself import textmyself
-from getSchedule import getSchedule
-from teamSchedules import teamSchedule
-from teamPages import teamPage
-from selenium import webdriver
-from selenium.webdriver.common.by import By 
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
-from selenium.common.exceptions import StaleElementReferenceException
-from selenium.common.exceptions import WebDriverException
-
-# TimeoutException thrown by 'presence_of_element_located' if there is no element.
-# StaleElementReferenceException thrown if the page refreshes between 
-# getting the element and 'get_attribute'.
-# WebDriverException thrown if the page reaches an error (not loadable).
-
-def launchBrowser(url):
-    """
-    This functions launches Chrome using selenium webdriver with the provided url.
-    param url: the url to the team's homepage on mlb.com/[team]. 
-    return: a WebDriver object.
-    """
-    browser = webdriver.Chrome()
-    browser.implicitly_wait(30)
-    browser.get(url)
-    browser.maximize_window()
-    return browser
-
-def retryFindClick(browser, selector):
-    """
-    This function handles the StaleElementException.
-    Attempts to locate the element by its css selector and click it.
-    param browser: WebDriver object.
-    param selector: css selector used to find the element on the website page.
-    """
-    maxAttempts = 3
-    attempts = 0
-    while attempts < maxAttempts:
-        try:
-            wait = WebDriverWait(browser, 10)
-            elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-            elem.click()
-            return
-        except TimeoutException:
-            browser.close()
-        except StaleElementReferenceException:
-            pass
-        attempts += 1
-
-def retryFindInterceptedClick(browser, selector):
-    """
-    This function handles the StaleElementException.
-    Attempts to locate the element by its css selector and click it.
-    Used for elements that are not clickable because they are obscured by another element.
-    param browser: WebDriver object.
-    param selector: css selector used to find the obscured element on the 
-    website page.
-    """
-    maxAttempts = 3
-    attempts = 0
-    while attempts < maxAttempts:
-        try:
-            wait = WebDriverWait(browser, 10)
-            elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-            webdriver.ActionChains(browser).move_to_element(elem).click(elem).perform()
-            return
-        except TimeoutException:
-            browser.close()
-        except StaleElementReferenceException:
-            pass
-        attempts += 1
-
-def isTextPresent(browser, selector) -> str:
-    """
-    This function handles the StaleElementException.
-    Attempts to locate the element by its css selector and retrieve its text.
-    param browser: WebDriver object.
-    param selector: css selector used to find the obscured element on the 
-    website page.
-    return: the text content from the element selected.
-    """
-    maxAttempts = 3
-    attempts = 0
-    while attempts < maxAttempts:
-        try:
-            wait = WebDriverWait(browser, 10)
-            text_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-            text = text_elem.get_attribute('textContent')
-            break
-        except TimeoutException:
-            text = 'N/A'
-            break
-        except StaleElementReferenceException:
-            pass
-        attempts += 1
-    return text
-
-def getHomeTeam(browser) -> str:
-    """
-    This function gets the home team, locating the element with its css selector.
-    param browser: WebDiver object.
-    return: the home team.
-    """
-    selector = 'body tr.team-row.home span.short'
-    try:
-        wait = WebDriverWait(browser, 10)
-        homeTeam_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-        homeTeam = homeTeam_elem.get_attribute('textContent').strip().upper()
-    except TimeoutException:
-        homeTeam = 'N/A'
-    except StaleElementReferenceException:
-        homeTeam = isTextPresent(browser, selector).strip().upper()
-    return homeTeam
-
-def getAwayTeam(browser) -> str:
-    """
-    This function gets the away team, locating the element with its css selector.
-    param browser: WebDiver object.
-    return: the away team.
-    """
-    selector = 'body tr.team-row.away span.short'
-    try:
-        wait = WebDriverWait(browser, 10)
-        awayTeam_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-        awayTeam = awayTeam_elem.get_attribute('textContent').strip().upper()
-    except TimeoutException:
-        awayTeam = 'N/A'
-    except StaleElementReferenceException:
-        awayTeam = isTextPresent(browser, selector).strip().upper()
-    return awayTeam
-
-def getHomeRuns(browser) -> str:
-    """
-    This function gets the runs scored by the home team, locating the element with its css selector. 
-    param browser: WebDiver object.
-    return: runs scored by the home team.
-    """
-    selector = 'body tr.home td.score'
-    try:
-        wait = WebDriverWait(browser, 10)
-        homeRuns_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-        homeRuns = homeRuns_elem.get_attribute('textContent').strip().upper()
-    except TimeoutException:
-        homeRuns = 'N/A'
-    except StaleElementReferenceException:
-        homeRuns = isTextPresent(browser, selector).strip().upper()
-    return homeRuns
-
-def getAwayRuns(browser) -> str:
-    """
-    This function gets the runs scored by the away team, locating the element with its css selector. 
-    param browser: WebDiver object.
-    return: runs scored by the away team.
-    """
-    selector = 'body tr.away td.score'
-    try:
-        wait = WebDriverWait(browser, 10)
-        awayRuns_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-        awayRuns = awayRuns_elem.get_attribute('textContent').strip().upper()
-    except TimeoutException:
-        awayRuns = 'N/A'
-    except StaleElementReferenceException:
-        awayRuns = isTextPresent(browser, selector).strip().upper()
-    return awayRuns
-
-def getInning(browser) -> str:
-    """
-    This function gets the current inning, locating the element with its css selector. 
-    param browser: WebDiver object.
-    return: the current inning.
-    """
-    selector = '.show_default.spacer span.full'
-    try:
-        wait = WebDriverWait(browser, 10)
-        inning_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector))) 
-        inning = inning_elem.get_attribute('textContent').strip()
-    except TimeoutException:
-        inning = 'N/A'
-    except StaleElementReferenceException:
-        inning = isTextPresent(browser, selector).strip()
-    return inning
-
-# Returns the most recent play.
-def getPlay(browser) -> str:
-    """
-    This function gets the most recent play, locating the element with its css selector. 
-    param browser: WebDiver object.
-    return: the current play.
-    """
-    selector = '.scoringPlays > section:last-of-type div.play:last-of-type p.description'
-    try:
-        wait = WebDriverWait(browser, 10)
-        inningPlay_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-        inningPlay = inningPlay_elem.get_attribute('textContent').strip()
-    except TimeoutException:
-        inningPlay = 'N/A'
-    except StaleElementReferenceException:
-        inningPlay = isTextPresent(browser, selector).strip()
-    return re.sub(' +', ' ', inningPlay) # Cleans string, everything gets spaced equally.
-
-def getPlayInning(browser) -> str:
-    """
-    # This function gets the inning of the most recent play, locating the 
-    # element with its css selector. 
-    # param browser: WebDiver object.
-    # return: the current playInning.
-    """
-    selector = '.scoringPlays > section:last-of-type h2'
-    try:
-        wait = WebDriverWait(browser, 60)
-        playInning_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-        playInning = playInning_elem.get_attribute('textContent').strip().upper()
-    except TimeoutException:
-        playInning = 'N/A'
-    except StaleElementReferenceException:
-        playInning = isTextPresent(browser, selector).strip().upper()
-    return playInning
-
-def isInningOver(browser) -> bool:
-    """
-    This function checks to see if the innng is over.
-    Return True in TimeoutException becuase the page is only visible during 
-    the game. The only time we refresh to a new page where we can't find the
-    element to tell us if the inning is at the end of the game.
-    param browser: WebDriver object.
-    return: True if the inning is over, False otherwise.
-    """
-    selector = 'div.matchup-status > div.matchup-progress-container > div > span:nth-child(1)'
-    endRegex = re.compile(r'END')
-    try:
-        wait = WebDriverWait(browser, 10)
-        inning_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-        inning = inning_elem.get_attribute('textContent').upper()
-        endMatch = endRegex.search(inning)
-    except TimeoutException:
-        return True
-    except StaleElementReferenceException:
-        inning = isTextPresent(browser, selector).upper()
-        endMatch = endRegex.search(inning)
-    if endMatch:
-        return True
-    return False
-
-# Returns true if the game is over, false if it's not.
-def isGameOver(inning, home_runs, away_runs) -> bool:
-    """
-    This function checks to see if the game is over. The page might not refresh
-    to conclude the game is over, thus we need to manually check if it is.
-    param inning: the current inning.
-    param home_runs: the current runs scored by the home team.
-    param away_runs: the current runs scored by the away team.
-    return: True if the game is over, False otherwise. 
-    """
-    if inning.upper() == 'GAME OVER' or inning.upper() == 'FINAL':
-        return True
-    inningMatch = re.search(r'\d+', inning)
-    if inningMatch:
-        if int(inningMatch.group()) >= 9 and home_runs != away_runs:
-            return True
-    return False
-
-def textPlay(homeTeam, home_runs, awayTeam, away_runs, playInning, play):
+import argparse, functools, threading, time, datetime
+from textMyself import textmyself, myNumber, TwilioTransport
+from notifier import NotificationQueue, AsyncNotificationQueue
+from subscriptions import SubscriptionRegistry
+from gameTracker import GameTracker, resolveTeams, MAX_GAME_LENGTH
+from asyncTracker import AsyncGameTracker
+from scheduleCache import ScheduleCache
+from checkpoint import CheckpointStore, CHECKPOINT_PATH
+from eventStore import EventStore, EVENT_STORE_PATH
+from scoreboard import Scoreboard, SCOREBOARD_PATH
+from coordinator import Coordinator
+from daemon import TrackerControl, serveControl, CONTROL_PORT
+from gameFeed import GameFeedError, GameFeedEnded, HttpGameFeed, FallbackGameFeed, makeSession, getGames
+from gameEvents import RunScored, InningEnded, GameFinal, SituationAlert
+from pollScheduler import PollScheduler
+from pollHandler import PollHandler
+from metrics import metrics, serveMetrics, METRICS_PORT
+from gameRecorder import RecordingGameFeed
+from browserPool import BrowserPool, POOL_SIZE
+
+# Selenium, chromedriver, twilio and BeautifulSoup are only imported once
+# they are used, see newSeleniumFeed(), browserPool, textMyself and getSchedule.
+# NumPy is only imported with --alerts, see winProbability.
+
+def textPlay(homeTeam, home_runs, awayTeam, away_runs, playInning, play, notify=textmyself):
     """
     Texts the user the most recent play.
     param homeTeam: the home team.
@@ -273,11 +34,12 @@ def textPlay(homeTeam, home_runs, awayTeam, away_runs, playInning, play):
     param awayRuns: the current runs scored by the away team.
     param playInning: the inning the play occurred.
     param: the play.
+    param notify: the function that sends the text.
     """
     message = playInning + ': ' + play + '\n\n' + homeTeam + ': ' + home_runs + ' ' + awayTeam + ': ' + away_runs
-    textmyself(message)
+    notify(message)
 
-def textInningScore(inning, homeTeam, home_runs, awayTeam, away_runs):
+def textInningScore(inning, homeTeam, home_runs, awayTeam, away_runs, notify=textmyself):
     """
     Texts the user the current score at the end of each inning.
     param inning: the inning that just ended.
@@ -285,140 +47,315 @@ def textInningScore(inning, homeTeam, home_runs, awayTeam, away_runs):
     param home_runs: the current runs scored by the home team.
     param awayTeam: the away team.
     param awayRuns: the current runs scored by the away team.
+    param notify: the function that sends the text.
     """
     message = 'End ' + inning + ':\n' + homeTeam + ': ' + home_runs + ' ' + awayTeam + ': ' + away_runs
-    textmyself(message)
+    notify(message)
 
-def textFinalScore(homeTeam, home_runs, awayTeam, away_runs):
+def textFinalScore(homeTeam, home_runs, awayTeam, away_runs, notify=textmyself):
     """
     Texts the user the final score at the end of the game.
     param homeTeam: the home team.
     param home_runs: the current runs scored by the home team.
     param awayTeam: the away team.
     param awayRuns: the current runs scored by the away team.
+    param notify: the function that sends the text.
     """
     message = 'Final\n' + homeTeam + ': ' + home_runs + ' ' + awayTeam + ': ' + away_runs
-    textmyself(message)
-
-def main():
-    scheduleURL, teamURL = None, None
-    while not scheduleURL and not teamURL:
-        team = input('Enter a team to track (e.g. padres, yankees, etc.): ').strip().upper()
-        scheduleURL = teamSchedule.get(team, None)
-        teamURL = teamPage.get(team, None)
-
-    schedule = getSchedule(scheduleURL)
-
-    while schedule:
-        currentDate = datetime.datetime.now()
-        timeUntilStart = schedule[0] - currentDate
+    notify(message)
 
-        # Sleep total time (seconds) until next game starts
-        if timeUntilStart.total_seconds() > 0:
-            print('Sleeping until next game starts...' + str(timeUntilStart.total_seconds()))
-            time.sleep(timeUntilStart.total_seconds())
-
-        browser = launchBrowser(teamURL)
-
-        # Check if the game is postponed.
-        isPPDSelector = 'li.mlb-scores__list-item.mlb-scores__list-item--game:last-of-type \
-div.g5-component--mlb-scores__MIG__versus--text'
-        try:
-            wait = WebDriverWait(browser, 10)
-            isPPD_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, isPPDSelector))) 
-            isPPD = isPPD_elem.get_attribute('textContent').strip().upper()
-        except TimeoutException:
-            isPPD = 'N/A'
-        except StaleElementReferenceException:
-            isPPD = isTextPresent(browser, isPPDSelector).strip().upper()
-        
-        if isPPD == 'PPD': #need to delete game from
-            continue
-
-        # Selects and clicks 'Gameday' link
-        gamedaySelector = 'div > div.g5-component--mlb-scores__button-group.g5-component--\
-mlb-scores__button-group--primary > div > div.p-button.p-button--scores-gameday > a'
-        try:
-            wait = WebDriverWait(browser, 10)
-            elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, gamedaySelector)))
-            elem.click()
-        except TimeoutException:
-            browser.close()
-        except StaleElementReferenceException:
-            retryFindClick(browser, gamedaySelector)
-
-        time.sleep(5) # Wait for page to load.
-
-        # Selects and clicks 'PLAYS' tab. Had to select <li> tag because it obscured the <a> tag.
-        playSelector = '#gameday-index-component__app > div > div:nth-child(5) > div > \
-div:nth-child(3) > div > div > div > div > nav > ul > li:nth-child(2)'
-        try:
-            wait = WebDriverWait(browser, 10)
-            elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, playSelector)))
-            webdriver.ActionChains(browser).move_to_element(elem).click(elem).perform()
-        except TimeoutException:
-            browser.close()
-        except StaleElementReferenceException:
-            retryFindInterceptedClick(browser, playSelector)
-
-        time.sleep(5) # Wait for page to load.
-
-        startTime = schedule[0] # The time the game starts.
+def textAlert(message, homeTeam, home_runs, awayTeam, away_runs, winProbability, notify=textmyself):
+    """
+    Texts the user a situation worth watching, with the chance each team wins.
+    param message: what is going on, e.g. 'Close game in the Top 8th'.
+    param homeTeam: the home team.
+    param home_runs: the current runs scored by the home team.
+    param awayTeam: the away team.
+    param awayRuns: the current runs scored by the away team.
+    param winProbability: the chance the home team wins, between 0 and 1.
+    param notify: the function that sends the text.
+    """
+    favorite, chance = (homeTeam, winProbability) if winProbability >= 0.5 else (awayTeam, 1 - winProbability)
+    message = (message + '\n\n' + homeTeam + ': ' + home_runs + ' ' + awayTeam + ': ' + away_runs +
+               '\n' + favorite + ' win ' + str(round(chance * 100)) + '% of the time from here')
+    notify(message)
+
+def textEvent(event, notifications, recipients, delivery=None):
+    """
+    Queues a text about an event of the game for every recipient. Only scoring
+    plays, inning ends, situation alerts and the final score are texted.
+    param event: GameEvent object.
+    param notifications: the NotificationQueue the texts are sent through.
+    param recipients: the phone numbers to text.
+    param delivery: optional notifier.Delivery told once each text is sent.
+    """
+    snapshot = event.snapshot
+    homeTeam, awayTeam = snapshot.homeTeam, snapshot.awayTeam
+    home_runs, away_runs = str(snapshot.homeRuns), str(snapshot.awayRuns)
+
+    # Texts about the same game sent close together are combined into one.
+    def notify(message):
+        notifications.notifyAll(recipients, message, key=(homeTeam, awayTeam), delivery=delivery)
+
+    if isinstance(event, RunScored):
+        textPlay(homeTeam, home_runs, awayTeam, away_runs, event.playInning, event.play, notify)
+    elif isinstance(event, InningEnded):
+        textInningScore(event.inning, homeTeam, home_runs, awayTeam, away_runs, notify)
+    elif isinstance(event, GameFinal):
+        textFinalScore(homeTeam, home_runs, awayTeam, away_runs, notify)
+    elif isinstance(event, SituationAlert):
+        textAlert(event.message, homeTeam, home_runs, awayTeam, away_runs, event.winProbability, notify)
+
+def newGameFeed(session, getPool=None):
+    """
+    This function makes the feed a game is read from: the stats api, and the
+    browser when the stats api can not find the game.
+    param session: the requests.Session shared by every game.
+    param getPool: callable returning the BrowserPool browsers are leased
+    from, only called once a game has to be read from its page.
+    return: a GameFeed object.
+    """
+    return FallbackGameFeed(lambda: HttpGameFeed(session), lambda: newSeleniumFeed(getPool))
+
+def newSeleniumFeed(getPool=None):
+    """
+    This function makes a feed that reads the game in Chrome, importing
+    Selenium the first time it is needed.
+    param getPool: callable returning the BrowserPool browsers are leased
+    from, a browser is launched for the game if None.
+    return: a SeleniumGameFeed object.
+    """
+    from seleniumFeed import SeleniumGameFeed
+    return SeleniumGameFeed(getPool() if getPool is not None else None)
+
+browserPool = None
+browserPoolLock = threading.Lock()
+
+def getBrowserPool(size=POOL_SIZE):
+    """
+    This function makes the pool of browsers the first time a game has to be
+    read from its page, so no browser is launched while every game is on
+    the stats api. It returns the same pool after that.
+    param size: the most browsers open at the same time.
+    return: a BrowserPool object.
+    """
+    global browserPool
+    with browserPoolLock:
+        if browserPool is None:
+            # A browser is warmed in the background for the games after this one,
+            # the game asking for the pool launches its own if it is not ready.
+            browserPool = BrowserPool(size=size)
+        return browserPool
+
+notificationQueue = None
+notificationLock = threading.Lock()
+
+def getNotificationQueue():
+    """
+    This function makes the queue that sends texts with Twilio the first time
+    it is needed and returns the same one after that.
+    return: a NotificationQueue object.
+    """
+    global notificationQueue
+    with notificationLock:
+        if notificationQueue is None:
+            notificationQueue = NotificationQueue(TwilioTransport())
+        return notificationQueue
+
+def trackGame(team, startTime, feed, claimGame=None, scheduler=None, notifications=None,
+              registry=None, sleep=time.sleep, checkpoints=None, eventStore=None, alerts=None,
+              scoreboard=None, gameId=None):
+    """
+    This function follows a single game from its start until it is over, texting
+    the user scoring plays, inning scores and the final score.
+    param team: the team whose game is followed.
+    param startTime: the time the game starts.
+    param feed: the GameFeed object the game is read from.
+    param claimGame: optional callable taking (homeTeam, awayTeam) that returns
+    False if the game is already being tracked elsewhere.
+    param scheduler: the PollScheduler that paces the polls, one is made if None.
+    param notifications: the NotificationQueue texts are sent through, texts 
+    are sent with Twilio if None.
+    param registry: the SubscriptionRegistry of who to text, only myNumber is
+    texted if None.
+    param sleep: the function used to wait between polls, replays pass one
+    that does not wait.
+    param checkpoints: the CheckpointStore the handled events are saved to, a
+    game that was already being followed resumes from it. Nothing is saved if None.
+    param eventStore: the EventStore every event is kept in, nothing is kept if None.
+    param alerts: the AlertEngine situations are checked with, none are if None.
+    param scoreboard: the Scoreboard every poll is published to, nothing is if None.
+    param gameId: the id of the game on the schedule, made from the teams the
+    feed names if None.
+    return: 'POSTPONED' if the game was postponed, 'FINAL' otherwise.
+    """
+    if scheduler is None:
+        scheduler = PollScheduler()
+    if notifications is None:
+        notifications = getNotificationQueue()
+    if registry is None:
+        registry = SubscriptionRegistry()
+        registry.subscribe(team, myNumber)
+    handler = PollHandler(registry, textEvent, notifications, checkpoints, eventStore, alerts, scoreboard)
+    game = None
+    try:
+        with metrics.timer('open'):
+            if not feed.open(team, startTime):
+                return 'POSTPONED'
+        with metrics.timer('fetch'):
+            state = feed.fetch()
+        delay = scheduler.succeeded(state)
+
+        # Two tracked teams playing each other share the same game, only follow it once.
+        if claimGame is not None and not claimGame(state.homeTeam, state.awayTeam):
+            return 'FINAL'
+
+        game = handler.start(team, startTime, state, scheduler, gameId)
+        if game is None:
+            return 'FINAL'
         totalTime = 0 # Keeps track of the total time the game has been going on.
-        maxTime = 36000 # Games should not be longer than 10 hours (seconds).
-        homeTeam, awayTeam = getHomeTeam(browser), getAwayTeam(browser)
-        home_runs, away_runs = '0', '0'
-        inning = getInning(browser)
-        previousInning = None 
-        plays = set() # Keeps track of the innings we've already processed.
-
-        # Main loop of that provides updates of the game. Loop while there are innings in 
-        # the game. totalTime is used to verify that we are not stuck in an infinite loop. 
-        while inning or totalTime < maxTime:
-            play = getPlay(browser)
-            # If there is no play do nothing. If there is, check to see if its been processed.
-            if play == 'N/A':
-                pass
-            else:
-                if play not in plays:
-                    playInning = getPlayInning(browser)
-                    home_runs, away_runs = getHomeRuns(browser), getAwayRuns(browser)
-                    thread = threading.Thread(target=textPlay, \
-args=(homeTeam, home_runs, awayTeam, away_runs, playInning, play,))
-                    thread.start()
-                    thread.join()
-                    plays.add(play)
 
-            endOfInning = isInningOver(browser)
+        # Main loop of that provides updates of the game. totalTime is used to 
+        # verify that we are not stuck in an infinite loop. 
+        while totalTime < MAX_GAME_LENGTH:
+            status = handler.handle(game, state)
+            if status is not None:
+                return status
+            sleep(delay)
+            try:
+                with metrics.timer('fetch'):
+                    state = feed.fetch()
+                delay = scheduler.succeeded(state)
+            except GameFeedEnded:
+                break
+            except GameFeedError as exc:
+                metrics.increment('tracker_poll_errors_total')
+                delay = scheduler.failed(exc.retryAfter)
+            totalTime = (datetime.datetime.now(startTime.tzinfo) - startTime).total_seconds()
+    finally:
+        feed.close()
+        handler.stop(game)
+    return 'FINAL'
+
+def listGames(teams=None):
+    """
+    This function prints today's games without loading anything the tracking needs.
+    param teams: the teams typed by the user separated by commas, every game if None.
+    """
+    teams = resolveTeams(teams.split(',')) if teams else None
+    for startTime, awayTeam, homeTeam, status in getGames(makeSession(), datetime.date.today(), teams):
+        print(startTime.strftime('%I:%M %p') + '  ' + awayTeam + ' @ ' + homeTeam + '  ' + status)
 
-            # If the inning is over, check if the game is over and text the user the current score.
-            if endOfInning:
-                home_runs, away_runs = getHomeRuns(browser), getAwayRuns(browser)
-                inning = getInning(browser)
-                if inning != previousInning and inning != 'N/A':
-                    gameOver = isGameOver(inning, home_runs, away_runs)
-                    if gameOver:
-                        thread = threading.Thread(target=textFinalScore, \
-args=(homeTeam, home_runs, awayTeam, away_runs,))
-                        thread.start()
-                        thread.join()
-                        break
-                    thread = threading.Thread(target=textInningScore, \
-args=(inning, homeTeam, home_runs, awayTeam, away_runs,))
-                    thread.start()
-                    thread.join()
-                    previousInning = inning
-                    time.sleep(180) # Sleep until next inning.
+def main():
+    parser = argparse.ArgumentParser(description='Texts live updates of MLB games.')
+    parser.add_argument('--subscribers', help='json file or SQLite database of who to text about which team')
+    parser.add_argument('--record', metavar='DIR', help='record every game to DIR, see benchmark.py')
+    parser.add_argument('--browsers', type=int, default=POOL_SIZE, help='most browsers open at once when the stats api can not be used')
+    parser.add_argument('--metrics-port', type=int, nargs='?', const=METRICS_PORT,
+                        help='serve metrics at http://127.0.0.1:PORT/metrics (default port ' + str(METRICS_PORT) + ')')
+    parser.add_argument('--metrics-log', metavar='FILE', help='append every measurement to FILE as json lines')
+    parser.add_argument('--profile', action='store_true', help='print where the time went at the end of each game')
+    parser.add_argument('--checkpoints', metavar='FILE', default=CHECKPOINT_PATH,
+                        help='SQLite file of the events already texted, so a restart resumes each game (default %(default)s)')
+    parser.add_argument('--events', metavar='DIR', default=EVENT_STORE_PATH,
+                        help='keep every event in DIR to be queried with eventStore.py (default %(default)s)')
+    parser.add_argument('--scoreboard', metavar='FILE', default=SCOREBOARD_PATH,
+                        help='publish the live scores to FILE for other programs, see scoreboard.py (default %(default)s)')
+    parser.add_argument('--alerts', nargs='?', const='', metavar='FILE',
+                        help='also text close games, no-hitters and other situations, from FILE '
+                             'or the alerts in winProbability.py, needs numpy')
+    parser.add_argument('--engine', choices=('asyncio', 'threads'), default='asyncio',
+                        help='follow games as tasks on one event loop, or on a pool of threads')
+    parser.add_argument('--teams', help='teams to track separated by commas, or ALL, instead of being asked')
+    parser.add_argument('--coordinate', metavar='FILE',
+                        help='share the games with the other workers using the lease database FILE, see coordinator.py')
+    parser.add_argument('--worker-id', help='the name of this worker when coordinating, host and pid by default')
+    parser.add_argument('--list', action='store_true', help="list today's games (of --teams if given) and exit")
+    parser.add_argument('--daemon', type=int, nargs='?', const=CONTROL_PORT, metavar='PORT',
+                        help='keep running and take changes at http://127.0.0.1:PORT/, see daemon.py '
+                             '(default port ' + str(CONTROL_PORT) + ')')
+    args = parser.parse_args()
+
+    if args.list:
+        listGames(args.teams)
+        return
+
+    if args.subscribers:
+        registry = SubscriptionRegistry.load(args.subscribers)
+        teams = resolveTeams(registry.teams())
+    else:
+        teams = resolveTeams(args.teams.split(',')) if args.teams else []
+        # A daemon can start with no teams, they are added once it is running.
+        while not teams and args.daemon is None:
+            entry = input('Enter teams to track, separated by commas, or ALL (e.g. padres, yankees, etc.): ')
             try:
-                browser.refresh()
-            except WebDriverException:
-                time.sleep(10)
-                browser.refresh()
-            time.sleep(10)
-            totalTime = startTime - datetime.datetime.now()
+                teams = resolveTeams(entry.split(','))
+            except KeyError:
+                teams = None
+        registry = SubscriptionRegistry()
+        for team in teams:
+            registry.subscribe(team, myNumber)
+
+    if args.metrics_port is not None:
+        serveMetrics(args.metrics_port)
+    if args.metrics_log:
+        metrics.openLog(args.metrics_log)
+    metrics.profiling = args.profile
+
+    checkpoints = CheckpointStore(args.checkpoints)
+    checkpoints.prune()
+    eventStore = EventStore(args.events)
+    try:
+        scoreboard = Scoreboard(args.scoreboard)
+    except (OSError, ValueError) as exc:
+        # The scores are only a convenience for other programs, the texts go out without them.
+        print('Not publishing the scores: ' + repr(exc))
+        scoreboard = None
+    alerts = None
+    if args.alerts is not None:
+        from winProbability import AlertEngine, loadAlerts
+        alerts = AlertEngine(loadAlerts(args.alerts or None))
+
+    session = makeSession() # One connection pool for every game and schedule.
+    scheduleCache = ScheduleCache(session=session)
+    getPool = functools.partial(getBrowserPool, args.browsers)
+    def makeFeed():
+        feed = newGameFeed(session, getPool)
+        return RecordingGameFeed(feed, args.record) if args.record else feed
+
+    coordinator = None
+    if args.coordinate:
+        coordinator = Coordinator(args.coordinate, args.worker_id)
+        coordinator.start()
 
-        browser.close()
-        del schedule[0]
+    try:
+        if args.engine == 'asyncio':
+            notifications = AsyncNotificationQueue(TwilioTransport())
+            tracker = AsyncGameTracker(teams, makeFeed, registry, textEvent, notifications,
+                                       browserWorkers=args.browsers, scheduleCache=scheduleCache,
+                                       checkpoints=checkpoints, eventStore=eventStore, alerts=alerts,
+                                       scoreboard=scoreboard, coordinator=coordinator,
+                                       daemon=args.daemon is not None)
+        else:
+            track = functools.partial(trackGame, registry=registry, checkpoints=checkpoints,
+                                      eventStore=eventStore, alerts=alerts, scoreboard=scoreboard)
+            tracker = GameTracker(teams, track, makeFeed, scheduleCache=scheduleCache, coordinator=coordinator,
+                                  daemon=args.daemon is not None)
+        if args.daemon is not None:
+            control = TrackerControl(tracker, registry, args.subscribers,
+                                     None if args.subscribers else myNumber)
+            serveControl(control, args.daemon)
+        tracker.run() # The asyncio engine sends what is left before returning.
+        if args.engine == 'threads':
+            getNotificationQueue().close() # Sends what is left before exiting.
+    finally:
+        if browserPool is not None:
+            browserPool.close()
+        eventStore.close() # Writes the events not written yet.
+        if scoreboard is not None:
+            scoreboard.close()
+        if coordinator is not None:
+            coordinator.stop() # Hands unfinished games to the other workers.
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,143 @@
+#! /usr/bin/env python3
+# benchmark.py - Times the tracking loop offline by replaying recorded games.
+# Usage: python3 benchmark.py [recording.jsonl.gz ...] [--repeat N]
+# Without recordings it runs against the games in fixtures/. Record your own
+# with: python3 baseballUpdates.py --record DIR
+
+import argparse, datetime, glob, os, time, tracemalloc
+from gameRecorder import ReplayGameFeed, readRecording, PARSERS
+from gameEvents import EventDiffer
+from notifier import NotificationQueue, StubTransport
+from subscriptions import SubscriptionRegistry
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', '*.jsonl.gz')
+
+class TimedReplayGameFeed(ReplayGameFeed):
+    """
+    A replay that remembers when the last poll returned, the moment a play
+    appears as far as the tracker can tell.
+    """
+
+    def __init__(self, recording):
+        super().__init__(recording)
+        self.fetchedAt = None
+
+    def fetch(self):
+        snapshot = super().fetch()
+        self.fetchedAt = time.perf_counter()
+        return snapshot
+
+class TimedNotificationQueue(NotificationQueue):
+    """
+    A queue that measures how long after the poll each text was queued.
+    """
+
+    def __init__(self, feed):
+        super().__init__(StubTransport(), coalesceWindow=0, ratePerMinute=10 ** 6)
+        self.feed = feed
+        self.latencies = []
+
+    def notify(self, recipient, message, key=None, delivery=None):
+        self.latencies.append(time.perf_counter() - self.feed.fetchedAt)
+        return super().notify(recipient, message, key, delivery)
+
+def percentile(values, fraction):
+    """
+    This function gets a percentile of a list of numbers.
+    param values: the numbers.
+    param fraction: the percentile between 0 and 1 (e.g. 0.95).
+    return: the value at that percentile, 0 if there are none.
+    """
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def timeEach(function, items, repeat):
+    """
+    This function times a function on every item.
+    return: a list of seconds, one per call.
+    """
+    latencies = []
+    for _ in range(repeat):
+        for item in items:
+            start = time.perf_counter()
+            function(item)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+def benchmarkParse(records, repeat) -> dict:
+    """
+    This function times parsing each recorded document, the work that
+    replaced the getters.
+    return: a dictionary of document kind to a list of seconds.
+    """
+    latencies = {}
+    for kind in sorted({kind for seconds, kind, document in records}):
+        documents = [document for seconds, documentKind, document in records if documentKind == kind]
+        latencies[kind] = timeEach(PARSERS[kind], documents, repeat)
+    return latencies
+
+def benchmarkDiff(records, repeat) -> list:
+    """
+    This function times finding the events in each snapshot.
+    return: a list of seconds.
+    """
+    snapshots = [PARSERS[kind](document) for seconds, kind, document in records]
+    latencies = []
+    for _ in range(repeat):
+        differ = EventDiffer()
+        latencies.extend(timeEach(differ.diff, snapshots, 1))
+    return latencies
+
+def benchmarkLoop(records) -> dict:
+    """
+    This function replays a game through trackGame(), the loop the tracker
+    runs, without waiting between polls.
+    return: a dictionary with 'polls', 'seconds', 'latencies' (poll returned
+    to text queued) and 'peakMemory' (bytes).
+    """
+    from baseballUpdates import trackGame # Only needed for this benchmark.
+
+    feed = TimedReplayGameFeed(records)
+    notifications = TimedNotificationQueue(feed)
+    registry = SubscriptionRegistry()
+    snapshot = PARSERS[records[0][1]](records[0][2])
+    registry.subscribe(snapshot.homeTeam, 'benchmark')
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    trackGame(snapshot.homeTeam, datetime.datetime.now().astimezone(), feed,
+              notifications=notifications, registry=registry, sleep=lambda seconds: None)
+    seconds = time.perf_counter() - start
+    peakMemory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    notifications.close()
+    return {'polls': feed.position, 'seconds': seconds,
+            'latencies': notifications.latencies, 'peakMemory': peakMemory}
+
+def report(name, latencies):
+    print('  %-22s p50 %8.3f ms   p95 %8.3f ms   max %8.3f ms' % (
+        name, percentile(latencies, 0.5) * 1000, percentile(latencies, 0.95) * 1000,
+        max(latencies, default=0) * 1000))
+
+def main():
+    parser = argparse.ArgumentParser(description='Times the tracking loop against recorded games.')
+    parser.add_argument('recordings', nargs='*', help='recordings made with --record, fixtures/ if none')
+    parser.add_argument('--repeat', type=int, default=20, help='times to repeat the parse and diff benchmarks')
+    args = parser.parse_args()
+
+    for path in args.recordings or sorted(glob.glob(FIXTURES)):
+        records = readRecording(path)
+        print(os.path.basename(path) + ': ' + str(len(records)) + ' polls')
+        for kind, latencies in benchmarkParse(records, args.repeat).items():
+            report('parse ' + kind, latencies)
+        report('diff', benchmarkDiff(records, args.repeat))
+
+        loop = benchmarkLoop(records)
+        print('  %-22s %8.0f polls/sec' % ('loop', loop['polls'] / loop['seconds']))
+        report('play to text queued', loop['latencies'])
+        print('  %-22s %8.2f MB' % ('peak memory', loop['peakMemory'] / 2 ** 20))
+
+if __name__ == '__main__':
+    main()
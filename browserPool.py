@@ -0,0 +1,279 @@
+#! /usr/bin/env python3
+# browserPool.py - Keeps headless Chrome sessions warm so a game can start
+# polling without waiting for a browser to launch.
+
+import threading, time
+
+# Selenium is imported by the functions that use it, so importing the pool does
+# not load it until a browser is launched.
+
+POOL_SIZE = 2 # Browsers open at the same time, bounds the memory they use.
+WARM_SESSIONS = 1 # Browsers launched before any game needs one.
+MAX_PAGES = 50 # A browser is replaced after loading this many pages.
+MAX_MEMORY_MB = 1024 # A browser is replaced once it uses more memory than this.
+
+class BrowserPoolError(Exception):
+    """Raised when no browser could be leased."""
+
+def launchHeadlessBrowser():
+    """
+    This function launches Chrome without a window.
+    return: a WebDriver object.
+    """
+    import chromedriver_binary # Adds chromedriver to the PATH.
+    from selenium import webdriver
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')
+    options.add_argument('--window-size=1920,1080') # The page lays out like the maximized window did.
+    options.add_argument('--disable-gpu')
+    options.add_argument('--disable-extensions')
+    return webdriver.Chrome(options=options)
+
+def getMemoryMB(browser):
+    """
+    This function gets the memory used by a browser and its child processes.
+    Needs psutil, which is optional.
+    param browser: WebDriver object.
+    return: the memory in MB, None if it can not be measured.
+    """
+    try:
+        import psutil
+        driver = psutil.Process(browser.service.process.pid)
+        processes = [driver] + driver.children(recursive=True)
+        return sum(process.memory_info().rss for process in processes) / 2 ** 20
+    except Exception:
+        return None
+
+class BrowserSession:
+    """
+    A browser in the pool, the number of pages it has loaded and how much it
+    may load or use before it is replaced.
+    """
+    __slots__ = ('browser', 'pages', 'created', 'maxPages', 'maxMemoryMB')
+
+    def __init__(self, browser, maxPages=MAX_PAGES, maxMemoryMB=MAX_MEMORY_MB):
+        self.browser = browser
+        self.pages = 0
+        self.created = time.monotonic()
+        self.maxPages = maxPages
+        self.maxMemoryMB = maxMemoryMB
+
+    def wornOut(self) -> bool:
+        """
+        This function checks if the browser loaded too many pages or uses too much memory.
+        return: True if it is due to be replaced.
+        """
+        if self.pages >= self.maxPages:
+            return True
+        memory = getMemoryMB(self.browser)
+        return memory is not None and memory > self.maxMemoryMB
+
+    def pageLoaded(self) -> bool:
+        """
+        This function counts a page the browser loaded. A game leases its
+        browser for hours, so the feed checks after every page whether to
+        replace it instead of waiting for it to be given back.
+        return: True if the browser is due to be replaced.
+        """
+        self.pages += 1
+        return self.wornOut()
+
+class BrowserPool:
+    """
+    A bounded pool of headless browsers. Games lease a browser for as long as
+    they are followed and give it back when they are done. Browsers are
+    checked before being leased, and a browser that crashed, loaded too many
+    pages or uses too much memory is replaced in the background.
+    """
+
+    def __init__(self, size=POOL_SIZE, warm=WARM_SESSIONS, maxPages=MAX_PAGES,
+                 maxMemoryMB=MAX_MEMORY_MB, launch=launchHeadlessBrowser):
+        """
+        param size: the most browsers open at the same time.
+        param warm: the number of browsers launched right away.
+        param maxPages: pages a browser loads before it is replaced.
+        param maxMemoryMB: memory a browser may use before it is replaced.
+        param launch: function that launches a new browser.
+        """
+        self.size = size
+        self.maxPages = maxPages
+        self.maxMemoryMB = maxMemoryMB
+        self.launch = launch
+        self.idle = [] # Sessions ready to be leased.
+        self.total = 0 # Sessions open or being launched.
+        self.launching = 0 # Sessions being launched in the background.
+        self.closed = False
+        self.condition = threading.Condition()
+        for _ in range(min(warm, size)):
+            self.launchInBackground()
+
+    def launchInBackground(self):
+        """
+        This function launches a browser on its own thread and adds it to the
+        idle sessions once it is ready.
+        """
+        with self.condition:
+            if self.closed or self.total >= self.size:
+                return
+            self.total += 1
+            self.launching += 1
+        threading.Thread(target=self.warmUp, daemon=True).start()
+
+    def warmSpare(self) -> bool:
+        """
+        This function makes sure a browser is being launched in the background
+        for the next lease, e.g. to replace a worn out one without waiting.
+        return: True if one is launching, False if the pool is full and none is.
+        """
+        with self.condition:
+            if self.closed:
+                return False
+            if self.launching:
+                return True
+            if self.total >= self.size:
+                return False
+            self.total += 1
+            self.launching += 1
+        threading.Thread(target=self.warmUp, daemon=True).start()
+        return True
+
+    def newSession(self) -> BrowserSession:
+        return BrowserSession(self.launch(), self.maxPages, self.maxMemoryMB)
+
+    def warmUp(self):
+        # Runs on its own thread, where an error would only print a traceback:
+        # Selenium or chromedriver may be missing, or Chrome may not start.
+        try:
+            session = self.newSession()
+        except Exception as exc:
+            print('Could not launch a browser: ' + repr(exc))
+            with self.condition:
+                self.total -= 1
+                self.launching -= 1
+                self.condition.notify()
+            return
+        with self.condition:
+            self.launching -= 1
+            if self.closed:
+                self.total -= 1
+                quitBrowser(session.browser)
+                return
+            self.idle.append(session)
+            self.condition.notify()
+
+    def isHealthy(self, session) -> bool:
+        """
+        This function checks that a browser still responds and is not due to
+        be recycled.
+        param session: BrowserSession object.
+        return: True if the browser can be leased, False otherwise.
+        """
+        from selenium.common.exceptions import WebDriverException
+        if session.wornOut():
+            return False
+        try:
+            session.browser.execute_script('return 1')
+        except WebDriverException:
+            return False
+        return True
+
+    def acquire(self, timeout=60) -> BrowserSession:
+        """
+        This function leases a browser, launching one if none are idle and the
+        pool is not full.
+        param timeout: the longest time to wait for a browser (seconds).
+        return: a BrowserSession object.
+        raise BrowserPoolError: if no browser was available in time.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.condition:
+                if self.closed:
+                    raise BrowserPoolError('The browser pool is closed')
+                if not self.idle and self.total < self.size:
+                    self.total += 1
+                    launchHere = True
+                else:
+                    launchHere = False
+                    remaining = deadline - time.monotonic()
+                    # Woken too when a launch fails or a browser is quit, to launch one here.
+                    if not self.condition.wait_for(lambda: self.idle or self.closed or self.total < self.size,
+                                                   remaining):
+                        raise BrowserPoolError('No browser available')
+                    if self.closed or not self.idle:
+                        continue
+                    session = self.idle.pop()
+
+            if launchHere:
+                try:
+                    return self.newSession()
+                except Exception as exc: # WebDriverException, or e.g. an OSError without chromedriver.
+                    with self.condition:
+                        self.total -= 1
+                        self.condition.notify()
+                    raise BrowserPoolError('Could not launch a browser') from exc
+
+            if self.isHealthy(session):
+                return session
+            self.discard(session)
+            self.launchInBackground()
+
+    def tryAcquire(self):
+        """
+        This function leases an idle browser, without waiting or launching one.
+        return: a BrowserSession object, None if no browser is idle.
+        """
+        while True:
+            with self.condition:
+                if self.closed or not self.idle:
+                    return None
+                session = self.idle.pop()
+            if self.isHealthy(session):
+                return session
+            self.discard(session)
+            self.launchInBackground()
+
+    def release(self, session, healthy=True):
+        """
+        This function gives a leased browser back to the pool.
+        param session: the BrowserSession from acquire().
+        param healthy: False if the browser crashed while it was leased, it is
+        then replaced.
+        """
+        if not healthy or session.wornOut():
+            self.discard(session)
+            self.launchInBackground()
+            return
+        with self.condition:
+            if self.closed:
+                self.total -= 1
+                self.condition.notify()
+                quitBrowser(session.browser)
+                return
+            self.idle.append(session)
+            self.condition.notify()
+
+    def discard(self, session):
+        with self.condition:
+            self.total -= 1
+            self.condition.notify()
+        quitBrowser(session.browser)
+
+    def close(self):
+        """
+        This function quits every idle browser, leased ones are quit when released.
+        """
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.total -= len(idle)
+            self.condition.notify_all()
+        for session in idle:
+            quitBrowser(session.browser)
+
+def quitBrowser(browser):
+    from selenium.common.exceptions import WebDriverException
+    try:
+        browser.quit()
+    except WebDriverException:
+        pass
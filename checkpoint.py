@@ -0,0 +1,177 @@
+#! /usr/bin/env python3
+# checkpoint.py - Remembers the events already handled in each game, so a
+# restarted tracker picks up where it left off instead of texting them again,
+# and texts again the ones whose texts were never sent.
+
+import json, os, sqlite3, threading, time
+from gameEvents import EventDiffer
+
+CHECKPOINT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'mlb-game-tracker', 'checkpoints.db')
+KEEP_DAYS = 7 # Games not touched for this long are forgotten.
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS games (
+    gameId TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    gameId TEXT NOT NULL,
+    sequence INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (gameId, sequence)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pending (
+    gameId TEXT NOT NULL,
+    sequence INTEGER NOT NULL,
+    PRIMARY KEY (gameId, sequence)
+) WITHOUT ROWID;
+'''
+
+def eventValue(event):
+    """
+    This function gets the part of an event needed to rebuild an EventDiffer.
+    param event: GameEvent object.
+    return: the value stored with the event, None if there is none.
+    """
+    kind = type(event).__name__
+    if kind == 'RunScored':
+        return json.dumps(event.playId)
+    if kind == 'LeadChange':
+        return event.leader
+    if kind in ('InningEnded', 'GameFinal'):
+        return event.snapshot.inning
+    if kind == 'SituationAlert':
+        return json.dumps([event.alert, event.key])
+    return None
+
+class CheckpointStore:
+    """
+    An append-only log of the events handled in each game, in a SQLite
+    database in WAL mode. Each batch of events is one small transaction, and
+    a game is resumed by reading its events back into a new EventDiffer.
+    Events are recorded as pending until their texts are sent, and a game is
+    only resumed up to its first pending event. Safe to use from several threads.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH, clock=time.time):
+        """
+        param path: the database file, ':memory:' for one that is not saved.
+        param clock: function returning the current time in seconds.
+        """
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL') # Commits survive the process dying, only a power cut can lose the last few.
+        self.connection.executescript(SCHEMA)
+
+    def record(self, gameId, events, status='LIVE', pending=False):
+        """
+        This function appends the events handled in a game.
+        param gameId: the id of the game, see schedule.makeGameId().
+        param events: the GameEvent objects, in the order they happened.
+        param status: the status of the game, e.g. 'LIVE' or 'FINAL'.
+        param pending: True if the events still have texts to send, see delivered().
+        """
+        rows = [(gameId, event.sequence, type(event).__name__, eventValue(event)) for event in events]
+        with self.lock:
+            connection = self.connection
+            connection.execute('BEGIN')
+            try:
+                connection.executemany('INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?)', rows)
+                if pending:
+                    connection.executemany('INSERT OR IGNORE INTO pending VALUES (?, ?)',
+                                           [(gameId, event.sequence) for event in events])
+                connection.execute('INSERT OR REPLACE INTO games VALUES (?, ?, ?)', (gameId, status, self.clock()))
+                connection.execute('COMMIT')
+            except sqlite3.Error:
+                connection.execute('ROLLBACK')
+                raise
+
+    def delivered(self, gameId, sequences):
+        """
+        This function records that every text about some pending events was sent.
+        param gameId: the id of the game.
+        param sequences: the sequence numbers of the events.
+        """
+        with self.lock:
+            self.connection.executemany('DELETE FROM pending WHERE gameId = ? AND sequence = ?',
+                                        [(gameId, sequence) for sequence in sequences])
+
+    def status(self, gameId):
+        """
+        This function gets the last status recorded for a game.
+        param gameId: the id of the game.
+        return: the status, None if the game was never checkpointed.
+        """
+        with self.lock:
+            row = self.connection.execute('SELECT status FROM games WHERE gameId = ?', (gameId,)).fetchone()
+        return row[0] if row else None
+
+    def restore(self, gameId) -> EventDiffer:
+        """
+        This function rebuilds the EventDiffer of a game from its events, so
+        the events already handled are not found again. The events from the
+        first one whose texts were never sent on are forgotten, so they are
+        found and texted again: a later play the differ had seen would
+        otherwise hide an earlier one. Texts about the delivered events among
+        them are sent twice rather than one being lost.
+        param gameId: the id of the game.
+        return: an EventDiffer object, a new one if the game was never checkpointed.
+        """
+        with self.lock:
+            connection = self.connection
+            connection.execute('BEGIN')
+            try:
+                watermark, = connection.execute('SELECT min(sequence) FROM pending WHERE gameId = ?',
+                                                (gameId,)).fetchone()
+                if watermark is not None:
+                    connection.execute('DELETE FROM events WHERE gameId = ? AND sequence >= ?', (gameId, watermark))
+                    connection.execute('DELETE FROM pending WHERE gameId = ?', (gameId,))
+                rows = connection.execute('SELECT sequence, kind, value FROM events WHERE gameId = ? '
+                                          'ORDER BY sequence', (gameId,)).fetchall()
+                connection.execute('COMMIT')
+            except sqlite3.Error:
+                connection.execute('ROLLBACK')
+                raise
+        differ = EventDiffer()
+        for sequence, kind, value in rows:
+            differ.sequence = sequence
+            if kind == 'RunScored':
+                playId = json.loads(value)
+                differ.seenPlays.add(tuple(playId) if isinstance(playId, list) else playId)
+            elif kind == 'LeadChange':
+                differ.leader = value
+            elif kind in ('InningEnded', 'GameFinal'):
+                differ.previousInning = value
+                differ.endedInnings.add(value)
+                differ.final = differ.final or kind == 'GameFinal'
+            elif kind == 'Postponed':
+                differ.postponed = True
+            elif kind == 'SituationAlert':
+                differ.firedAlerts.add(tuple(json.loads(value)))
+        return differ
+
+    def prune(self, days=KEEP_DAYS) -> int:
+        """
+        This function forgets the games that have not been touched in a while.
+        param days: how old a game must be to be forgotten.
+        return: the number of games forgotten.
+        """
+        before = self.clock() - days * 24 * 60 * 60
+        with self.lock:
+            connection = self.connection
+            connection.execute('BEGIN')
+            connection.execute('DELETE FROM events WHERE gameId IN (SELECT gameId FROM games WHERE updated < ?)', (before,))
+            connection.execute('DELETE FROM pending WHERE gameId IN (SELECT gameId FROM games WHERE updated < ?)', (before,))
+            count = connection.execute('DELETE FROM games WHERE updated < ?', (before,)).rowcount
+            connection.execute('COMMIT')
+        return count
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,280 @@
+#! /usr/bin/env python3
+# coordinator.py - Shares the day's games between several tracker processes,
+# so every game is read and texted by exactly one of them.
+# Usage: python3 coordinator.py --workers N [baseballUpdates.py options]
+#        python3 coordinator.py --status
+
+import argparse, hashlib, os, socket, sqlite3, subprocess, sys, threading, time
+from gameFeed import GameFeed, GameFeedEnded
+
+LEASE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'mlb-game-tracker', 'leases.db')
+LEASE_TTL = 30 # A worker that has not heartbeated for this long loses its games (seconds).
+HEARTBEAT_MARGIN = 1 / 3 # Share of the ttl before its leases expire that a worker stops trusting them.
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS workers (
+    worker TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    gameId TEXT PRIMARY KEY,
+    worker TEXT NOT NULL,
+    expires REAL NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0
+);
+'''
+
+def getWorkerId() -> str:
+    """
+    This function names the current process, unique across hosts sharing a database.
+    return: e.g. 'tracker-host-1234'.
+    """
+    return socket.gethostname() + '-' + str(os.getpid())
+
+def rank(worker, gameId) -> bytes:
+    return hashlib.sha1((worker + '/' + gameId).encode()).digest()
+
+def preferredWorker(gameId, workers):
+    """
+    This function picks the worker a game belongs to by rendezvous hashing, so
+    the games are spread evenly and only the games of a worker that stops
+    move when it does.
+    param gameId: the id of the game.
+    param workers: the ids of the live workers.
+    return: the id of the worker, None if there are none.
+    """
+    return max(workers, key=lambda worker: rank(worker, gameId), default=None)
+
+class Coordinator:
+    """
+    Leases games to workers through a SQLite database every worker can open.
+    A worker only follows a game while it holds its lease, and renews its
+    leases with a heartbeat from a background thread. When a worker stops
+    heartbeating its leases expire and its games are taken over by the other
+    workers, which keep watching the games they do not hold until they are over.
+    """
+
+    def __init__(self, path=LEASE_PATH, workerId=None, ttl=LEASE_TTL, clock=time.time):
+        """
+        param path: the lease database, shared by every worker.
+        param workerId: the name of this worker, see getWorkerId().
+        param ttl: seconds a lease lasts without being renewed.
+        param clock: function returning the current time in seconds, the same
+        on every host.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.workerId = workerId if workerId is not None else getWorkerId()
+        self.ttl = ttl
+        self.clock = clock
+        self.held = set() # Ids of the games this worker holds the lease of.
+        self.lastBeat = None # time.monotonic() of the last heartbeat that went through.
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.connection = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def transaction(self, function, *args):
+        # Runs function(connection, now, *args) in one write transaction,
+        # holding the database lock so two workers never decide at once.
+        with self.lock:
+            connection = self.connection
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                result = function(connection, self.clock(), *args)
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+            return result
+
+    def liveWorkers(self, connection, now) -> list:
+        rows = connection.execute('SELECT worker FROM workers WHERE heartbeat >= ?', (now - self.ttl,))
+        return [row[0] for row in rows]
+
+    def claim(self, gameId, anyWorker=False) -> bool:
+        """
+        This function takes the lease of a game if no live worker holds it and
+        the game is not over. The first lease of a game only goes to the
+        worker the game belongs to, after that a game whose lease expired or
+        was given up goes to the first worker that asks.
+        param gameId: the id of the game, see schedule.makeGameId().
+        param anyWorker: True to take a game no worker ever leased, e.g.
+        because the worker it belongs to does not track its teams.
+        return: True if this worker should follow the game, False otherwise.
+        """
+        def claim(connection, now):
+            row = connection.execute('SELECT worker, expires, done FROM leases WHERE gameId = ?',
+                                     (gameId,)).fetchone()
+            if row is not None:
+                worker, expires, done = row
+                if done or (expires >= now and worker != self.workerId):
+                    return False
+            elif not anyWorker:
+                workers = set(self.liveWorkers(connection, now)) | {self.workerId}
+                if preferredWorker(gameId, workers) != self.workerId:
+                    return False
+            connection.execute('INSERT OR REPLACE INTO leases VALUES (?, ?, ?, 0)',
+                               (gameId, self.workerId, now + self.ttl))
+            self.held.add(gameId)
+            return True
+
+        return self.transaction(claim)
+
+    def holds(self, gameId) -> bool:
+        """
+        This function checks that this worker still holds the lease of a game,
+        as of the last heartbeat. If the heartbeats stopped going through the
+        lease is given up a margin before the other workers may take it over,
+        so two workers never text the same game.
+        """
+        lastBeat = self.lastBeat
+        if lastBeat is None or time.monotonic() - lastBeat > self.ttl * (1 - HEARTBEAT_MARGIN):
+            return False
+        return gameId in self.held
+
+    def isDone(self, gameId) -> bool:
+        """
+        This function checks if some worker followed a game until it was over.
+        """
+        with self.lock:
+            row = self.connection.execute('SELECT done FROM leases WHERE gameId = ?', (gameId,)).fetchone()
+        return bool(row and row[0])
+
+    def finish(self, gameId):
+        """
+        This function marks a game as over so no worker takes it over.
+        param gameId: the id of a game this worker holds.
+        """
+        self.held.discard(gameId)
+        self.transaction(lambda connection, now: connection.execute(
+            'UPDATE leases SET done = 1 WHERE gameId = ? AND worker = ?', (gameId, self.workerId)))
+
+    def release(self, gameId):
+        """
+        This function gives up the lease of a game that is not over, so
+        another worker can take it over right away.
+        param gameId: the id of a game this worker holds.
+        """
+        self.held.discard(gameId)
+        self.transaction(lambda connection, now: connection.execute(
+            'UPDATE leases SET expires = 0 WHERE gameId = ? AND worker = ? AND done = 0', (gameId, self.workerId)))
+
+    def heartbeat(self):
+        """
+        This function tells the other workers this one is alive and renews the
+        leases it still holds. A lease that was taken over while this worker
+        was not heartbeating is dropped from held.
+        """
+        def heartbeat(connection, now):
+            connection.execute('INSERT OR REPLACE INTO workers VALUES (?, ?)', (self.workerId, now))
+            connection.execute('UPDATE leases SET expires = ? WHERE worker = ? AND done = 0',
+                               (now + self.ttl, self.workerId))
+            rows = connection.execute('SELECT gameId FROM leases WHERE worker = ? AND done = 0', (self.workerId,))
+            self.held &= {row[0] for row in rows}
+
+        # Measured from before the transaction, which may have waited on the database.
+        started = time.monotonic()
+        self.transaction(heartbeat)
+        self.lastBeat = started
+
+    def beat(self):
+        while not self.stopping.wait(self.ttl / 3):
+            try:
+                self.heartbeat()
+            except sqlite3.Error as exc:
+                print('Could not heartbeat: ' + repr(exc)) # The leases expire if this keeps failing.
+
+    def start(self):
+        """
+        This function registers the worker and starts heartbeating. It waits
+        for one heartbeat so workers started together see each other before
+        the first games are shared out.
+        """
+        self.heartbeat()
+        self.thread = threading.Thread(target=self.beat, daemon=True)
+        self.thread.start()
+        time.sleep(self.ttl / 3)
+
+    def stop(self):
+        """
+        This function stops heartbeating and hands the games this worker
+        still holds to the other workers.
+        """
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+        for gameId in list(self.held):
+            self.release(gameId)
+        self.transaction(lambda connection, now: connection.execute(
+            'DELETE FROM workers WHERE worker = ?', (self.workerId,)))
+
+    def status(self) -> list:
+        """
+        This function lists the leases of every game.
+        return: a list of (gameId, worker, seconds until the lease expires, done).
+        """
+        now = self.clock()
+        with self.lock:
+            rows = self.connection.execute('SELECT gameId, worker, expires, done FROM leases ORDER BY gameId').fetchall()
+        return [(gameId, worker, expires - now, bool(done)) for gameId, worker, expires, done in rows]
+
+class LeasedGameFeed(GameFeed):
+    """
+    Wraps the feed of a game and ends it as soon as this worker loses the
+    game's lease, so two workers never text the same game.
+    """
+
+    def __init__(self, feed, coordinator, gameId):
+        self.feed = feed
+        self.coordinator = coordinator
+        self.gameId = gameId
+
+    @property
+    def kind(self):
+        return self.feed.kind
+
+    @property
+    def lastDocument(self):
+        return self.feed.lastDocument
+
+    def open(self, team, startTime) -> bool:
+        return self.feed.open(team, startTime)
+
+    def fetch(self):
+        if not self.coordinator.holds(self.gameId):
+            raise GameFeedEnded('Game ' + self.gameId + ' was taken over by another worker')
+        return self.feed.fetch()
+
+    def close(self):
+        self.feed.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs several trackers that share the games between them.')
+    parser.add_argument('--workers', type=int, default=2, help='tracker processes to run')
+    parser.add_argument('--leases', default=LEASE_PATH, help='the lease database the workers share')
+    parser.add_argument('--status', action='store_true', help='print who holds which game and exit')
+    args, trackerArgs = parser.parse_known_args()
+
+    if args.status:
+        for gameId, worker, expiresIn, done in Coordinator(args.leases, workerId='status').status():
+            state = 'done' if done else ('expires in %.0fs' % expiresIn if expiresIn > 0 else 'expired')
+            print('%-40s %-30s %s' % (gameId, worker, state))
+        return
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseballUpdates.py')
+    workers = []
+    for number in range(args.workers):
+        command = [sys.executable, script, '--coordinate', args.leases,
+                   '--worker-id', getWorkerId() + '-' + str(number)] + trackerArgs
+        workers.append(subprocess.Popen(command, stdin=subprocess.DEVNULL))
+    try:
+        for worker in workers:
+            worker.wait()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+#! /usr/bin/env python3
+# daemon.py - A local http api to change what a running tracker follows and
+# who it texts, without restarting it.
+# Usage: python3 daemon.py games | teams | add TEAM... | remove TEAM... | reload
+#        python3 daemon.py subscribers | subscribe TEAM NUMBER [PREFERENCE] | unsubscribe TEAM NUMBER
+
+import argparse, http.server, json, sys, threading, urllib.error, urllib.request
+
+CONTROL_PORT = 9109 # Port of the control api, next to the metrics.
+
+def teamNames(body) -> list:
+    # The teams of a request, a list or a string separated by commas.
+    teams = body['teams']
+    return teams.split(',') if isinstance(teams, str) else list(teams)
+
+class ControlHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves the control api of a tracker:
+    GET /games                                       the games being followed
+    GET /teams, POST /teams, DELETE /teams           {"teams": [...]}
+    GET /subscribers, POST /subscribers, DELETE /subscribers
+                                                     {"team": ..., "recipient": ..., "preference": ...}
+    POST /reload                                     loads the schedules again
+    Every request runs on its own thread, so loading a schedule never holds
+    up the games being polled.
+    """
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def handle_request(self, method):
+        route = (method, self.path.split('?')[0].rstrip('/'))
+        handler = self.server.control.routes.get(route)
+        if handler is None:
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            result = handler(body)
+        except KeyError as exc:
+            self.reply(400, {'error': 'Unknown team or field: ' + str(exc)})
+            return
+        except ValueError as exc:
+            self.reply(400, {'error': str(exc)})
+            return
+        self.reply(200, result)
+
+    def reply(self, code, document):
+        body = (json.dumps(document, indent=2) + '\n').encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # The changes are printed by the control itself.
+
+class TrackerControl:
+    """
+    The changes the control api can make to a running GameTracker and its
+    SubscriptionRegistry. Both are safe to change from other threads.
+    """
+
+    def __init__(self, tracker, registry, subscribersPath=None, defaultRecipient=None):
+        """
+        param tracker: the GameTracker or AsyncGameTracker being run.
+        param registry: the SubscriptionRegistry it texts.
+        param subscribersPath: the file the subscriptions were loaded from,
+        saved after every change so they survive a restart. Not saved if None.
+        param defaultRecipient: the phone number subscribed to the teams
+        added, when the subscriptions are not kept in a file.
+        """
+        self.tracker = tracker
+        self.registry = registry
+        self.subscribersPath = subscribersPath
+        self.defaultRecipient = defaultRecipient
+        self.lock = threading.Lock() # One change at a time.
+        self.routes = {
+            ('GET', '/games'): self.games,
+            ('GET', '/teams'): self.teams,
+            ('POST', '/teams'): self.addTeams,
+            ('DELETE', '/teams'): self.removeTeams,
+            ('GET', '/subscribers'): self.subscribers,
+            ('POST', '/subscribers'): self.subscribe,
+            ('DELETE', '/subscribers'): self.unsubscribe,
+            ('POST', '/reload'): self.reload,
+        }
+
+    def games(self, body):
+        return {'games': self.tracker.gameStates()}
+
+    def teams(self, body):
+        return {'teams': self.tracker.teams}
+
+    def addTeams(self, body):
+        with self.lock:
+            added = self.tracker.addTeams(teamNames(body))
+            if self.defaultRecipient is not None:
+                for team in added:
+                    self.registry.subscribe(team, self.defaultRecipient)
+        if added:
+            print('Now tracking ' + ', '.join(added))
+        return {'added': added, 'teams': self.tracker.teams}
+
+    def removeTeams(self, body):
+        with self.lock:
+            removed = self.tracker.removeTeams(teamNames(body))
+        if removed:
+            print('No longer tracking ' + ', '.join(removed))
+        return {'removed': removed, 'teams': self.tracker.teams}
+
+    def subscribers(self, body):
+        return {'subscribers': [{'team': team, 'recipient': recipient, 'preference': preference}
+                                for team, recipient, preference in self.registry.rows()]}
+
+    def subscribe(self, body):
+        # A subscriber to a team that is not tracked yet starts tracking it.
+        with self.lock:
+            added = self.tracker.addTeams([body['team']])
+            self.registry.subscribe(body['team'], body['recipient'], body.get('preference', 'ALL'))
+            self.save()
+        return {'added': added, 'teams': self.tracker.teams}
+
+    def unsubscribe(self, body):
+        with self.lock:
+            self.registry.unsubscribe(body['team'], body['recipient'])
+            self.save()
+        return {}
+
+    def reload(self, body):
+        with self.lock:
+            games = self.tracker.reload()
+        return {'games': games}
+
+    def save(self):
+        if self.subscribersPath is not None:
+            self.registry.save(self.subscribersPath)
+
+def serveControl(control, port=CONTROL_PORT, host='127.0.0.1'):
+    """
+    This function serves the control api at http://host:port/ from a
+    background thread.
+    param control: the TrackerControl the requests are made to.
+    param port: the port to listen on, 0 picks a free one.
+    param host: the address to listen on, only this machine by default
+    since the api is not authenticated.
+    return: the ThreadingHTTPServer, call shutdown() to stop it.
+    """
+    server = http.server.ThreadingHTTPServer((host, port), ControlHandler)
+    server.daemon_threads = True
+    server.control = control
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def request(port, method, path, document=None):
+    """
+    This function makes a request to the control api of a running tracker.
+    param port: the port the api listens on.
+    param method: 'GET', 'POST' or 'DELETE'.
+    param path: e.g. '/teams'.
+    param document: the json body of the request.
+    return: the json response.
+    """
+    data = json.dumps(document).encode() if document is not None else None
+    req = urllib.request.Request('http://127.0.0.1:' + str(port) + path, data=data, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=120) as res:
+            return json.load(res)
+    except urllib.error.HTTPError as exc:
+        sys.exit(json.load(exc).get('error', str(exc)))
+
+def main():
+    parser = argparse.ArgumentParser(description='Changes what a tracker started with --daemon follows.')
+    parser.add_argument('--port', type=int, default=CONTROL_PORT, help='the port of the control api')
+    parser.add_argument('command', choices=('games', 'teams', 'add', 'remove', 'reload',
+                                            'subscribers', 'subscribe', 'unsubscribe'))
+    parser.add_argument('args', nargs='*')
+    args = parser.parse_args()
+
+    commands = {
+        'games': ('GET', '/games', None),
+        'teams': ('GET', '/teams', None),
+        'add': ('POST', '/teams', {'teams': args.args}),
+        'remove': ('DELETE', '/teams', {'teams': args.args}),
+        'reload': ('POST', '/reload', None),
+        'subscribers': ('GET', '/subscribers', None),
+        'subscribe': ('POST', '/subscribers', dict(zip(('team', 'recipient', 'preference'), args.args))),
+        'unsubscribe': ('DELETE', '/subscribers', dict(zip(('team', 'recipient'), args.args))),
+    }
+    method, path, document = commands[args.command]
+    print(json.dumps(request(args.port, method, path, document), indent=2))
+
+if __name__ == '__main__':
+    main()
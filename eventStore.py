@@ -0,0 +1,356 @@
+#! /usr/bin/env python3
+# eventStore.py - Keeps every event the tracker finds, in columns on disk,
+# partitioned by date and home team, so past games can be queried.
+# Usage: python3 eventStore.py [--team TEAM] [--since DATE] [--until DATE]
+#        [--kind KIND] [--min-inning N] [--max-inning N] [--export FILE]
+
+import argparse, array, csv, datetime, json, os, sys, threading, time
+from pollScheduler import getInningNumber
+from teamIds import canonicalTeam
+
+EVENT_STORE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'mlb-game-tracker', 'events')
+FLUSH_INTERVAL = 30 # Most time an event waits in memory before it is written (seconds).
+FLUSH_ROWS = 5000 # Events waiting that make the writer flush right away.
+COMPACT_SEGMENTS = 16 # Segments a partition can have before they are merged into one.
+
+# The columns of every segment and their array typecode. 'S' columns hold
+# strings, stored as indexes into the distinct values of the segment.
+COLUMNS = (
+    ('time', 'd'), # When the event was found, seconds since the epoch.
+    ('gameId', 'S'),
+    ('homeTeam', 'S'),
+    ('awayTeam', 'S'),
+    ('sequence', 'I'),
+    ('kind', 'S'), # The GameEvent class, e.g. 'RunScored'.
+    ('inning', 'h'), # The number of the inning, 0 if not known.
+    ('half', 'S'), # 'TOP', 'BOTTOM', 'MIDDLE' or 'END', '' if not known.
+    ('homeRuns', 'h'), # -1 if not known.
+    ('awayRuns', 'h'),
+    ('leader', 'S'), # 'HOME' or 'AWAY' for a LeadChange.
+    ('play', 'S'), # The description of a RunScored, or the message of a SituationAlert.
+)
+COLUMN_NAMES = tuple(name for name, typecode in COLUMNS)
+INDEX_TYPECODE = 'I' # Typecode of the indexes of 'S' columns.
+
+def eventRow(gameId, event, now) -> tuple:
+    """
+    This function flattens an event into a row of the store.
+    param gameId: the id of the game, see schedule.makeGameId().
+    param event: GameEvent object.
+    param now: when the event was found, seconds since the epoch.
+    return: a tuple with a value for each of COLUMNS.
+    """
+    snapshot = event.snapshot
+    kind = type(event).__name__
+    if kind == 'RunScored':
+        inningText = event.playInning
+    elif kind == 'InningEnded':
+        inningText = event.inning
+    else:
+        inningText = snapshot.inning
+    inning = getInningNumber(inningText) or 0
+    half = inningText.split()[0].upper() if inning else ''
+    return (now, gameId, canonicalTeam(snapshot.homeTeam), canonicalTeam(snapshot.awayTeam),
+            event.sequence, kind, inning, half,
+            -1 if snapshot.homeRuns is None else snapshot.homeRuns,
+            -1 if snapshot.awayRuns is None else snapshot.awayRuns,
+            getattr(event, 'leader', ''), getattr(event, 'play', None) or getattr(event, 'message', ''))
+
+def writeSegment(path, rows):
+    """
+    This function writes rows to a segment file: a json header line with the
+    size of each column, followed by the columns one after the other. The
+    file is written next to path and renamed, so readers never see half of it.
+    param path: the segment file.
+    param rows: a list of tuples as made by eventRow().
+    """
+    header = {'rows': len(rows), 'byteorder': sys.byteorder, 'columns': []}
+    blobs = []
+    for (name, typecode), values in zip(COLUMNS, zip(*rows)):
+        if typecode == 'S':
+            distinct = sorted(set(values))
+            indexes = {value: index for index, value in enumerate(distinct)}
+            column = array.array(INDEX_TYPECODE, [indexes[value] for value in values])
+            header['columns'].append([name, typecode, len(column) * column.itemsize, distinct])
+        else:
+            column = array.array(typecode, values)
+            header['columns'].append([name, typecode, len(column) * column.itemsize, None])
+        blobs.append(column.tobytes())
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as segmentFile:
+        segmentFile.write(json.dumps(header).encode() + b'\n')
+        for blob in blobs:
+            segmentFile.write(blob)
+    os.replace(temporary, path)
+
+class Segment:
+    """
+    A segment file opened for reading. Only the header is read when it is
+    opened, each column is read the first time it is asked for.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        header = json.loads(self.file.readline())
+        self.rows = header['rows']
+        self.swap = header['byteorder'] != sys.byteorder
+        self.columns = {}
+        offset = self.file.tell()
+        for name, typecode, size, distinct in header['columns']:
+            self.columns[name] = (typecode, offset, size, distinct)
+            offset += size
+
+    def distinct(self, name) -> list:
+        """
+        This function gets the distinct values of a string column without reading it.
+        """
+        return self.columns[name][3]
+
+    def read(self, name, decode=True):
+        """
+        This function reads a column.
+        param name: one of COLUMN_NAMES.
+        param decode: False to get the indexes of a string column instead of its values.
+        return: an array, or a list for a decoded string column.
+        """
+        typecode, offset, size, distinct = self.columns[name]
+        column = array.array(INDEX_TYPECODE if typecode == 'S' else typecode)
+        self.file.seek(offset)
+        column.frombytes(self.file.read(size))
+        if self.swap:
+            column.byteswap()
+        if typecode == 'S' and decode:
+            return [distinct[index] for index in column]
+        return column
+
+    def close(self):
+        self.file.close()
+
+class EventStore:
+    """
+    An append-only store of game events. Rows are kept in memory and written
+    by a background thread every FLUSH_INTERVAL, so appending costs the
+    tracking loop a list append. Each flush writes one segment per partition
+    (date/HOMETEAM directories), and a partition's segments are merged once
+    there are COMPACT_SEGMENTS of them. Several processes can share a store.
+    """
+
+    def __init__(self, path=EVENT_STORE_PATH, flushInterval=FLUSH_INTERVAL, clock=time.time):
+        """
+        param path: the directory of the store.
+        param flushInterval: most seconds an event waits before it is written,
+        no thread is started if None and rows are only written by flush().
+        param clock: function returning the current time in seconds.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.clock = clock
+        self.pending = {} # (date, home team) -> rows not written yet.
+        self.pendingRows = 0
+        self.lock = threading.Lock()
+        self.writeLock = threading.Lock() # Held while segments are written.
+        self.wakeUp = threading.Event()
+        self.stopping = False
+        self.written = 0 # Segments written by this object, makes their names unique.
+        self.thread = None
+        if flushInterval is not None:
+            self.thread = threading.Thread(target=self.work, args=(flushInterval,), daemon=True)
+            self.thread.start()
+
+    def append(self, gameId, startTime, events):
+        """
+        This function adds the events found in a game.
+        param gameId: the id of the game, see schedule.makeGameId().
+        param startTime: the time the game starts, the day it is filed under.
+        param events: the GameEvent objects, in the order they happened.
+        """
+        if not events:
+            return
+        now = self.clock()
+        rows = [eventRow(gameId, event, now) for event in events]
+        key = (startTime.date().isoformat(), rows[0][2])
+        with self.lock:
+            self.pending.setdefault(key, []).extend(rows)
+            self.pendingRows += len(rows)
+            full = self.pendingRows >= FLUSH_ROWS
+        if full:
+            self.wakeUp.set()
+
+    def work(self, flushInterval):
+        while not self.stopping:
+            self.wakeUp.wait(flushInterval)
+            self.wakeUp.clear()
+            try:
+                self.flush()
+            except OSError as exc:
+                print('Could not save events: ' + repr(exc)) # Kept in memory and tried again.
+
+    def flush(self):
+        """
+        This function writes the events appended so far.
+        """
+        with self.writeLock:
+            with self.lock:
+                pending, self.pending, self.pendingRows = self.pending, {}, 0
+            for index, ((date, team), rows) in enumerate(sorted(pending.items())):
+                try:
+                    self.writePartition(date, team, rows)
+                except OSError:
+                    with self.lock: # Put back what was not written.
+                        for key, keyRows in sorted(pending.items())[index:]:
+                            self.pending[key] = keyRows + self.pending.get(key, [])
+                            self.pendingRows += len(keyRows)
+                    raise
+
+    def writePartition(self, date, team, rows):
+        directory = os.path.join(self.path, date, team)
+        os.makedirs(directory, exist_ok=True)
+        self.written += 1
+        name = '%d-%d-%d.seg' % (time.time_ns(), os.getpid(), self.written)
+        writeSegment(os.path.join(directory, name), rows)
+
+        # Only this process's segments are merged, another one may be merging its own.
+        suffix = '-' + str(os.getpid()) + '-'
+        ownSegments = sorted(name for name in os.listdir(directory) if name.endswith('.seg') and suffix in name)
+        if len(ownSegments) >= COMPACT_SEGMENTS:
+            self.compact(directory, ownSegments)
+
+    def compact(self, directory, names):
+        """
+        This function merges segments of a partition into one.
+        param directory: the directory of the partition.
+        param names: the segments to merge, oldest first.
+        """
+        rows = []
+        for name in names:
+            segment = Segment(os.path.join(directory, name))
+            try:
+                rows.extend(zip(*(segment.read(column) for column in COLUMN_NAMES)))
+            finally:
+                segment.close()
+        # Named after the newest segment it replaces, so it sorts in its place.
+        merged = os.path.join(directory, names[-1][:-len('.seg')] + '-merged.seg')
+        writeSegment(merged, rows)
+        for name in names:
+            if name != os.path.basename(merged):
+                os.remove(os.path.join(directory, name))
+
+    def partitions(self, start=None, end=None):
+        # The (date, team, directory) of every partition between start and end.
+        start = start.isoformat() if start is not None else ''
+        end = end.isoformat() if end is not None else '9999'
+        for date in sorted(os.listdir(self.path)):
+            if start <= date <= end:
+                dateDirectory = os.path.join(self.path, date)
+                for team in sorted(os.listdir(dateDirectory)):
+                    yield date, team, os.path.join(dateDirectory, team)
+
+    def query(self, teams=None, start=None, end=None, kinds=None, minInning=None, maxInning=None) -> list:
+        """
+        This function finds the events written to the store, e.g. every
+        go-ahead run in the 8th or later this week with
+        query(start=weekAgo, kinds=['LeadChange'], minInning=8).
+        Partitions outside the dates and segments without the teams are
+        skipped without reading their columns.
+        param teams: only the games of these teams, home or away, every team if None.
+        param start: the first day, a datetime.date, included.
+        param end: the last day, included.
+        param kinds: only these GameEvent classes, e.g. ['RunScored'].
+        param minInning: only events in this inning or later.
+        param maxInning: only events in this inning or earlier.
+        return: a list of dictionaries of column to value, with the date
+        of the game, by date and game in the order the events happened.
+        """
+        teams = {canonicalTeam(team) for team in teams} if teams is not None else None
+        kinds = set(kinds) if kinds is not None else None
+        results = []
+        for date, team, directory in self.partitions(start, end):
+            for name in sorted(name for name in os.listdir(directory) if name.endswith('.seg')):
+                segment = Segment(os.path.join(directory, name))
+                try:
+                    results.extend(self.scan(segment, date, team, teams, kinds, minInning, maxInning))
+                finally:
+                    segment.close()
+        results.sort(key=lambda row: (row['date'], row['gameId'], row['sequence']))
+        return results
+
+    def scan(self, segment, date, team, teams, kinds, minInning, maxInning) -> list:
+        # The rows of one segment that match, reading the filtered columns first.
+        if teams is not None and team not in teams and not teams.intersection(segment.distinct('awayTeam')):
+            return []
+        matches = range(segment.rows)
+        if teams is not None and team not in teams:
+            wanted = {index for index, value in enumerate(segment.distinct('awayTeam')) if value in teams}
+            awayTeams = segment.read('awayTeam', decode=False)
+            matches = [row for row in matches if awayTeams[row] in wanted]
+        if kinds is not None:
+            wanted = {index for index, value in enumerate(segment.distinct('kind')) if value in kinds}
+            if not wanted:
+                return []
+            kindColumn = segment.read('kind', decode=False)
+            matches = [row for row in matches if kindColumn[row] in wanted]
+        if minInning is not None or maxInning is not None:
+            low = minInning if minInning is not None else 0
+            high = maxInning if maxInning is not None else sys.maxsize
+            innings = segment.read('inning')
+            matches = [row for row in matches if low <= innings[row] <= high]
+        if not matches:
+            return []
+        columns = {name: segment.read(name) for name in COLUMN_NAMES}
+        return [dict({name: column[row] for name, column in columns.items()}, date=date) for row in matches]
+
+    def close(self):
+        """
+        This function writes what is left and stops the writer.
+        """
+        self.stopping = True
+        self.wakeUp.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+
+def export(rows, path):
+    """
+    This function saves query results for other tools. A .parquet file needs
+    pyarrow, anything else is written as csv.
+    param rows: a list of dictionaries as returned by EventStore.query().
+    param path: the file to write.
+    """
+    fields = ('date',) + COLUMN_NAMES
+    if path.endswith('.parquet'):
+        import pyarrow, pyarrow.parquet # Only needed for parquet.
+        table = pyarrow.table({field: [row[field] for row in rows] for field in fields})
+        pyarrow.parquet.write_table(table, path)
+        return
+    with open(path, 'w', newline='') as csvFile:
+        writer = csv.DictWriter(csvFile, fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description='Queries the events of past games.')
+    parser.add_argument('--store', default=EVENT_STORE_PATH, help='the event store directory (default %(default)s)')
+    parser.add_argument('--team', action='append', help='only the games of this team, can be repeated')
+    parser.add_argument('--since', type=datetime.date.fromisoformat, help='first day, e.g. 2020-08-01')
+    parser.add_argument('--until', type=datetime.date.fromisoformat, help='last day')
+    parser.add_argument('--kind', action='append', help='only this kind of event, e.g. LeadChange, can be repeated')
+    parser.add_argument('--min-inning', type=int)
+    parser.add_argument('--max-inning', type=int)
+    parser.add_argument('--export', metavar='FILE', help='write the events to a .parquet or .csv file instead')
+    args = parser.parse_args()
+
+    store = EventStore(args.store, flushInterval=None)
+    start = time.perf_counter()
+    rows = store.query(args.team, args.since, args.until, args.kind, args.min_inning, args.max_inning)
+    elapsed = time.perf_counter() - start
+    if args.export:
+        export(rows, args.export)
+    else:
+        for row in rows:
+            score = '%s %d %s %d' % (row['awayTeam'], row['awayRuns'], row['homeTeam'], row['homeRuns'])
+            inning = (row['half'].title() + ' ' + str(row['inning'])) if row['inning'] else ''
+            print('%s  %-11s %-10s %-28s %s' % (row['date'], row['kind'], inning, score, row['play'] or row['leader']))
+    print('%d events in %.3f s' % (len(rows), elapsed), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#! /usr/bin/env python3
+# gameEvents.py - Turns successive snapshots of a game into the events the user is told about.
+
+from pageSelectors import NUMBER
+
+class GameEvent:
+    """
+    Something that happened in a game. sequence numbers the events of a game
+    in the order they were found, starting at 1. snapshot is the GameSnapshot
+    the event was found in.
+    """
+    __slots__ = ('sequence', 'snapshot')
+
+    def __init__(self, sequence, snapshot):
+        self.sequence = sequence
+        self.snapshot = snapshot
+
+    def __repr__(self):
+        names = [name for cls in reversed(type(self).__mro__) for name in getattr(cls, '__slots__', ())]
+        values = ', '.join(name + '=' + repr(getattr(self, name)) for name in names if name != 'snapshot')
+        return type(self).__name__ + '(' + values + ')'
+
+class RunScored(GameEvent):
+    """A new scoring play. playId is the id the feed gave the play."""
+    __slots__ = ('playId', 'playInning', 'play')
+
+    def __init__(self, sequence, snapshot, playId, playInning, play):
+        super().__init__(sequence, snapshot)
+        self.playId = playId
+        self.playInning = playInning
+        self.play = play
+
+class InningEnded(GameEvent):
+    """An inning (or half inning) ended. inning is the inning as the feed shows it."""
+    __slots__ = ('inning',)
+
+    def __init__(self, sequence, snapshot, inning):
+        super().__init__(sequence, snapshot)
+        self.inning = inning
+
+class GameFinal(GameEvent):
+    """The game is over."""
+    __slots__ = ()
+
+class Postponed(GameEvent):
+    """The game was postponed or cancelled."""
+    __slots__ = ()
+
+class LeadChange(GameEvent):
+    """A team took the lead. leader is 'HOME' or 'AWAY'."""
+    __slots__ = ('leader',)
+
+    def __init__(self, sequence, snapshot, leader):
+        super().__init__(sequence, snapshot)
+        self.leader = leader
+
+class SituationAlert(GameEvent):
+    """
+    A situation worth a text, e.g. a close game late. alert is the name of
+    the rule that matched, key tells apart the times the same rule matches
+    in a game, message is the text and winProbability the chance the home
+    team wins.
+    """
+    __slots__ = ('alert', 'key', 'message', 'winProbability')
+
+    def __init__(self, sequence, snapshot, alert, key, message, winProbability):
+        super().__init__(sequence, snapshot)
+        self.alert = alert
+        self.key = key
+        self.message = message
+        self.winProbability = winProbability
+
+def isGameOver(inning, home_runs, away_runs) -> bool:
+    """
+    This function checks to see if the game is over at the end of a half
+    inning, from the score alone. EventDiffer.diff() only calls it when the
+    snapshot's status is not already 'FINAL', since the page might not refresh
+    to say the game is over. After the top (or middle) of the 9th inning or
+    later the game is over only if the home team leads, after the bottom if
+    the score is not tied.
+    param inning: the half inning that just ended (e.g. 'Top 9th'), or
+    'Game Over'/'Final' which always end the game.
+    param home_runs: the current runs scored by the home team.
+    param away_runs: the current runs scored by the away team.
+    return: True if the game is over, False otherwise.
+    """
+    if inning.upper() == 'GAME OVER' or inning.upper() == 'FINAL':
+        return True
+    inningMatch = NUMBER.search(inning)
+    if not inningMatch or int(inningMatch.group()) < 9 or home_runs is None or away_runs is None:
+        return False
+    # After the top of the 9th the home team still bats unless it is ahead.
+    if inning.upper().startswith(('TOP', 'MID')):
+        return home_runs > away_runs
+    return home_runs != away_runs
+
+def getLeader(snapshot):
+    """
+    This function finds the team that is ahead.
+    param snapshot: GameSnapshot object.
+    return: 'HOME', 'AWAY', or None if the game is tied or the score is not known.
+    """
+    if snapshot.homeRuns is None or snapshot.awayRuns is None:
+        return None
+    if snapshot.homeRuns > snapshot.awayRuns:
+        return 'HOME'
+    if snapshot.awayRuns > snapshot.homeRuns:
+        return 'AWAY'
+    return None
+
+class EventDiffer:
+    """
+    Compares each snapshot of a game with the one before it and returns the
+    events that happened in between. Only the plays added since the last
+    snapshot are looked at, so each snapshot costs O(new plays).
+    """
+
+    def __init__(self):
+        self.previous = None
+        self.sequence = 0
+        self.seenPlays = set()
+        self.previousInning = None
+        self.endedInnings = set() # Innings already ended, each is only reported once.
+        self.firedAlerts = set() # (alert, key) of the SituationAlerts already found.
+        self.leader = None
+        self.final = False
+        self.postponed = False
+
+    def nextSequence(self) -> int:
+        self.sequence += 1
+        return self.sequence
+
+    def newPlays(self, snapshot) -> list:
+        """
+        This function finds the plays of the snapshot that were not seen before.
+        Feeds list plays oldest first, so we walk back from the newest play until
+        we reach one we have already seen.
+        param snapshot: GameSnapshot object.
+        return: the new plays, oldest first.
+        """
+        plays = []
+        for play in reversed(snapshot.plays):
+            if play[0] in self.seenPlays:
+                break
+            plays.append(play)
+        plays.reverse()
+        return plays
+
+    def diff(self, snapshot) -> list:
+        """
+        This function finds the events between the last snapshot and this one.
+        param snapshot: GameSnapshot object.
+        return: a list of GameEvent objects, in the order they happened.
+        """
+        if snapshot == self.previous or self.final or self.postponed:
+            return []
+        self.previous = snapshot
+        events = []
+
+        if snapshot.status == 'POSTPONED':
+            self.postponed = True
+            return [Postponed(self.nextSequence(), snapshot)]
+
+        for playId, playInning, play in self.newPlays(snapshot):
+            self.seenPlays.add(playId)
+            events.append(RunScored(self.nextSequence(), snapshot, playId, playInning, play))
+
+        leader = getLeader(snapshot)
+        if leader is not None and leader != self.leader:
+            events.append(LeadChange(self.nextSequence(), snapshot, leader))
+        # A tie clears the lead, so a go-ahead run after it is a lead change
+        # even for the team that led before.
+        if snapshot.homeRuns is not None and snapshot.awayRuns is not None:
+            self.leader = leader
+
+        if snapshot.inningOver:
+            inning = snapshot.inning
+            if inning not in self.endedInnings and inning != 'N/A':
+                if snapshot.status == 'FINAL' or isGameOver(inning, snapshot.homeRuns, snapshot.awayRuns):
+                    self.final = True
+                    events.append(GameFinal(self.nextSequence(), snapshot))
+                else:
+                    events.append(InningEnded(self.nextSequence(), snapshot, inning))
+                self.previousInning = inning
+                self.endedInnings.add(inning)
+        elif snapshot.status == 'FINAL':
+            self.final = True
+            events.append(GameFinal(self.nextSequence(), snapshot))
+
+        return events
+
+def getGameStatus(differ) -> str:
+    """
+    This function gets the status of a game from the events found so far.
+    param differ: the EventDiffer of the game.
+    return: 'POSTPONED', 'FINAL' or 'LIVE'.
+    """
+    if differ.postponed:
+        return 'POSTPONED'
+    return 'FINAL' if differ.final else 'LIVE'
+
+def replay(snapshots):
+    """
+    This function replays recorded snapshots of a game through a new EventDiffer.
+    param snapshots: the snapshots of one game, in the order they were taken.
+    return: a generator of the GameEvent objects found.
+    """
+    differ = EventDiffer()
+    for snapshot in snapshots:
+        yield from differ.diff(snapshot)
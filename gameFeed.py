@@ -0,0 +1,281 @@
+#! /usr/bin/env python3
+# gameFeed.py - Backends that the tracker reads the state of a live game from.
+
+import datetime, requests, requests.adapters
+from teamIds import teamId
+from gameSnapshot import GameSnapshot
+from metrics import metrics
+
+SCHEDULE_URL = 'https://statsapi.mlb.com/api/v1/schedule'
+LIVE_FEED_URL = 'https://statsapi.mlb.com/api/v1.1/game/{gamePk}/feed/live'
+
+# Only the parts of the live feed the tracker uses, keeps the document small.
+LIVE_FEED_FIELDS = ','.join([
+    'gameData', 'status', 'abstractGameState', 'detailedState', 'teams', 'home',
+    'away', 'teamName', 'liveData', 'linescore', 'currentInning',
+    'currentInningOrdinal', 'inningState', 'runs', 'plays', 'allPlays',
+    'scoringPlays', 'result', 'description', 'about', 'atBatIndex', 'halfInning',
+    'inning', 'outs', 'hits', 'offense', 'first', 'second', 'third', 'id'
+])
+
+# The bit of GameSnapshot.bases for a runner on each base of the linescore's offense.
+BASE_BITS = (('first', 1), ('second', 2), ('third', 4))
+
+HTTP_CONNECTIONS = 16 # Keep-alive connections kept open to each host.
+
+def makeSession(connections=HTTP_CONNECTIONS):
+    """
+    This function makes the session every game and schedule is downloaded
+    with, so they all share one pool of keep-alive connections.
+    param connections: the most connections kept open to each host, at least
+    the number of requests made at the same time.
+    return: a requests.Session object.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=connections)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+class GameFeedError(Exception):
+    """
+    Raised when a backend can not find or read a game. retryAfter is the
+    seconds to wait before polling again if the feed knows, e.g. while its
+    breaker is open, None to back off as usual.
+    """
+    retryAfter = None
+
+class GameFeedEnded(GameFeedError):
+    """Raised when a feed has nothing more to read, e.g. at the end of a recording."""
+
+class GameFeed:
+    """
+    Interface every backend implements. A feed is opened once per game, polled
+    with fetch() until the game is over and then closed. kind names the kind
+    of document the feed reads, and lastDocument is the document the last
+    fetch() parsed, so it can be recorded and replayed.
+    """
+    kind = None
+    lastDocument = None
+
+    def open(self, team, startTime) -> bool:
+        """
+        This function finds the game of the team that starts at startTime.
+        param team: the team, as used in teamPage and teamId.
+        param startTime: the time the game starts.
+        return: False if the game is postponed, True otherwise.
+        raise GameFeedError: if the game can not be found.
+        """
+        raise NotImplementedError
+
+    def fetch(self) -> GameSnapshot:
+        """
+        This function reads the current state of the game.
+        return: a GameSnapshot object.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        This function releases whatever the feed holds on to.
+        """
+
+def parseStatus(abstractState, detailedState) -> str:
+    """
+    This function turns the stats api game status into a GameSnapshot status.
+    param abstractState: 'Preview', 'Live' or 'Final'.
+    param detailedState: e.g. 'In Progress', 'Delayed: Rain', 'Postponed'.
+    return: the GameSnapshot status.
+    """
+    detailedState = detailedState.upper()
+    if 'POSTPONED' in detailedState or 'CANCELLED' in detailedState:
+        return 'POSTPONED'
+    if 'DELAY' in detailedState or 'SUSPENDED' in detailedState:
+        return 'DELAYED'
+    return {'PREVIEW': 'PREVIEW', 'LIVE': 'LIVE', 'FINAL': 'FINAL'}.get(abstractState.upper(), 'PREVIEW')
+
+def parseLiveFeed(document) -> GameSnapshot:
+    """
+    This function parses the live feed of a game in a single pass.
+    param document: the decoded json of the live feed.
+    return: a GameSnapshot object.
+    """
+    gameData = document.get('gameData', {})
+    liveData = document.get('liveData', {})
+    teams = gameData.get('teams', {})
+    linescore = liveData.get('linescore', {})
+    scores = linescore.get('teams', {})
+    gameStatus = gameData.get('status', {})
+
+    status = parseStatus(gameStatus.get('abstractGameState', ''), gameStatus.get('detailedState', ''))
+    inningState = linescore.get('inningState', '')
+    ordinal = linescore.get('currentInningOrdinal', '')
+
+    if status == 'FINAL':
+        inning = 'Final'
+    elif ordinal:
+        # In the middle of an inning the bottom half is the one about to start.
+        half = 'Top' if inningState == 'Top' else 'Bottom'
+        inning = half + ' ' + ordinal
+    else:
+        inning = 'N/A'
+
+    offense = linescore.get('offense', {})
+    bases = sum(bit for base, bit in BASE_BITS if offense.get(base))
+    # Between half innings the linescore still shows the last out and runners.
+    outs = linescore.get('outs')
+    if inningState in ('Middle', 'End'):
+        outs, bases = 0, 0
+
+    allPlays = liveData.get('plays', {}).get('allPlays', [])
+    plays = []
+    for index in liveData.get('plays', {}).get('scoringPlays', []):
+        if index >= len(allPlays):
+            continue
+        play = allPlays[index]
+        about = play.get('about', {})
+        playInning = (about.get('halfInning', '') + ' ' + str(about.get('inning', ''))).strip().upper()
+        description = ' '.join(play.get('result', {}).get('description', '').split())
+        plays.append((about.get('atBatIndex', index), playInning, description))
+
+    return GameSnapshot(
+        homeTeam=teams.get('home', {}).get('teamName', 'N/A').upper(),
+        awayTeam=teams.get('away', {}).get('teamName', 'N/A').upper(),
+        homeRuns=scores.get('home', {}).get('runs'),
+        awayRuns=scores.get('away', {}).get('runs'),
+        inning=inning,
+        # Only the end of an inning, like the page feed, so both text the same innings.
+        inningOver=status == 'FINAL' or inningState == 'End',
+        status=status,
+        plays=plays,
+        outs=outs,
+        bases=bases if outs is not None else None,
+        homeHits=scores.get('home', {}).get('hits'),
+        awayHits=scores.get('away', {}).get('hits'))
+
+def getGames(session, date, teams=None, timeout=10) -> list:
+    """
+    This function lists the games on a day with a single stats api request.
+    param session: the requests.Session to download with.
+    param date: the day, a datetime.date.
+    param teams: only list the games of these teams (as used in teamId), every game if None.
+    param timeout: seconds to wait for a response.
+    return: a list of (startTime, awayTeam, homeTeam, status) tuples in start
+    time order, startTime is in the local timezone and status is a
+    GameSnapshot status.
+    raise GameFeedError: if the schedule can not be loaded.
+    """
+    params = {'sportId': 1, 'date': date.strftime('%m/%d/%Y')}
+    try:
+        res = session.get(SCHEDULE_URL, params=params, timeout=timeout)
+        res.raise_for_status()
+        dates = res.json().get('dates', [])
+    except (requests.RequestException, ValueError) as exc:
+        raise GameFeedError('Could not load the schedule for ' + str(date)) from exc
+
+    ids = {teamId[team] for team in teams} if teams is not None else None
+    games = []
+    for game in (game for day in dates for game in day.get('games', [])):
+        away, home = game['teams']['away']['team'], game['teams']['home']['team']
+        if ids is not None and away.get('id') not in ids and home.get('id') not in ids:
+            continue
+        startTime = datetime.datetime.fromisoformat(game['gameDate'].replace('Z', '+00:00')).astimezone()
+        status = game.get('status', {})
+        games.append((startTime, away.get('name', 'N/A'), home.get('name', 'N/A'),
+                      parseStatus(status.get('abstractGameState', ''), status.get('detailedState', ''))))
+    return sorted(games)
+
+class HttpGameFeed(GameFeed):
+    """
+    Reads games from the MLB stats api. Every poll is one request for one json
+    document over a keep-alive session that can be shared by every game.
+    """
+    kind = 'statsapi'
+
+    def __init__(self, session=None, timeout=10):
+        """
+        param session: a requests.Session shared between feeds, one is made if None.
+        param timeout: seconds to wait for a response.
+        """
+        self.session = session if session is not None else requests.Session()
+        self.timeout = timeout
+        self.gamePk = None
+        self.lastDocument = None
+
+    def open(self, team, startTime) -> bool:
+        params = {'sportId': 1, 'teamId': teamId[team], 'date': startTime.strftime('%m/%d/%Y')}
+        try:
+            res = self.session.get(SCHEDULE_URL, params=params, timeout=self.timeout)
+            res.raise_for_status()
+            dates = res.json().get('dates', [])
+        except (requests.RequestException, ValueError) as exc:
+            raise GameFeedError('Could not load the schedule for ' + team) from exc
+
+        games = [game for date in dates for game in date.get('games', [])]
+        if not games:
+            raise GameFeedError('No game found for ' + team + ' on ' + str(startTime.date()))
+
+        # Pick the game closest to startTime, that way doubleheaders work.
+        start = startTime.astimezone(datetime.timezone.utc)
+        def distance(game):
+            gameDate = datetime.datetime.fromisoformat(game['gameDate'].replace('Z', '+00:00'))
+            return abs((gameDate - start).total_seconds())
+        game = min(games, key=distance)
+
+        self.gamePk = game['gamePk']
+        status = game.get('status', {})
+        return parseStatus(status.get('abstractGameState', ''), status.get('detailedState', '')) != 'POSTPONED'
+
+    def fetch(self) -> GameSnapshot:
+        url = LIVE_FEED_URL.format(gamePk=self.gamePk)
+        try:
+            with metrics.timer('request'):
+                res = self.session.get(url, params={'fields': LIVE_FEED_FIELDS}, timeout=self.timeout)
+                res.raise_for_status()
+                self.lastDocument = res.json()
+            with metrics.timer('parse'):
+                return parseLiveFeed(self.lastDocument)
+        except (requests.RequestException, ValueError) as exc:
+            raise GameFeedError('Could not load game ' + str(self.gamePk)) from exc
+
+class FallbackGameFeed(GameFeed):
+    """
+    Opens the game with the first backend that can find it, e.g. the stats api
+    first and the browser if that fails.
+    """
+
+    def __init__(self, *makeFeeds):
+        """
+        param makeFeeds: callables that return a new GameFeed, in order of preference.
+        """
+        self.makeFeeds = makeFeeds
+        self.feed = None
+
+    def open(self, team, startTime) -> bool:
+        error = GameFeedError('No backend to open the game with')
+        for makeFeed in self.makeFeeds:
+            feed = makeFeed()
+            try:
+                isOpen = feed.open(team, startTime)
+            except GameFeedError as exc:
+                feed.close()
+                error = exc
+                continue
+            self.feed = feed
+            return isOpen
+        raise error
+
+    @property
+    def kind(self):
+        return self.feed.kind if self.feed is not None else None
+
+    @property
+    def lastDocument(self):
+        return self.feed.lastDocument if self.feed is not None else None
+
+    def fetch(self) -> GameSnapshot:
+        return self.feed.fetch()
+
+    def close(self):
+        if self.feed is not None:
+            self.feed.close()
@@ -0,0 +1,117 @@
+#! /usr/bin/env python3
+# gameRecorder.py - Records the documents a game is read from and plays them
+# back, so the tracker can be tested and timed without a live game.
+
+import gzip, json, os, time
+from gameFeed import GameFeed, GameFeedEnded, parseLiveFeed
+from gameSnapshot import GameSnapshot, parsePageTexts
+
+# How each kind of recorded document is turned back into a snapshot.
+PARSERS = {
+    'statsapi': parseLiveFeed, # HttpGameFeed's live feed json.
+    'page': parsePageTexts, # SeleniumGameFeed's element texts.
+    'snapshot': GameSnapshot.fromDict, # Feeds that do not expose a document.
+}
+
+class GameRecorder:
+    """
+    Writes one json line per poll to a gzip file: the seconds since the
+    recording started, the kind of document and the document itself.
+    """
+
+    def __init__(self, path, clock=time.monotonic):
+        """
+        param path: the file to write, e.g. 'recordings/padres.jsonl.gz'.
+        param clock: function returning the current time in seconds.
+        """
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+        self.clock = clock
+        self.start = clock()
+
+    def record(self, kind, document):
+        line = {'t': round(self.clock() - self.start, 3), 'kind': kind, 'document': document}
+        self.file.write(json.dumps(line, separators=(',', ':')) + '\n')
+
+    def close(self):
+        self.file.close()
+
+def readRecording(path) -> list:
+    """
+    This function reads a recording made by GameRecorder.
+    param path: the recording.
+    return: a list of (seconds, kind, document) tuples.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as recording:
+        lines = [json.loads(line) for line in recording if line.strip()]
+    return [(line['t'], line['kind'], line['document']) for line in lines]
+
+class RecordingGameFeed(GameFeed):
+    """
+    Wraps another feed and records every document it reads.
+    """
+
+    def __init__(self, feed, directory):
+        """
+        param feed: the GameFeed to record.
+        param directory: where recordings are written, one file per game named
+        after the team and start time.
+        """
+        self.feed = feed
+        self.directory = directory
+        self.recorder = None
+
+    def open(self, team, startTime) -> bool:
+        isOpen = self.feed.open(team, startTime)
+        os.makedirs(self.directory, exist_ok=True)
+        name = team.replace(' ', '-').lower() + '-' + startTime.strftime('%Y%m%dT%H%M') + '.jsonl.gz'
+        self.recorder = GameRecorder(os.path.join(self.directory, name))
+        return isOpen
+
+    def fetch(self) -> GameSnapshot:
+        snapshot = self.feed.fetch()
+        kind, document = self.feed.kind, self.feed.lastDocument
+        if kind not in PARSERS or document is None:
+            kind, document = 'snapshot', snapshot.toDict()
+        self.recorder.record(kind, document)
+        return snapshot
+
+    def close(self):
+        self.feed.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+class ReplayGameFeed(GameFeed):
+    """
+    Plays a recording back through the same parsers the live feeds use.
+    With a speed, fetch() waits the recorded time between polls divided by
+    speed, otherwise it returns the next poll right away. Raises GameFeedEnded
+    once the recording is over.
+    """
+
+    def __init__(self, recording, speed=None, sleep=time.sleep):
+        """
+        param recording: the path of a recording, or a list from readRecording().
+        param speed: how many times faster than real time to play, None for
+        as fast as possible.
+        param sleep: the function used to wait between polls.
+        """
+        self.records = readRecording(recording) if isinstance(recording, str) else recording
+        self.speed = speed
+        self.sleep = sleep
+        self.position = 0
+        self.lastDocument = None
+        self.kind = None
+
+    def open(self, team, startTime) -> bool:
+        self.position = 0
+        return True
+
+    def fetch(self) -> GameSnapshot:
+        if self.position >= len(self.records):
+            raise GameFeedEnded('The recording is over')
+        seconds, kind, document = self.records[self.position]
+        if self.speed and self.position > 0:
+            self.sleep((seconds - self.records[self.position - 1][0]) / self.speed)
+        self.position += 1
+        self.kind, self.lastDocument = kind, document
+        return PARSERS[kind](document)
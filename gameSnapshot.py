@@ -0,0 +1,129 @@
+#! /usr/bin/env python3
+# gameSnapshot.py - Defines GameSnapshot, the state of a game at one point in time.
+
+from pageSelectors import SPACES
+
+class GameSnapshot:
+    """
+    An immutable snapshot of a game, read in one go from a single document.
+    homeRuns and awayRuns are None when they are not known.
+    inning is the current inning (e.g. 'Top 5th'), 'Final' or 'N/A'.
+    status is one of 'PREVIEW', 'LIVE', 'DELAYED', 'POSTPONED' or 'FINAL'.
+    plays is a tuple of (playId, playInning, description) for the scoring plays.
+    outs is the number of outs in the half inning, bases has a bit set for each
+    base with a runner (1 first, 2 second, 4 third), and homeHits and awayHits
+    are the hits of each team. They are None when the feed does not have them.
+    """
+    __slots__ = ('homeTeam', 'awayTeam', 'homeRuns', 'awayRuns', 'inning',
+                 'inningOver', 'status', 'plays', 'outs', 'bases', 'homeHits', 'awayHits')
+
+    def __init__(self, homeTeam, awayTeam, homeRuns, awayRuns, inning,
+                 inningOver, status, plays, outs=None, bases=None, homeHits=None, awayHits=None):
+        setField = object.__setattr__
+        setField(self, 'homeTeam', homeTeam)
+        setField(self, 'awayTeam', awayTeam)
+        setField(self, 'homeRuns', homeRuns)
+        setField(self, 'awayRuns', awayRuns)
+        setField(self, 'inning', inning)
+        setField(self, 'inningOver', inningOver)
+        setField(self, 'status', status)
+        setField(self, 'plays', tuple(plays))
+        setField(self, 'outs', outs)
+        setField(self, 'bases', bases)
+        setField(self, 'homeHits', homeHits)
+        setField(self, 'awayHits', awayHits)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('GameSnapshot is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('GameSnapshot is immutable')
+
+    def fields(self) -> tuple:
+        """
+        This function returns the values of every field, in __slots__ order.
+        """
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        if not isinstance(other, GameSnapshot):
+            return NotImplemented
+        return self.fields() == other.fields()
+
+    def __hash__(self):
+        return hash(self.fields())
+
+    def __repr__(self):
+        values = ', '.join(name + '=' + repr(getattr(self, name)) for name in self.__slots__)
+        return 'GameSnapshot(' + values + ')'
+
+    def toDict(self) -> dict:
+        """
+        This function turns the snapshot into a dictionary that can be saved as json.
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def fromDict(cls, fields):
+        """
+        This function makes a snapshot from a dictionary made by toDict()
+        and read back from json, where tuples became lists. Recordings made
+        before outs, bases and hits were read have None for them.
+        param fields: the dictionary.
+        return: a GameSnapshot object.
+        """
+        plays = [(tuple(playId) if isinstance(playId, list) else playId, playInning, play)
+                 for playId, playInning, play in fields['plays']]
+        return cls(**dict(fields, plays=plays))
+
+# Reads the text of every selector in one round-trip, null for missing elements.
+SNAPSHOT_SCRIPT = '''
+var selectors = arguments[0];
+var texts = {};
+for (var key in selectors) {
+    var elem = document.querySelector(selectors[key]);
+    texts[key] = elem ? elem.textContent : null;
+}
+return texts;
+'''
+
+def toInt(text):
+    """
+    This function converts the text of a score to an int.
+    param text: the text of the score (e.g. '3' or 'N/A').
+    return: the score, None if it is not a number.
+    """
+    return int(text) if text.isdigit() else None
+
+def parsePageTexts(texts) -> GameSnapshot:
+    """
+    This function parses every field of a snapshot from the texts of the
+    elements in SNAPSHOT_SELECTORS.
+    param texts: a dictionary of field to text, None for missing elements.
+    return: a GameSnapshot object.
+    """
+    def text(key):
+        value = texts.get(key)
+        return 'N/A' if value is None else value.strip()
+
+    # The page only shows the most recent scoring play.
+    plays = []
+    play = SPACES.sub(' ', text('play')) # Cleans string, everything gets spaced equally.
+    if play != 'N/A':
+        playInning = text('playInning').upper()
+        plays.append(((playInning, play), playInning, play))
+
+    # A missing status is not the end of an inning.
+    inningStatus = texts.get('inningStatus')
+    inningOver = inningStatus is not None and 'END' in inningStatus.upper()
+
+    inning = text('inning')
+    return GameSnapshot(
+        homeTeam=text('homeTeam').upper(),
+        awayTeam=text('awayTeam').upper(),
+        homeRuns=toInt(text('homeRuns')),
+        awayRuns=toInt(text('awayRuns')),
+        inning=inning,
+        inningOver=inningOver,
+        status='FINAL' if inning.upper() in ('GAME OVER', 'FINAL') else 'LIVE',
+        plays=plays)
@@ -0,0 +1,348 @@
+#! /usr/bin/env python3
+# gameTracker.py - Follows the games of many teams from a single process.
+
+import threading, time, datetime
+from concurrent.futures import ThreadPoolExecutor
+from teamSchedules import teamSchedule
+from teamPages import teamPage
+from teamIds import canonicalTeam
+from pollScheduler import PollScheduler
+from scheduleCache import ScheduleCache
+from schedule import Schedule, buildSchedule
+from coordinator import LeasedGameFeed
+from resilience import ResilientGameFeed
+from metrics import metrics, setGame
+
+MAX_LIVE_GAMES = 15 # There are never more than 15 MLB games being played at once.
+MAX_GAME_LENGTH = 36000 # Games should not be longer than 10 hours (seconds).
+RELOAD_INTERVAL = 21600 # How often a daemon loads the schedules again (seconds).
+
+def resolveTeams(names):
+    """
+    This function turns the names the user typed into the teams to track.
+    param names: a list of team names (e.g. ['padres', 'd-backs']) or ['ALL'].
+    return: a list of team names as used in teamSchedule and teamPage.
+    raise KeyError: if one of the names is not a team.
+    """
+    teams = [canonicalTeam(name) for name in names if name.strip()]
+    if 'ALL' in teams:
+        return sorted(teamSchedule)
+    for team in teams:
+        if team not in teamSchedule or team not in teamPage:
+            raise KeyError(team)
+    return list(dict.fromkeys(teams)) # Removes duplicates, keeps the order.
+
+class GameTracker:
+    """
+    Tracks every game of a set of teams from one process. The combined schedule
+    of all the teams is kept in a Schedule ordered by start time, and a game is only
+    handed to the worker pool (and given a feed) once it starts, so the work
+    done scales with the number of live games rather than the number of teams.
+    """
+
+    def __init__(self, teams, trackGame, makeFeed, maxWorkers=MAX_LIVE_GAMES, scheduleCache=None,
+                 coordinator=None, daemon=False):
+        """
+        param teams: the teams to track, see resolveTeams().
+        param trackGame: callable taking (team, startTime, feed, claimGame,
+        scheduler) and the keyword gameId that follows one game until it is
+        over and returns the game's status, 'FINAL' or 'POSTPONED'.
+        param makeFeed: callable that returns a new GameFeed for each game.
+        param maxWorkers: the most games that are followed at the same time.
+        param scheduleCache: the ScheduleCache schedules are read through, the
+        default one in the user's cache directory if None.
+        param coordinator: the Coordinator that shares the games with other
+        workers, every game is followed here if None.
+        param daemon: True to keep running when there are no games left,
+        loading the schedules again every RELOAD_INTERVAL, see daemon.py.
+        """
+        self.teams = teams
+        self.trackGame = trackGame
+        self.makeFeed = makeFeed
+        self.scheduleCache = scheduleCache if scheduleCache is not None else ScheduleCache()
+        self.maxWorkers = maxWorkers
+        self.schedule = Schedule()
+        self.liveGames = set()
+        self.schedulers = {} # (team, PollScheduler) of each game being followed, by gameId.
+        self.coordinator = coordinator
+        self.waiting = {} # Started games another worker holds, by id, in case it stops.
+        self.daemon = daemon
+        self.reloadAt = time.monotonic() + RELOAD_INTERVAL
+        self.changed = threading.Event() # Set when games are added or removed, wakes run().
+        self.lock = threading.Lock()
+
+    def buildSlate(self):
+        """
+        This function builds the combined schedule of every tracked team.
+        return: a Schedule object.
+        """
+        self.schedule = buildSchedule(self.teams, self.scheduleCache)
+        return self.schedule
+
+    def scheduleChanged(self):
+        """
+        This function wakes the loop that starts the games, so it sees the
+        games added or removed while it was sleeping.
+        """
+        self.changed.set()
+
+    def mergeSchedule(self, schedule, teams):
+        """
+        This function brings the schedule up to date with a newly loaded one,
+        without touching the games that started.
+        param schedule: the Schedule just loaded.
+        param teams: the teams it was loaded for, their games that have not
+        started and are no longer on it are dropped.
+        """
+        for game in list(self.schedule):
+            if (game.status == 'SCHEDULED' and game.gameId not in schedule and
+                    (game.homeTeam in teams or game.awayTeam in teams)):
+                self.schedule.remove(game.gameId)
+        for game in schedule:
+            if game.gameId not in self.schedule:
+                self.schedule.add(game)
+        self.scheduleChanged()
+
+    def reload(self) -> int:
+        """
+        This function loads the schedule of every tracked team again, e.g.
+        after games were rescheduled.
+        return: the number of games on the schedule.
+        """
+        self.reloadAt = time.monotonic() + RELOAD_INTERVAL
+        teams = self.teams
+        self.mergeSchedule(buildSchedule(teams, self.scheduleCache), teams)
+        return len(self.schedule)
+
+    def reloadDue(self) -> bool:
+        return self.daemon and time.monotonic() >= self.reloadAt
+
+    def addTeams(self, names) -> list:
+        """
+        This function starts tracking more teams, loading their schedules
+        while the games being followed carry on.
+        param names: a list of team names, see resolveTeams().
+        return: the teams that were not tracked yet.
+        raise KeyError: if one of the names is not a team.
+        """
+        teams = [team for team in resolveTeams(names) if team not in self.teams]
+        if teams:
+            schedule = buildSchedule(teams, self.scheduleCache)
+            with self.lock:
+                self.teams = self.teams + teams # A new list, so a loop over the old one is not disturbed.
+            self.mergeSchedule(schedule, teams)
+        return teams
+
+    def removeTeams(self, names) -> list:
+        """
+        This function stops tracking teams. Their games being followed are
+        followed until they are over, the ones that have not started are
+        dropped unless the other team is still tracked.
+        param names: a list of team names, see resolveTeams().
+        return: the teams that were tracked.
+        raise KeyError: if one of the names is not a team.
+        """
+        teams = [team for team in resolveTeams(names) if team in self.teams]
+        if teams:
+            with self.lock:
+                self.teams = [team for team in self.teams if team not in teams]
+            for game in list(self.schedule):
+                if (game.status == 'SCHEDULED' and game.homeTeam not in self.teams and
+                        game.awayTeam not in self.teams):
+                    self.schedule.remove(game.gameId)
+            self.scheduleChanged()
+        return teams
+
+    def gameStates(self) -> list:
+        """
+        This function describes the games being followed.
+        return: a list of dictionaries with the id of each game, the team it
+        is followed for, its polling phase and rate, its failed polls by cause
+        and the last score read.
+        """
+        with self.lock:
+            schedulers = sorted(self.schedulers.items())
+        states = []
+        for gameId, (team, scheduler) in schedulers:
+            state = {'gameId': gameId, 'team': team, 'phase': scheduler.phase, 'pollsPerMinute': round(scheduler.pollRate, 2),
+                     'failures': metrics.counts('tracker_failures_total', gameId)}
+            if scheduler.snapshot is not None:
+                state.update((key, value) for key, value in scheduler.snapshot.toDict().items() if key != 'plays')
+            states.append(state)
+        return states
+
+    def nextStart(self, started):
+        """
+        This function finds the next game to start and how long until it starts.
+        param started: ids of the games already started.
+        return: (game, seconds until it starts). A daemon gets (None, seconds
+        until the next reload) if no game starts before then, and (None, None)
+        means there is nothing left to do.
+        """
+        # Games that started too long ago to still be going are skipped.
+        now = datetime.datetime.now().astimezone()
+        game = self.schedule.nextGame(now - datetime.timedelta(seconds=MAX_GAME_LENGTH), started)
+        timeUntilReload = self.reloadAt - time.monotonic() if self.daemon else None
+        if game is None:
+            return None, timeUntilReload
+        timeUntilStart = (game.startTime - now).total_seconds()
+        if timeUntilReload is not None and timeUntilReload < timeUntilStart:
+            return None, timeUntilReload
+        return game, timeUntilStart
+
+    def claimGame(self, homeTeam, awayTeam, startTime) -> bool:
+        """
+        This function makes sure a game is only followed once when both of its
+        teams are tracked.
+        param homeTeam: the home team.
+        param awayTeam: the away team.
+        param startTime: the time the game starts.
+        return: True if the caller should follow the game, False otherwise.
+        """
+        key = (homeTeam, awayTeam, startTime)
+        with self.lock:
+            if key in self.liveGames:
+                return False
+            self.liveGames.add(key)
+            return True
+
+    def followGame(self, team, game):
+        """
+        This function follows one game on a worker thread.
+        param team: the team whose page is used to follow the game.
+        param game: the ScheduledGame to follow.
+        """
+        def claimGame(homeTeam, awayTeam):
+            return self.claimGame(homeTeam, awayTeam, game.startTime)
+
+        setGame(game.gameId) # The metrics of this thread are the game's from here on.
+        scheduler = PollScheduler()
+        with self.lock:
+            self.schedulers[game.gameId] = (team, scheduler)
+        self.schedule.setStatus(game.gameId, 'LIVE')
+        status = None
+        try:
+            status = self.trackGame(team, game.startTime, self.newFeed(game), claimGame, scheduler,
+                                    gameId=game.gameId)
+        except Exception as exc:
+            # One broken game should not stop the other games from being followed.
+            print('Stopped tracking ' + team + ' game: ' + repr(exc))
+        finally:
+            with self.lock:
+                self.schedulers.pop(game.gameId, None)
+            self.gameStopped(game, status)
+
+    def newFeed(self, game):
+        """
+        This function makes the feed of a game. It stops polling the game for
+        a while and reopens it in the background if it keeps failing, and
+        ends when another worker takes the game over if the games are shared.
+        param game: the ScheduledGame to follow.
+        return: a GameFeed object.
+        """
+        feed = ResilientGameFeed(self.makeFeed)
+        if self.coordinator is not None:
+            feed = LeasedGameFeed(feed, self.coordinator, game.gameId)
+        return feed
+
+    def gameStopped(self, game, status):
+        """
+        This function records that a game is no longer followed.
+        param game: the ScheduledGame.
+        param status: 'FINAL' or 'POSTPONED', None if following it failed.
+        """
+        if self.coordinator is not None:
+            if status is not None and self.coordinator.holds(game.gameId):
+                self.coordinator.finish(game.gameId)
+            else:
+                # Taken over, or failed here and worth another worker trying.
+                self.coordinator.release(game.gameId)
+        if game.gameId in self.schedule:
+            self.schedule.setStatus(game.gameId, status or 'FINAL')
+
+    def startGame(self, game, follow):
+        """
+        This function follows a game that just started, or if the games are
+        shared and it belongs to another worker, keeps it in case that worker stops.
+        param game: the ScheduledGame.
+        param follow: callable taking (team, game) that starts following it.
+        """
+        if self.coordinator is not None and not self.coordinator.claim(game.gameId):
+            self.waiting[game.gameId] = game
+            return
+        team = game.homeTeam if game.homeTeam in self.teams else game.awayTeam
+        follow(team, game)
+
+    def takeOver(self, follow):
+        """
+        This function follows the waiting games whose worker stopped, and
+        forgets the ones another worker finished.
+        param follow: callable taking (team, game) that starts following a game.
+        """
+        now = datetime.datetime.now().astimezone()
+        for gameId, game in list(self.waiting.items()):
+            startedFor = (now - game.startTime).total_seconds()
+            if startedFor > MAX_GAME_LENGTH or self.coordinator.isDone(gameId):
+                del self.waiting[gameId]
+            # A game nobody leased within a ttl of starting can be taken by anyone.
+            elif self.coordinator.claim(gameId, anyWorker=startedFor > self.coordinator.ttl):
+                del self.waiting[gameId]
+                print('Taking over ' + gameId)
+                team = game.homeTeam if game.homeTeam in self.teams else game.awayTeam
+                follow(team, game)
+
+    def wait(self, seconds, follow):
+        """
+        This function sleeps, taking over the games of stopped workers while
+        it does if the games are shared. It wakes up early if games are added
+        or removed.
+        param seconds: how long to sleep.
+        param follow: callable taking (team, game) that starts following a game.
+        """
+        deadline = time.monotonic() + seconds
+        while True:
+            if self.coordinator is not None:
+                self.takeOver(follow)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if self.coordinator is not None:
+                remaining = min(remaining, self.coordinator.ttl / 3)
+            if self.changed.wait(remaining):
+                self.changed.clear()
+                return
+
+    def run(self):
+        """
+        This function sleeps until the earliest game on the schedule of every
+        tracked team starts and hands it to the worker pool, until there are
+        no games left, or for as long as the process runs if it is a daemon.
+        """
+        if not len(self.schedule):
+            self.buildSlate()
+
+        started = set() # Ids of the games handed to the worker pool.
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as pool:
+            def follow(team, game):
+                pool.submit(self.followGame, team, game)
+
+            while True:
+                if self.reloadDue():
+                    self.reload()
+                game, timeUntilStart = self.nextStart(started)
+                if timeUntilStart is None:
+                    break
+
+                # Sleep total time (seconds) until next game starts
+                if game is None or timeUntilStart > 0:
+                    if game is not None:
+                        print('Sleeping until next game starts...' + str(timeUntilStart))
+                    self.wait(max(timeUntilStart, 0), follow)
+                    continue # Games may have been added or removed while sleeping.
+
+                started.add(game.gameId)
+                self.startGame(game, follow)
+
+            # Games other workers are following are watched until they are over.
+            while self.waiting:
+                self.wait(self.coordinator.ttl, follow)
@@ -1,30 +1,85 @@
 #! /usr/bin/env python3
 # getShedule.py - Returns a list of a baseball teams schedule as datetime objects.
 
-import requests, bs4, html5lib, datetime, re, time
+import requests, datetime, importlib.util, time, zoneinfo
+from pageSelectors import SELECTORS, SCHEDULE_DATE, SCHEDULE_TIME
 
 months = {"JAN" : 1, "FEB" : 2, "MAR" : 3, "APR" : 4, "MAY" : 5, "JUN" : 6, \
     "JUL" : 7, "AUG" : 8, "SEP" : 9, "OCT" : 10, "NOV" : 11, "DEC" : 12} 
 
-def getShedule(url):
-    dates_and_times = []
+EASTERN = zoneinfo.ZoneInfo('America/New_York') # cbssports.com lists times in Eastern time.
+
+# Much faster than html5lib. Looked up without importing it, bs4 and lxml are
+# only loaded when a page is parsed.
+PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+def getShedule(url, cache=None):
+    """
+    This function gets a team's schedule.
+    param url: the url of the team's schedule on cbssports.com.
+    param cache: optional ScheduleCache, the page is only downloaded when the
+    cached schedule is too old and has changed.
+    return: a list of the start times of the games as timezone aware datetime
+    objects in the local timezone.
+    """
+    return [startTime for startTime, opponent, isHome in getScheduleGames(url, cache)]
+
+def getScheduleGames(url, cache=None):
+    """
+    This function gets a team's games.
+    param url: the url of the team's schedule on cbssports.com.
+    param cache: optional ScheduleCache, see getShedule().
+    return: a list of (startTime, opponent, isHome) tuples, see parseScheduleGames().
+    """
+    if cache is not None:
+        return cache.fetch(url, parseScheduleGames)
 
     res = requests.get(url)
     res.raise_for_status() # Check to see if we downloaded the page successfully.
-    soup = bs4.BeautifulSoup(res.text, 'html5lib')
+    return parseScheduleGames(res.text)
+
+def parseSchedule(html, parser=None, tz=None):
+    """
+    This function parses the start times of the games from a schedule page.
+    param html: the schedule page.
+    param parser: the BeautifulSoup parser, the fastest one installed if None.
+    param tz: the timezone of the start times, the local timezone if None.
+    return: a list of the start times of the games as datetime objects.
+    """
+    return [startTime for startTime, opponent, isHome in parseScheduleGames(html, parser, tz)]
+
+def parseScheduleGames(html, parser=None, tz=None):
+    """
+    This function parses the games from a schedule page.
+    Only the <main> element, which holds the schedule table, is built.
+    param html: the schedule page.
+    param parser: the BeautifulSoup parser, the fastest one installed if None.
+    'html5lib' is also accepted but builds the whole page.
+    param tz: the timezone of the start times, the local timezone if None.
+    return: a list of (startTime, opponent, isHome) tuples, where startTime is
+    timezone aware and opponent is
+    the opponent's abbreviation on cbssports.com (e.g. 'LAD'), None if the page
+    does not show it.
+    """
+    import bs4
+    games = []
 
-    dateObjs = soup.select('main > div div.TableBaseWrapper:nth-of-type(2) span.CellGameDate')
-    timeObjs = soup.select('main > div div.TableBaseWrapper:nth-of-type(2) div > a[href]')
+    parser = parser or PARSER
+    mainOnly = None if parser == 'html5lib' else bs4.SoupStrainer('main') # html5lib ignores strainers.
+    soup = bs4.BeautifulSoup(html, parser, parse_only=mainOnly)
+
+    dateObjs = soup.select(SELECTORS['scheduleDates'])
+    timeObjs = soup.select(SELECTORS['scheduleTimes'])
+
+    opponentObjs = soup.select(SELECTORS['scheduleOpponents'])
 
     dates = [i.text.strip().upper() for i in dateObjs] # Month Day, Year ... (AUG 3, 2020)
     times = [i.text.strip().upper() for i in timeObjs] # Times are in EST ... (9:10 pm)
-
-    dateRegex = re.compile(r'([a-zA-Z]{3}) (\d+), (\d{4})')
-    timeRegex = re.compile(r'(\d+):(\d+) ([a-zA-Z]{2})')
+    opponents = [i.text.split() for i in opponentObjs] # Away games have an @ ... (@ LAD)
 
     for i in range(0, len(dates)):
-        dateMatch = dateRegex.search(dates[i])
-        timeMatch = timeRegex.search(times[i])
+        dateMatch = SCHEDULE_DATE.search(dates[i])
+        timeMatch = SCHEDULE_TIME.search(times[i])
 
         if dateMatch:
             month_ = months[dateMatch.group(1)]
@@ -36,7 +91,7 @@ def getShedule(url):
             year_ = 0
         
         if timeMatch:
-            hour_ = int(timeMatch.group(1)) - 3 # Convert time to PST
+            hour_ = int(timeMatch.group(1)) % 12 # 12:05 PM is hour 12, 12:05 AM is hour 0.
             minute_ = int(timeMatch.group(2))
             is_pm = timeMatch.group(3)
         else:
@@ -47,7 +102,15 @@ def getShedule(url):
         if is_pm == 'PM':
             hour_ = hour_ + 12 # datetime.hour is in range(24)
 
-        temp = datetime.datetime(year = year_, month = month_, day = day_, hour = hour_, minute = minute_)
-        dates_and_times.append(temp)
+        # The time is Eastern, the timezone database handles daylight saving time.
+        temp = datetime.datetime(year = year_, month = month_, day = day_, hour = hour_, minute = minute_, tzinfo = EASTERN)
+        temp = temp.astimezone(tz)
+
+        if len(opponents) == len(dates) and opponents[i]:
+            opponent = opponents[i][-1].upper()
+            isHome = '@' not in opponents[i]
+        else:
+            opponent, isHome = None, None
+        games.append((temp, opponent, isHome))
 
-    return dates_and_times
\ No newline at end of file
+    return games
\ No newline at end of file
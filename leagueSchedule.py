@@ -0,0 +1,138 @@
+#! /usr/bin/env python3
+# leagueSchedule.py - Loads the schedules of many teams at once and merges them
+# into one slate of games.
+
+import multiprocessing, time, requests
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from getSchedule import parseScheduleGames
+from teamSchedules import teamSchedule
+
+FETCH_WORKERS = 8 # Schedule pages downloaded at the same time.
+# Schedules are reloaded while browser, notifier and control api threads run,
+# and forking a process with live threads can deadlock the child on a lock one
+# of them held. The parse workers are started fresh instead.
+PARSE_CONTEXT = multiprocessing.get_context('spawn')
+
+# The team of each abbreviation cbssports.com uses, taken from the schedule urls
+# (e.g. .../mlb/teams/SD/san-diego-padres/schedule/ is the PADRES).
+teamAbbreviation = {url.split('/')[5]: team for team, url in teamSchedule.items()}
+
+class LeagueSchedule:
+    """
+    The merged schedule of a set of teams.
+    games is a list of (startTime, homeTeam, awayTeam) tuples sorted by start
+    time, with every game listed once even when both of its teams were loaded.
+    timings maps each team to the seconds spent on 'fetch' and 'parse'.
+    failures maps each team that could not be loaded to the error.
+    """
+
+    def __init__(self, games, timings, failures):
+        self.games = games
+        self.timings = timings
+        self.failures = failures
+
+def fetchPage(session, url):
+    """
+    This function downloads a schedule page.
+    param session: the requests.Session to download with.
+    param url: the url of the page.
+    return: (html, seconds it took).
+    """
+    start = time.perf_counter()
+    res = session.get(url)
+    res.raise_for_status() # Check to see if we downloaded the page successfully.
+    return res.text, time.perf_counter() - start
+
+def timedParse(html):
+    """
+    This function parses a schedule page, it runs in a worker process.
+    param html: the schedule page.
+    return: (games, seconds it took), see getSchedule.parseScheduleGames().
+    """
+    start = time.perf_counter()
+    games = parseScheduleGames(html)
+    return games, time.perf_counter() - start
+
+def cachedFetch(cache, url, parsePool):
+    """
+    This function gets a schedule through a ScheduleCache, which only
+    downloads it if the cached one is too old and the page changed. A page
+    that was downloaded is parsed in the pool of processes.
+    param cache: the ScheduleCache.
+    param url: the url of the schedule.
+    param parsePool: the ProcessPoolExecutor pages are parsed in.
+    return: (games, seconds it took), see getSchedule.parseScheduleGames().
+    """
+    start = time.perf_counter()
+    games = cache.fetch(url, lambda html: parsePool.submit(parseScheduleGames, html).result())
+    return games, time.perf_counter() - start
+
+def loadLeagueSchedule(teams=None, session=None, fetchWorkers=FETCH_WORKERS, parseWorkers=None, cache=None):
+    """
+    This function downloads the schedules of the teams on a pool of threads
+    sharing one connection pool, and parses each page in a pool of processes
+    as soon as it arrives, since parsing is what takes the CPU. A team that
+    fails is reported in failures and does not stop the others.
+    param teams: the teams to load, every team if None.
+    param session: a requests.Session to download with, one is made if None.
+    Not used with a cache, which downloads with its own session.
+    param fetchWorkers: the number of pages downloaded at the same time.
+    param parseWorkers: the number of parsing processes, one per CPU if None.
+    param cache: optional ScheduleCache the schedules are read through, so
+    only the pages that changed are downloaded and parsed.
+    return: a LeagueSchedule object.
+    """
+    teams = teams if teams is not None else sorted(teamSchedule)
+    if session is None and cache is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=fetchWorkers)
+        session.mount('https://', adapter)
+
+    timings, failures, games = {}, {}, {}
+
+    def addGames(team, teamGames):
+        # Both teams' pages list the game, keep it once.
+        for startTime, opponent, isHome in teamGames:
+            opponent = teamAbbreviation.get(opponent, opponent)
+            homeTeam, awayTeam = (team, opponent) if isHome is not False else (opponent, team)
+            games.setdefault((startTime, homeTeam, awayTeam), None)
+
+    with ThreadPoolExecutor(max_workers=fetchWorkers) as fetchPool, \
+         ProcessPoolExecutor(max_workers=parseWorkers, mp_context=PARSE_CONTEXT) as parsePool:
+        if cache is not None:
+            fetches = {fetchPool.submit(cachedFetch, cache, teamSchedule[team], parsePool): team
+                       for team in teams}
+            for future in as_completed(fetches):
+                team = fetches[future]
+                try:
+                    teamGames, seconds = future.result()
+                except Exception as exc:
+                    failures[team] = repr(exc)
+                    continue
+                timings[team] = {'fetch': seconds}
+                addGames(team, teamGames)
+        else:
+            fetches = {fetchPool.submit(fetchPage, session, teamSchedule[team]): team for team in teams}
+            parses = {}
+            for future in as_completed(fetches):
+                team = fetches[future]
+                try:
+                    html, seconds = future.result()
+                except Exception as exc:
+                    failures[team] = repr(exc)
+                    continue
+                timings[team] = {'fetch': seconds}
+                parses[parsePool.submit(timedParse, html)] = team
+
+            for future in as_completed(parses):
+                team = parses[future]
+                try:
+                    teamGames, seconds = future.result()
+                except Exception as exc:
+                    failures[team] = repr(exc)
+                    continue
+                timings[team]['parse'] = seconds
+                addGames(team, teamGames)
+
+    slate = sorted(games, key=lambda game: (game[0], game[1] or '', game[2] or ''))
+    return LeagueSchedule(slate, timings, failures)
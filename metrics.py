@@ -0,0 +1,219 @@
+#! /usr/bin/env python3
+# metrics.py - Counts and times what the tracker does for each game, so a late
+# text can be traced to the step it was waiting on.
+
+import bisect, contextlib, contextvars, datetime, http.server, json, threading, time
+
+# Upper bounds of the histogram buckets (seconds), from a fast parse to a 60
+# second WebDriverWait timeout.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRICS_PORT = 9108 # Port of the metrics endpoint when it is turned on.
+
+# The game the current thread or task is working on, added to every metric
+# recorded there. Set by the trackers with setGame() when a game starts.
+currentGame = contextvars.ContextVar('currentGame', default='')
+
+def setGame(gameId):
+    """
+    This function labels the metrics recorded from here on with a game. Games
+    are labelled by id, so a team's games are kept apart, e.g. a doubleheader.
+    param gameId: the id of the game being followed, see schedule.makeGameId().
+    """
+    currentGame.set(gameId)
+
+class Histogram:
+    """
+    Counts observations in BUCKETS, Prometheus style, along with their sum
+    and the largest one.
+    """
+    __slots__ = ('counts', 'sum', 'count', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1) # The last bucket is +Inf.
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+def formatLabels(labels, extra=()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(key + '="' + str(value).replace('"', '\\"') + '"' for key, value in pairs) + '}'
+
+class Metrics:
+    """
+    Counters and timing histograms keyed by name and labels. Every metric is
+    labelled with the game it was recorded for. Safe to use from several
+    threads. Can also write every measurement to a json lines log.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        """
+        param clock: function returning the current time in seconds, for timers.
+        """
+        self.clock = clock
+        self.counters = {} # (name, labels) -> count.
+        self.histograms = {} # (name, labels) -> Histogram.
+        self.lock = threading.Lock()
+        self.log = None
+        self.profiling = False # Set by --profile, the trackers print profile() at the end of each game.
+
+    def openLog(self, path):
+        """
+        This function writes every measurement from now on to a json lines file.
+        param path: the log file, appended to.
+        """
+        self.log = open(path, 'a', buffering=1)
+
+    def labels(self, labels) -> tuple:
+        labels.setdefault('game', currentGame.get())
+        return tuple(sorted(labels.items()))
+
+    def write(self, name, labels, value):
+        # Must be called holding self.lock.
+        line = {'time': datetime.datetime.now().astimezone().isoformat(timespec='milliseconds'),
+                'metric': name, 'labels': dict(labels), 'value': value}
+        self.log.write(json.dumps(line) + '\n')
+
+    def increment(self, name, amount=1, **labels):
+        """
+        This function adds to a counter.
+        param name: the counter, e.g. 'tracker_timeouts_total'.
+        param amount: how much to add.
+        param labels: the labels of the counter, e.g. step='getPlayInning'.
+        """
+        key = (name, self.labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+            if self.log is not None:
+                self.write(name, key[1], amount)
+
+    def observe(self, name, seconds, **labels):
+        """
+        This function records how long something took.
+        param name: the histogram, e.g. 'tracker_step_seconds'.
+        param seconds: the time it took.
+        param labels: the labels of the histogram, e.g. step='refresh'.
+        """
+        key = (name, self.labels(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+            if self.log is not None:
+                self.write(name, key[1], round(seconds, 6))
+
+    @contextlib.contextmanager
+    def timer(self, step, **labels):
+        """
+        This function times the body of a with statement as a step of the
+        game, even if it raises.
+        param step: the name of the step, e.g. 'refresh'.
+        """
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.observe('tracker_step_seconds', self.clock() - start, step=step, **labels)
+
+    def counts(self, name, game) -> dict:
+        """
+        This function gets the values of a counter for one game.
+        param name: the counter, e.g. 'tracker_failures_total'.
+        param game: the id of the game.
+        return: a dictionary of the counter's other labels, joined by commas, to its value.
+        """
+        with self.lock:
+            counters = [(labels, value) for (counterName, labels), value in self.counters.items()
+                        if counterName == name and dict(labels).get('game') == game]
+        return {','.join(str(label) for key, label in labels if key != 'game'): value
+                for labels, value in sorted(counters)}
+
+    def render(self) -> str:
+        """
+        This function formats every metric in the Prometheus text format.
+        return: the text served by the metrics endpoint.
+        """
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, list(h.counts), h.sum, h.count) for key, h in self.histograms.items())
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append('# TYPE ' + name + ' counter')
+            lines.append(name + formatLabels(labels) + ' ' + str(value))
+        for (name, labels), counts, total, count in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append('# TYPE ' + name + ' histogram')
+            cumulative = 0
+            for bound, bucketCount in zip(BUCKETS + ('+Inf',), counts):
+                cumulative += bucketCount
+                lines.append(name + '_bucket' + formatLabels(labels, [('le', bound)]) + ' ' + str(cumulative))
+            lines.append(name + '_sum' + formatLabels(labels) + ' ' + repr(total))
+            lines.append(name + '_count' + formatLabels(labels) + ' ' + str(count))
+        return '\n'.join(lines) + '\n'
+
+    def profile(self, game) -> str:
+        """
+        This function breaks down where the time following a game went.
+        param game: the id of the game.
+        return: a table of every step timed for the game and its counters.
+        """
+        with self.lock:
+            steps = [(dict(labels).get('step', name), h.count, h.sum, h.max)
+                     for (name, labels), h in self.histograms.items()
+                     if name == 'tracker_step_seconds' and dict(labels).get('game') == game]
+            counters = [(name, labels, value) for (name, labels), value in self.counters.items()
+                        if dict(labels).get('game') == game]
+        total = sum(seconds for step, count, seconds, longest in steps) or 1
+        lines = ['Profile of the ' + game + ' game:',
+                 '  %-18s %7s %10s %10s %10s %6s' % ('step', 'calls', 'total s', 'mean ms', 'max ms', 'share')]
+        for step, count, seconds, longest in sorted(steps, key=lambda step: -step[2]):
+            lines.append('  %-18s %7d %10.3f %10.3f %10.3f %5.1f%%' % (
+                step, count, seconds, seconds / count * 1000, longest * 1000, seconds / total * 100))
+        for name, labels, value in sorted(counters):
+            others = [(key, label) for key, label in labels if key != 'game']
+            lines.append('  ' + name + formatLabels(others) + ' ' + str(value))
+        return '\n'.join(lines)
+
+metrics = Metrics() # The metrics of the whole process.
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes are not worth a line on the console.
+
+def serveMetrics(port=METRICS_PORT, host='127.0.0.1', source=metrics):
+    """
+    This function serves the metrics at http://host:port/metrics from a
+    background thread.
+    param port: the port to listen on, 0 picks a free one.
+    param host: the address to listen on, only this machine by default.
+    param source: the Metrics object to serve.
+    return: the ThreadingHTTPServer, call shutdown() to stop it.
+    """
+    server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.metrics = source
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
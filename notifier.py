@@ -0,0 +1,390 @@
+#! /usr/bin/env python3
+# notifier.py - Queues texts and sends them from worker threads, so the tracker
+# never waits on a text being delivered.
+
+import asyncio, heapq, itertools, random, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from metrics import metrics, currentGame
+
+COALESCE_WINDOW = 10 # Texts about the same game this close together become one (seconds).
+RATE_PER_MINUTE = 6 # Texts per minute a single recipient can get.
+RATE_BURST = 3 # Texts a recipient can get at once before the rate limit applies.
+MAX_RETRIES = 3 # Tries to send a text again after it fails.
+RETRY_DELAY = 2 # Seconds before the first retry, doubled after each one.
+MAX_PENDING = 100000 # Texts waiting to be sent before new ones are dropped, room for thousands of subscribers.
+
+class StubTransport:
+    """
+    Keeps texts in a list instead of sending them, stands in for Twilio when
+    running locally.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send(self, recipient, message):
+        with self.lock:
+            self.sent.append((recipient, message))
+
+class Delivery:
+    """
+    Calls a function once every text queued with it has been sent, e.g. to
+    checkpoint the events the texts are about. Pass it to notify() for each
+    text, then call seal() once no more texts will be queued with it. If a
+    text is dropped or given up on, the function is never called.
+    """
+
+    def __init__(self, onDelivered):
+        """
+        param onDelivered: function without arguments, called on the thread
+        (or event loop) that sent the last text.
+        """
+        self.onDelivered = onDelivered
+        self.pending = 1 # Held until seal(), so it can not fire while texts are being queued.
+        self.failed = False
+        self.lock = threading.Lock()
+
+    def add(self):
+        with self.lock:
+            self.pending += 1
+
+    def done(self, sent):
+        """
+        This function records the outcome of one text.
+        param sent: True if it was sent, False if it was dropped or given up on.
+        """
+        with self.lock:
+            self.pending -= 1
+            self.failed = self.failed or not sent
+            delivered = self.pending == 0 and not self.failed
+        if delivered:
+            self.onDelivered()
+
+    def seal(self):
+        self.done(True)
+
+class Batch:
+    """
+    Texts about one game (key) for one recipient that are sent as one text.
+    """
+    __slots__ = ('recipient', 'key', 'messages', 'attempts', 'game', 'queued', 'deliveries')
+
+    def __init__(self, recipient, key, message, game='', queued=0):
+        self.recipient = recipient
+        self.key = key
+        self.messages = [message]
+        self.attempts = 0
+        self.game = game # The game the metrics of the batch are recorded for.
+        self.queued = queued # When the first text was queued (seconds).
+        self.deliveries = [] # The Delivery of each text that has one.
+
+    def text(self) -> str:
+        return '\n\n'.join(self.messages)
+
+class RateLimit:
+    """
+    A token bucket for one recipient.
+    """
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, now):
+        self.tokens = RATE_BURST
+        self.updated = now
+
+    def take(self, now, ratePerMinute) -> float:
+        """
+        This function takes a token if there is one.
+        param now: the current time (seconds).
+        param ratePerMinute: tokens added per minute.
+        return: 0 if a token was taken, otherwise seconds until there is one.
+        """
+        perSecond = ratePerMinute / 60
+        self.tokens = min(RATE_BURST, self.tokens + (now - self.updated) * perSecond)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / perSecond
+
+class NotificationQueue:
+    """
+    Sends texts through a transport from a pool of worker threads.
+    notify() only adds the text to the queue and returns right away. Texts
+    about the same game for the same recipient that arrive within the coalesce
+    window are sent as one text, every recipient is rate limited, and failed
+    sends are retried with backoff.
+    """
+
+    def __init__(self, transport, workers=2, coalesceWindow=COALESCE_WINDOW,
+                 ratePerMinute=RATE_PER_MINUTE, maxRetries=MAX_RETRIES,
+                 maxPending=MAX_PENDING, clock=time.monotonic):
+        """
+        param transport: object with a send(recipient, message) method, e.g.
+        textMyself.TwilioTransport or StubTransport.
+        param workers: the number of threads sending texts.
+        param coalesceWindow: seconds a text waits for others about the same game.
+        param ratePerMinute: texts per minute a single recipient can get.
+        param maxRetries: tries to send a text again after it fails.
+        param maxPending: texts waiting to be sent before new ones are dropped.
+        param clock: function returning the current time in seconds.
+        """
+        self.transport = transport
+        self.coalesceWindow = coalesceWindow
+        self.ratePerMinute = ratePerMinute
+        self.maxRetries = maxRetries
+        self.maxPending = maxPending
+        self.clock = clock
+
+        self.scheduled = [] # Heap of (sendTime, order, batch).
+        self.order = itertools.count() # Keeps batches with the same sendTime in order.
+        self.open = {} # Batches still taking texts, by (recipient, key).
+        self.rateLimits = {}
+        self.pending = 0 # Texts queued or being sent.
+        self.stopping = False
+        self.condition = threading.Condition()
+        self.stats = {'queued': 0, 'sent': 0, 'coalesced': 0, 'retried': 0, 'failed': 0, 'dropped': 0}
+
+        self.threads = [threading.Thread(target=self.work, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def notify(self, recipient, message, key=None, delivery=None) -> bool:
+        """
+        This function queues a text. It never waits on the text being sent.
+        param recipient: the phone number to text.
+        param message: the text.
+        param key: the game the text is about, texts with the same key are coalesced.
+        param delivery: optional Delivery told once the text is sent or given up on.
+        return: True if the text was queued, False if the queue is full.
+        """
+        if delivery is not None:
+            delivery.add()
+        with self.condition:
+            if self.stopping or self.pending >= self.maxPending:
+                self.stats['dropped'] += 1
+                metrics.increment('tracker_texts_total', outcome='dropped')
+                queued = False
+            else:
+                queued = True
+                self.pending += 1
+                self.stats['queued'] += 1
+                batch = self.open.get((recipient, key)) if key is not None else None
+                if batch is not None:
+                    batch.messages.append(message)
+                    self.stats['coalesced'] += 1
+                else:
+                    batch = Batch(recipient, key, message, currentGame.get(), self.clock())
+                    if key is not None:
+                        self.open[(recipient, key)] = batch
+                    self.schedule(batch, self.clock() + (self.coalesceWindow if key is not None else 0))
+                if delivery is not None:
+                    batch.deliveries.append(delivery)
+        if not queued and delivery is not None:
+            delivery.done(False)
+        return queued
+
+    def notifyAll(self, recipients, message, key=None, delivery=None) -> int:
+        """
+        This function queues the same text for many recipients.
+        param recipients: the phone numbers to text.
+        param message: the text.
+        param key: the game the text is about.
+        param delivery: optional Delivery told once each text is sent or given up on.
+        return: the number of texts queued.
+        """
+        return sum(self.notify(recipient, message, key, delivery) for recipient in recipients)
+
+    def schedule(self, batch, sendTime):
+        # Must be called holding self.condition.
+        heapq.heappush(self.scheduled, (sendTime, next(self.order), batch))
+        self.condition.notify()
+
+    def nextBatch(self):
+        """
+        This function waits for the next batch that is due to be sent.
+        return: a Batch object, None once the queue is closed and empty.
+        """
+        with self.condition:
+            while True:
+                batch, timeout = self.popDue(self.clock())
+                if batch is not None:
+                    return batch
+                if self.stopping and not self.scheduled:
+                    return None
+                self.condition.wait(timeout)
+
+    def popDue(self, now):
+        """
+        This function takes the next batch that is due and allowed by its
+        recipient's rate limit. Must be called holding self.condition.
+        param now: the current time (seconds).
+        return: (batch, None) if a batch is due, otherwise (None, seconds
+        until the next one is due, None if nothing is scheduled).
+        """
+        while self.scheduled and (self.scheduled[0][0] <= now or self.stopping):
+            batch = heapq.heappop(self.scheduled)[2]
+            if self.open.get((batch.recipient, batch.key)) is batch:
+                del self.open[(batch.recipient, batch.key)]
+
+            rateLimit = self.rateLimits.get(batch.recipient)
+            if rateLimit is None:
+                rateLimit = self.rateLimits[batch.recipient] = RateLimit(now)
+            wait = rateLimit.take(now, self.ratePerMinute)
+            if wait and not self.stopping:
+                self.schedule(batch, now + wait)
+                continue
+            return batch, None
+        return None, (self.scheduled[0][0] - now if self.scheduled else None)
+
+    def work(self):
+        """
+        This function sends batches until the queue is closed.
+        """
+        while True:
+            batch = self.nextBatch()
+            if batch is None:
+                return
+            try:
+                with metrics.timer('send', game=batch.game):
+                    self.transport.send(batch.recipient, batch.text())
+            except Exception:
+                self.finish(batch, sent=False)
+                continue
+            self.finish(batch, sent=True)
+
+    def finish(self, batch, sent):
+        """
+        This function records the outcome of sending a batch, and schedules a
+        retry with backoff if it failed and has tries left.
+        param batch: the Batch that was sent.
+        param sent: True if the transport sent it, False if it raised.
+        """
+        with self.condition:
+            if sent:
+                self.stats['sent'] += 1
+                self.done(len(batch.messages))
+                outcome = 'sent'
+            else:
+                batch.attempts += 1
+                if batch.attempts <= self.maxRetries and not self.stopping:
+                    self.stats['retried'] += 1
+                    delay = RETRY_DELAY * 2 ** (batch.attempts - 1)
+                    self.schedule(batch, self.clock() + random.uniform(delay / 2, delay))
+                    outcome = 'retried'
+                else:
+                    self.stats['failed'] += len(batch.messages)
+                    self.done(len(batch.messages))
+                    outcome = 'failed'
+        if outcome != 'retried':
+            # Outside the lock, a delivery may write a checkpoint.
+            for delivery in batch.deliveries:
+                delivery.done(sent)
+        metrics.increment('tracker_texts_total', outcome=outcome, game=batch.game)
+        if sent:
+            # From the first text being queued to the batch being sent, coalescing and rate limits included.
+            metrics.observe('tracker_text_delay_seconds', self.clock() - batch.queued, game=batch.game)
+
+    def done(self, count):
+        # Must be called holding self.condition.
+        self.pending -= count
+        self.condition.notify_all()
+
+    def join(self, timeout=None) -> bool:
+        """
+        This function waits until every queued text has been sent or given up on.
+        param timeout: the longest time to wait (seconds), forever if None.
+        return: True if the queue is empty, False if it timed out.
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: self.pending == 0, timeout)
+
+    def close(self, timeout=None):
+        """
+        This function sends whatever is still queued right away and stops the workers.
+        param timeout: the longest time to wait for each worker (seconds).
+        """
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout)
+
+class AsyncNotificationQueue(NotificationQueue):
+    """
+    A NotificationQueue whose texts are sent by a coroutine on the tracker's
+    event loop instead of worker threads. Texts are queued, coalesced, rate
+    limited and retried the same way. Sends still block inside the transport,
+    so at most workers of them run at once on a small thread pool. Run
+    deliver() as a task for as long as texts may be queued.
+    """
+
+    def __init__(self, transport, workers=8, **options):
+        """
+        param transport: object with a send(recipient, message) method.
+        param workers: the most texts being sent at the same time.
+        param options: the other options of NotificationQueue.
+        """
+        super().__init__(transport, workers=0, **options)
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='notifier')
+        self.loop = None
+        self.wakeup = None
+
+    def schedule(self, batch, sendTime):
+        super().schedule(batch, sendTime)
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    async def deliver(self):
+        """
+        This function sends batches as they fall due until the queue is
+        closed and everything queued has been sent or given up on.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        slots = asyncio.Semaphore(self.workers)
+        sending = set()
+        while True:
+            self.wakeup.clear()
+            with self.condition:
+                batch, timeout = self.popDue(self.clock())
+                finished = batch is None and self.stopping and not self.scheduled
+            if batch is not None:
+                await slots.acquire()
+                task = asyncio.create_task(self.sendBatch(batch, slots))
+                sending.add(task)
+                task.add_done_callback(sending.discard)
+                continue
+            if finished:
+                if not sending:
+                    break
+                await asyncio.wait(set(sending)) # A failed send may still be retried.
+                continue
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self.executor.shutdown()
+
+    async def sendBatch(self, batch, slots):
+        try:
+            with metrics.timer('send', game=batch.game):
+                await self.loop.run_in_executor(self.executor, self.transport.send,
+                                                batch.recipient, batch.text())
+        except Exception:
+            self.finish(batch, sent=False)
+        else:
+            self.finish(batch, sent=True)
+        finally:
+            slots.release()
+
+    def close(self, timeout=None):
+        """
+        This function tells deliver() to send whatever is still queued right
+        away and return. Await the deliver() task to wait for it.
+        """
+        with self.condition:
+            self.stopping = True
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
@@ -0,0 +1,51 @@
+#! /usr/bin/env python3
+# pageSelectors.py - Every css selector and pattern the tracker reads pages
+# with, kept by page layout so a layout change is a data update.
+
+import os, re
+
+# The selectors of each layout of the pages, newest last. When mlb.com or
+# cbssports.com change their pages, copy the latest layout under a new
+# version, fix the selectors that broke, and it becomes the default.
+SELECTOR_VERSIONS = {
+    '2020-08': {
+        # mlb.com Gameday, read every poll by the browser feed.
+        'homeTeam': 'body tr.team-row.home span.short',
+        'awayTeam': 'body tr.team-row.away span.short',
+        'homeRuns': 'body tr.home td.score',
+        'awayRuns': 'body tr.away td.score',
+        'inning': '.show_default.spacer span.full',
+        'play': '.scoringPlays > section:last-of-type div.play:last-of-type p.description',
+        'playInning': '.scoringPlays > section:last-of-type h2',
+        'inningStatus': 'div.matchup-status > div.matchup-progress-container > div > span:nth-child(1)',
+
+        # mlb.com team page, used once to get to the game's Gameday page.
+        'postponed': 'li.mlb-scores__list-item.mlb-scores__list-item--game:last-of-type '
+                     'div.g5-component--mlb-scores__MIG__versus--text',
+        'gamedayLink': 'div > div.g5-component--mlb-scores__button-group.g5-component--'
+                       'mlb-scores__button-group--primary > div > div.p-button.p-button--scores-gameday > a',
+        # Had to select the <li> tag because it obscures the <a> tag.
+        'playsTab': '#gameday-index-component__app > div > div:nth-child(5) > div > '
+                    'div:nth-child(3) > div > div > div > div > nav > ul > li:nth-child(2)',
+
+        # cbssports.com team schedule.
+        'scheduleDates': 'main > div div.TableBaseWrapper:nth-of-type(2) span.CellGameDate',
+        'scheduleTimes': 'main > div div.TableBaseWrapper:nth-of-type(2) div > a[href]',
+        'scheduleOpponents': 'main > div div.TableBaseWrapper:nth-of-type(2) tr.TableBase-bodyTr td:nth-of-type(2)',
+    },
+}
+
+# The layout in use, the newest unless MLB_SELECTORS names another one.
+SELECTOR_VERSION = os.environ.get('MLB_SELECTORS', max(SELECTOR_VERSIONS))
+SELECTORS = SELECTOR_VERSIONS[SELECTOR_VERSION]
+
+# The elements a GameSnapshot is read from.
+SNAPSHOT_FIELDS = ('homeTeam', 'awayTeam', 'homeRuns', 'awayRuns', 'inning', 'play',
+                   'playInning', 'inningStatus')
+SNAPSHOT_SELECTORS = {field: SELECTORS[field] for field in SNAPSHOT_FIELDS}
+
+# Patterns compiled once instead of on every call.
+SPACES = re.compile(' +') # Runs of spaces in a play's description.
+NUMBER = re.compile(r'\d+') # The number of an inning, e.g. 5 in 'Top 5th'.
+SCHEDULE_DATE = re.compile(r'([a-zA-Z]{3}) (\d+), (\d{4})') # AUG 3, 2020
+SCHEDULE_TIME = re.compile(r'(\d+):(\d+) ([a-zA-Z]{2})') # 9:10 PM
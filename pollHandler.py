@@ -0,0 +1,131 @@
+#! /usr/bin/env python3
+# pollHandler.py - What is done with each poll of a game, shared by the
+# thread and asyncio engines so only reading the game differs between them.
+
+import functools
+from gameEvents import EventDiffer, getGameStatus
+from notifier import Delivery
+from schedule import makeGameId
+from teamIds import canonicalTeam
+from metrics import metrics, currentGame
+
+class FollowedGame:
+    """
+    A game being followed: the team it is followed for, its id and the
+    EventDiffer its snapshots go through.
+    """
+    __slots__ = ('team', 'startTime', 'gameId', 'differ', 'scheduler')
+
+    def __init__(self, team, startTime, gameId, differ, scheduler):
+        self.team = team
+        self.startTime = startTime
+        self.gameId = gameId
+        self.differ = differ
+        self.scheduler = scheduler
+
+class PollHandler:
+    """
+    Turns each snapshot of a game into texts: publishes it to the scoreboard,
+    finds its events and alerts, texts them to the subscribers of either team,
+    and saves them to the checkpoints and the event store.
+    """
+
+    def __init__(self, registry, textEvent, notifications, checkpoints=None, eventStore=None,
+                 alerts=None, scoreboard=None, submit=None):
+        """
+        param registry: the SubscriptionRegistry of who to text.
+        param textEvent: callable taking (event, notifications, recipients,
+        delivery) that queues the texts about an event, see baseballUpdates.textEvent().
+        param notifications: the NotificationQueue or AsyncNotificationQueue
+        texts are sent through.
+        param checkpoints: the CheckpointStore the handled events are saved to, a
+        game that was already being followed resumes from it. Nothing is saved if None.
+        param eventStore: the EventStore every event is kept in, nothing is kept if None.
+        param alerts: the AlertEngine situations are checked with, none are if None.
+        param scoreboard: the Scoreboard every poll is published to, nothing is if None.
+        param submit: callable taking (function, *args) that makes each
+        checkpoint write, in the order they are submitted. They are made right
+        away on the calling thread if None.
+        """
+        self.registry = registry
+        self.textEvent = textEvent
+        self.notifications = notifications
+        self.checkpoints = checkpoints
+        self.eventStore = eventStore
+        self.alerts = alerts
+        self.scoreboard = scoreboard
+        self.submit = submit if submit is not None else lambda function, *args: function(*args)
+
+    def start(self, team, startTime, state, scheduler, gameId=None):
+        """
+        This function starts handling the polls of a game, resuming from its
+        checkpoint if it was already being followed.
+        param team: the team whose game is followed.
+        param startTime: the time the game starts, timezone aware.
+        param state: the first GameSnapshot read.
+        param scheduler: the PollScheduler that paces the polls.
+        param gameId: the id of the game on the schedule, so the checkpoints,
+        scoreboard and event store use the id the metrics and leases do. Made
+        from the teams the feed names if None, e.g. for a replay.
+        return: a FollowedGame object, None if the game was already over when
+        it was first read, e.g. the tracker started late, and nothing about it
+        was checkpointed.
+        """
+        if gameId is None:
+            gameId = makeGameId(canonicalTeam(state.homeTeam), canonicalTeam(state.awayTeam), startTime)
+        differ = self.checkpoints.restore(gameId) if self.checkpoints is not None else EventDiffer()
+        # Otherwise every scoring play of a finished game would be texted at once.
+        if state.status == 'FINAL' and differ.sequence == 0:
+            print('The ' + gameId + ' game is already over, not texting it')
+            return None
+        return FollowedGame(team, startTime, gameId, differ, scheduler)
+
+    def handle(self, game, state):
+        """
+        This function handles one poll of a game.
+        param game: the FollowedGame.
+        param state: the GameSnapshot just read.
+        return: 'POSTPONED' or 'FINAL' once the game is over, None to keep polling.
+        """
+        differ = game.differ
+        metrics.increment('tracker_polls_total', phase=game.scheduler.phase)
+        if self.scoreboard is not None:
+            self.scoreboard.publish(game.gameId, state)
+        # The game is read once, and every subscriber of either team is texted.
+        with metrics.timer('diff'):
+            events = differ.diff(state)
+        if self.alerts is not None:
+            with metrics.timer('alerts'):
+                events += self.alerts.check(game.gameId, state, differ)
+        # Checkpointed as pending until every text about them was sent, so a
+        # crash while they wait in the queue sends them after the restart.
+        delivery = None
+        if events and self.checkpoints is not None:
+            self.submit(self.checkpoints.record, game.gameId, events, getGameStatus(differ), True)
+            delivery = Delivery(functools.partial(self.submit, self.checkpoints.delivered, game.gameId,
+                                                  [event.sequence for event in events]))
+        teams = (game.team, state.homeTeam, state.awayTeam)
+        for event in events:
+            recipients = self.registry.recipientsFor(event, teams)
+            if recipients:
+                self.textEvent(event, self.notifications, recipients, delivery)
+        if delivery is not None:
+            delivery.seal()
+        if events and self.eventStore is not None:
+            self.eventStore.append(game.gameId, game.startTime, events)
+        if differ.postponed:
+            return 'POSTPONED'
+        if differ.final:
+            return 'FINAL'
+        return None
+
+    def stop(self, game):
+        """
+        This function stops handling the polls of a game, and prints where the
+        time went with --profile.
+        param game: the FollowedGame, None if the game was never read.
+        """
+        if game is not None and self.scoreboard is not None:
+            self.scoreboard.forget(game.gameId)
+        if metrics.profiling:
+            print(metrics.profile(currentGame.get()))
@@ -0,0 +1,111 @@
+#! /usr/bin/env python3
+# pollScheduler.py - Decides how long to wait before reading a game again.
+
+import collections, random, time
+from pageSelectors import NUMBER
+
+# Seconds between polls in each phase of a game. A scoring play mid-inning is
+# found within ~12 s like before, and between innings we keep polling instead
+# of going blind for 3 minutes, while a whole game stays at or under the
+# number of requests the fixed 10 s + 180 s sleeps used to make.
+POLL_INTERVALS = {
+    'PREGAME': 60,
+    'MID_INNING': 12,
+    'BETWEEN_INNINGS': 20,
+    'DELAY': 120,
+    'EXTRA_INNINGS': 12, # Its own phase for the metrics, polled like any inning to keep the cost bounded.
+}
+
+MAX_BACKOFF = 300 # Never wait more than 5 minutes after errors (seconds).
+RATE_WINDOW = 600 # Poll rate is measured over the last 10 minutes (seconds).
+
+def getInningNumber(inning):
+    """
+    This function gets the number of the inning.
+    param inning: the inning as the feed shows it (e.g. 'Top 5th').
+    return: the inning number, None if there is none.
+    """
+    inningMatch = NUMBER.search(inning)
+    return int(inningMatch.group()) if inningMatch else None
+
+def getPhase(snapshot) -> str:
+    """
+    This function finds the phase of the game, one of the keys of POLL_INTERVALS.
+    param snapshot: GameSnapshot object.
+    return: the phase of the game.
+    """
+    if snapshot.status == 'PREVIEW':
+        return 'PREGAME'
+    if snapshot.status == 'DELAYED':
+        return 'DELAY'
+    if snapshot.inningOver:
+        return 'BETWEEN_INNINGS'
+    inningNumber = getInningNumber(snapshot.inning)
+    if inningNumber is not None and inningNumber >= 10:
+        return 'EXTRA_INNINGS'
+    return 'MID_INNING'
+
+class PollScheduler:
+    """
+    Picks the wait before the next poll of a game from the phase the game is
+    in, and backs off with jitter while polls keep failing.
+    """
+
+    def __init__(self, intervals=POLL_INTERVALS, maxBackoff=MAX_BACKOFF, clock=time.monotonic):
+        """
+        param intervals: seconds between polls for each phase.
+        param maxBackoff: the longest wait after errors (seconds).
+        param clock: function returning the current time in seconds.
+        """
+        self.intervals = intervals
+        self.maxBackoff = maxBackoff
+        self.clock = clock
+        self.phase = 'PREGAME'
+        self.failures = 0
+        self.snapshot = None # The last GameSnapshot read, for the control api.
+        self.polls = collections.deque() # Times of the polls inside RATE_WINDOW.
+
+    def recordPoll(self):
+        now = self.clock()
+        self.polls.append(now)
+        while self.polls and self.polls[0] < now - RATE_WINDOW:
+            self.polls.popleft()
+
+    def succeeded(self, snapshot) -> float:
+        """
+        This function records a successful poll.
+        param snapshot: the GameSnapshot the poll returned.
+        return: seconds to wait before the next poll.
+        """
+        self.recordPoll()
+        self.failures = 0
+        self.snapshot = snapshot
+        self.phase = getPhase(snapshot)
+        return self.intervals[self.phase]
+
+    def failed(self, retryAfter=None) -> float:
+        """
+        This function records a failed poll.
+        param retryAfter: seconds the feed asked to wait, e.g. until its
+        breaker lets a poll through. The backoff does not grow then.
+        return: seconds to wait before the next poll, doubling with every
+        failure in a row, with jitter so games that failed together do not
+        all retry together.
+        """
+        self.recordPoll()
+        if retryAfter is not None:
+            return retryAfter
+        self.failures += 1
+        backoff = min(self.maxBackoff, self.intervals[self.phase] * 2 ** self.failures)
+        return random.uniform(backoff / 2, backoff)
+
+    @property
+    def pollRate(self) -> float:
+        """
+        The polls per minute made over the last RATE_WINDOW seconds.
+        """
+        now = self.clock()
+        recent = [poll for poll in self.polls if poll >= now - RATE_WINDOW]
+        if len(recent) < 2 or recent[-1] == recent[0]:
+            return 0.0
+        return (len(recent) - 1) * 60 / (recent[-1] - recent[0])
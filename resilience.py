@@ -0,0 +1,286 @@
+#! /usr/bin/env python3
+# resilience.py - Keeps a failing game from stalling the others: circuit
+# breakers per game, a retry budget shared by every game, and feeds that are
+# reopened in the background.
+
+import collections, contextvars, threading, time
+from gameFeed import GameFeed, GameFeedError, GameFeedEnded
+from metrics import metrics, currentGame
+
+BREAKER_FAILURES = 5 # Failed polls in a row that open a game's breaker.
+BREAKER_COOLDOWN = 60 # Seconds an open breaker waits before letting a poll through.
+RETRY_RATIO = 0.1 # Retries allowed for each call made, across every game.
+RETRY_MINIMUM = 10 # Retries always allowed in a RETRY_WINDOW.
+RETRY_WINDOW = 60 # Seconds the calls and retries are counted over.
+RECOVERY_CHECK = 5 # Seconds between polls of a game whose feed is being reopened.
+
+class CircuitOpen(GameFeedError):
+    """Raised instead of polling a game whose breaker is open."""
+
+    def __init__(self, message, retryAfter):
+        super().__init__(message)
+        self.retryAfter = retryAfter
+
+def failureCause(exc) -> str:
+    """
+    This function names what made a call fail, for the failure counts.
+    param exc: the exception raised.
+    return: the class of the exception it was raised from, e.g. 'ReadTimeout'.
+    """
+    while exc.__cause__ is not None:
+        exc = exc.__cause__
+    return type(exc).__name__
+
+class CircuitBreaker:
+    """
+    Stops polling a game after BREAKER_FAILURES failed polls in a row. Once
+    BREAKER_COOLDOWN has passed one poll is let through: the breaker closes
+    again if it works and stays open for another cooldown if it does not.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN, clock=time.monotonic):
+        """
+        param failures: failed calls in a row that open the breaker.
+        param cooldown: seconds the breaker stays open.
+        param clock: function returning the current time in seconds.
+        """
+        self.failures = failures
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = 'CLOSED' # 'CLOSED', 'OPEN' or 'HALF_OPEN'.
+        self.failuresInRow = 0
+        self.openedAt = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        This function checks if a call can be made.
+        return: True if the breaker is closed, or if it has been open for the
+        whole cooldown and this is the one call let through.
+        """
+        with self.lock:
+            if self.state == 'CLOSED':
+                return True
+            if self.state == 'OPEN' and self.clock() - self.openedAt >= self.cooldown:
+                self.state = 'HALF_OPEN'
+                return True
+            return False
+
+    def remaining(self) -> float:
+        """
+        This function gets how long until a call is let through.
+        return: seconds, 0 if the breaker is closed or its cooldown is over.
+        """
+        with self.lock:
+            if self.state == 'CLOSED':
+                return 0.0
+            return max(0.0, self.cooldown - (self.clock() - self.openedAt))
+
+    def succeeded(self):
+        with self.lock:
+            self.state = 'CLOSED'
+            self.failuresInRow = 0
+
+    def failed(self) -> bool:
+        """
+        This function records a failed call.
+        return: True if the breaker opened, or opened again after the call
+        let through failed.
+        """
+        with self.lock:
+            self.failuresInRow += 1
+            if self.state == 'HALF_OPEN' or (self.state == 'CLOSED' and self.failuresInRow >= self.failures):
+                self.state = 'OPEN'
+                self.openedAt = self.clock()
+                return True
+            return False
+
+class RetryBudget:
+    """
+    Caps the retries made across every game to a share of the calls made, so
+    when a backend is down the retries do not pile onto it.
+    """
+
+    def __init__(self, ratio=RETRY_RATIO, minimum=RETRY_MINIMUM, window=RETRY_WINDOW, clock=time.monotonic):
+        """
+        param ratio: retries allowed for each call made in the window.
+        param minimum: retries allowed in the window however few calls were made.
+        param window: seconds the calls and retries are counted over.
+        param clock: function returning the current time in seconds.
+        """
+        self.ratio = ratio
+        self.minimum = minimum
+        self.window = window
+        self.clock = clock
+        self.calls = collections.deque()
+        self.retries = collections.deque()
+        self.lock = threading.Lock()
+
+    def trim(self, now):
+        # Must be called holding self.lock.
+        for times in (self.calls, self.retries):
+            while times and times[0] < now - self.window:
+                times.popleft()
+
+    def recordCall(self):
+        now = self.clock()
+        with self.lock:
+            self.calls.append(now)
+            self.trim(now)
+
+    def canRetry(self) -> bool:
+        """
+        This function takes a retry out of the budget.
+        return: True if the retry can be made, False if the budget is spent.
+        """
+        now = self.clock()
+        with self.lock:
+            self.trim(now)
+            if len(self.retries) >= self.minimum + self.ratio * len(self.calls):
+                return False
+            self.retries.append(now)
+            return True
+
+retryBudget = RetryBudget() # The budget every game retries from.
+
+def retry(function, attempts=3, retryOn=(Exception,), budget=retryBudget, step=None):
+    """
+    This function calls a function again right away when it fails, as long
+    as there are attempts and budget left. It never sleeps.
+    param function: the function to call, without arguments.
+    param attempts: the most calls made.
+    param retryOn: the exceptions worth another call.
+    param budget: the RetryBudget the retries are taken from.
+    param step: the name the retries are counted under, the function's if None.
+    return: what the function returned.
+    raise: the last exception if no call worked.
+    """
+    step = step or getattr(function, '__name__', 'call')
+    for attempt in range(attempts):
+        budget.recordCall()
+        try:
+            return function()
+        except retryOn:
+            if attempt == attempts - 1 or not budget.canRetry():
+                if attempt < attempts - 1:
+                    metrics.increment('tracker_retries_denied_total', step=step)
+                raise
+            metrics.increment('tracker_retries_total', step=step)
+
+class ResilientGameFeed(GameFeed):
+    """
+    Puts a game's feed behind a CircuitBreaker. While the breaker is open the
+    game is not polled at all, polls fail with CircuitOpen right away and the
+    game waits until the breaker lets a poll through, instead of backing off
+    further. When it opens, the feed is closed and opened again on a
+    background thread, e.g. with a new browser, so the game loop never waits
+    on the recovery, and the game is polled again soon after it reopens.
+    """
+
+    def __init__(self, makeFeed, breaker=None):
+        """
+        param makeFeed: callable that returns a new GameFeed, called again to recover.
+        param breaker: the CircuitBreaker of the game, a new one if None.
+        """
+        self.makeFeed = makeFeed
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.feed = makeFeed()
+        self.team = None
+        self.startTime = None
+        self.recovering = False
+        self.broken = False # The last recovery failed, the next one is due when the breaker allows.
+        self.closed = False
+        self.lock = threading.Lock()
+
+    @property
+    def kind(self):
+        return self.feed.kind
+
+    @property
+    def lastDocument(self):
+        return self.feed.lastDocument
+
+    def open(self, team, startTime) -> bool:
+        self.team = team
+        self.startTime = startTime
+        return self.feed.open(team, startTime)
+
+    def fetch(self):
+        with self.lock:
+            if self.recovering:
+                raise CircuitOpen('Reopening the ' + self.team + ' game', RECOVERY_CHECK)
+            if not self.breaker.allow():
+                raise CircuitOpen('Not polling the ' + self.team + ' game until it recovers',
+                                  max(self.breaker.remaining(), RECOVERY_CHECK))
+            if self.broken:
+                self.startRecovery()
+                raise CircuitOpen('Reopening the ' + self.team + ' game', RECOVERY_CHECK)
+            feed = self.feed
+        try:
+            state = feed.fetch()
+        except GameFeedEnded:
+            raise
+        except GameFeedError as exc:
+            metrics.increment('tracker_failures_total', cause=failureCause(exc))
+            if self.breaker.failed():
+                metrics.increment('tracker_breaker_opened_total')
+                with self.lock:
+                    self.startRecovery()
+                # Checked again soon, the recovery may well be done by then.
+                raise CircuitOpen('Reopening the ' + self.team + ' game', RECOVERY_CHECK) from exc
+            raise
+        self.breaker.succeeded()
+        return state
+
+    def startRecovery(self):
+        # Must be called holding self.lock.
+        if self.recovering or self.closed:
+            return
+        self.recovering = True
+        # Runs in a copy of the context, so its metrics are labelled with the game.
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(self.recover,), daemon=True).start()
+
+    def recover(self):
+        """
+        This function closes the feed and opens a new one, on its own thread.
+        From startRecovery() until it returns the recovery owns both feeds:
+        it always closes the old one, and closes the new one too if the game
+        was closed meanwhile.
+        """
+        game = currentGame.get()
+        feed = None
+        outcome = 'failed'
+        try:
+            try:
+                self.feed.close()
+            except Exception as exc:
+                print('Could not close the ' + game + ' feed: ' + repr(exc))
+            feed = self.makeFeed()
+            feed.open(self.team, self.startTime)
+            outcome = 'reopened'
+        except Exception as exc:
+            # Anything, so a recovery that broke never leaves the game stuck recovering.
+            print('Could not reopen the ' + game + ' game: ' + repr(exc))
+        finally:
+            metrics.increment('tracker_recoveries_total', outcome=outcome)
+            with self.lock:
+                self.recovering = False
+                self.broken = outcome == 'failed'
+                replaced = outcome == 'reopened' and not self.closed
+                if replaced:
+                    self.feed = feed
+                    self.breaker.succeeded() # The next poll uses the new feed.
+            if feed is not None and not replaced:
+                try:
+                    feed.close()
+                except Exception as exc:
+                    print('Could not close the ' + game + ' feed: ' + repr(exc))
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            recovering = self.recovering
+        # A recovery under way closes both the old feed and the one it opens.
+        if not recovering:
+            self.feed.close()
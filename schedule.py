@@ -0,0 +1,138 @@
+#! /usr/bin/env python3
+# schedule.py - Keeps the games of the tracked teams in start time order.
+
+import bisect, datetime, threading
+from leagueSchedule import loadLeagueSchedule, FETCH_WORKERS
+
+STATUSES = ('SCHEDULED', 'LIVE', 'POSTPONED', 'FINAL')
+
+def makeGameId(homeTeam, awayTeam, startTime) -> str:
+    """
+    This function makes the id of a game, the same on both teams' schedules.
+    param homeTeam: the home team.
+    param awayTeam: the away team.
+    param startTime: the time the game starts, timezone aware.
+    return: the id, e.g. 'DODGERS@PADRES-20200803T0110Z'.
+    """
+    startUTC = startTime.astimezone(datetime.timezone.utc)
+    return str(awayTeam) + '@' + str(homeTeam) + '-' + startUTC.strftime('%Y%m%dT%H%MZ')
+
+class ScheduledGame:
+    """
+    A game on the schedule. startTime is timezone aware, status is one of
+    STATUSES. The gameId includes the start time, so a game that is moved is
+    removed from a Schedule and added again under its new id, see
+    GameTracker.mergeSchedule().
+    """
+    __slots__ = ('gameId', 'homeTeam', 'awayTeam', 'startTime', 'status')
+
+    def __init__(self, homeTeam, awayTeam, startTime, status='SCHEDULED', gameId=None):
+        self.gameId = gameId if gameId is not None else makeGameId(homeTeam, awayTeam, startTime)
+        self.homeTeam = homeTeam
+        self.awayTeam = awayTeam
+        self.startTime = startTime
+        self.status = status
+
+    def __repr__(self):
+        return ('ScheduledGame(' + repr(self.gameId) + ', ' + self.startTime.isoformat() +
+                ', ' + self.status + ')')
+
+class Schedule:
+    """
+    Games indexed by id and kept in a list sorted by (startTime, gameId), so
+    finding the next game is a binary search.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, games=()):
+        self.keys = [] # Sorted (startTime, gameId) of every game.
+        self.games = {} # gameId -> ScheduledGame.
+        self.lock = threading.RLock()
+        for game in games:
+            self.add(game)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        with self.lock:
+            return iter([self.games[gameId] for startTime, gameId in self.keys])
+
+    def __contains__(self, gameId):
+        return gameId in self.games
+
+    def get(self, gameId):
+        return self.games.get(gameId)
+
+    def add(self, game):
+        """
+        This function adds a game, replacing the game with the same id.
+        param game: ScheduledGame object.
+        """
+        with self.lock:
+            if game.gameId in self.games:
+                self.remove(game.gameId)
+            self.games[game.gameId] = game
+            bisect.insort(self.keys, (game.startTime, game.gameId))
+
+    def remove(self, gameId):
+        """
+        This function removes a game.
+        param gameId: the id of the game.
+        return: the ScheduledGame removed, None if there was none.
+        """
+        with self.lock:
+            game = self.games.pop(gameId, None)
+            if game is not None:
+                index = bisect.bisect_left(self.keys, (game.startTime, gameId))
+                del self.keys[index]
+            return game
+
+    def setStatus(self, gameId, status):
+        """
+        This function updates the status of a game in place.
+        param gameId: the id of the game.
+        param status: one of STATUSES.
+        """
+        if status not in STATUSES:
+            raise ValueError('Unknown status: ' + status)
+        with self.lock:
+            self.games[gameId].status = status
+
+    def nextGame(self, after, exclude=()):
+        """
+        This function finds the first game starting at or after a time that
+        is not postponed, over, or excluded.
+        param after: timezone aware datetime.
+        param exclude: ids of games to skip, e.g. the ones already started.
+        return: a ScheduledGame object, None if there is none.
+        """
+        with self.lock:
+            index = bisect.bisect_left(self.keys, (after,))
+            for position in range(index, len(self.keys)):
+                game = self.games[self.keys[position][1]]
+                gameId = game.gameId
+                if game.status in ('SCHEDULED', 'LIVE') and gameId not in exclude:
+                    return game
+            return None
+
+def buildSchedule(teams, cache=None, workers=FETCH_WORKERS) -> Schedule:
+    """
+    This function builds the schedule of a set of teams from one
+    loadLeagueSchedule(), which loads the teams' schedules at the same time
+    and lists a game between two of the teams once. A team whose schedule
+    can not be loaded is skipped.
+    param teams: the teams, as used in teamSchedule.
+    param cache: optional ScheduleCache the schedules are read through.
+    param workers: the number of schedules loaded at the same time.
+    return: a Schedule object.
+    """
+    league = loadLeagueSchedule(teams, fetchWorkers=workers, cache=cache)
+    for team, error in sorted(league.failures.items()):
+        print('Could not load the ' + team + ' schedule: ' + error)
+    schedule = Schedule()
+    for startTime, homeTeam, awayTeam in league.games:
+        game = ScheduledGame(homeTeam, awayTeam, startTime)
+        if game.gameId not in schedule:
+            schedule.add(game)
+    return schedule
@@ -0,0 +1,108 @@
+#! /usr/bin/env python3
+# scheduleCache.py - Keeps parsed team schedules on disk so they are not
+# downloaded and parsed again every time the tracker starts.
+
+import datetime, hashlib, json, os, threading, time, requests
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'mlb-game-tracker', 'schedules')
+CACHE_TTL = 6 * 60 * 60 # A cached schedule is used without asking the site for 6 hours (seconds).
+CACHE_VERSION = 2 # Bumped when the format of the cached games changes.
+
+class ScheduleCache:
+    """
+    Caches the parsed games of each url in its own json file, along with the
+    ETag and Last-Modified headers of the page. Schedules younger than the ttl
+    are returned without touching the network, older ones are revalidated with
+    a conditional GET and only parsed again if the page changed.
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL, session=None):
+        """
+        param directory: where the cache files are kept.
+        param ttl: seconds a cached schedule is used before it is revalidated.
+        param session: a requests.Session to download pages with, one is made if None.
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.session = session if session is not None else requests.Session()
+        self.entries = {} # Entries already read from disk, by url.
+        self.lock = threading.Lock()
+
+    def path(self, url) -> str:
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.directory, key + '.v' + str(CACHE_VERSION) + '.json')
+
+    def read(self, url):
+        """
+        This function reads the cache entry of a url.
+        param url: the url of the schedule.
+        return: the entry as a dictionary, None if there is none.
+        """
+        with self.lock:
+            entry = self.entries.get(url)
+        if entry is not None:
+            return entry
+        try:
+            with open(self.path(url)) as cacheFile:
+                entry = json.load(cacheFile)
+            entry['games'] = [(datetime.datetime.fromisoformat(startTime), opponent, isHome)
+                              for startTime, opponent, isHome in entry['games']]
+        except (OSError, ValueError, KeyError):
+            return None
+        if entry.get('url') != url:
+            return None
+        with self.lock:
+            self.entries[url] = entry
+        return entry
+
+    def write(self, url, entry):
+        """
+        This function saves the cache entry of a url. The file is replaced in
+        one step so a crash never leaves half an entry behind.
+        param url: the url of the schedule.
+        param entry: dictionary with the games, headers and the time it was fetched.
+        """
+        with self.lock:
+            self.entries[url] = entry
+        games = [[startTime.isoformat(), opponent, isHome] for startTime, opponent, isHome in entry['games']]
+        document = dict(entry, games=games)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(url)
+        with open(path + '.tmp', 'w') as cacheFile:
+            json.dump(document, cacheFile)
+        os.replace(path + '.tmp', path)
+
+    def fetch(self, url, parse):
+        """
+        This function gets the schedule of a url from the cache, downloading it
+        only if the cached one is too old and the page has changed.
+        param url: the url of the schedule.
+        param parse: function turning the page's html into a list of
+        (startTime, opponent, isHome) tuples, see getSchedule.parseScheduleGames().
+        return: the list of games.
+        """
+        entry = self.read(url)
+        if entry is not None and time.time() - entry['fetched'] < self.ttl:
+            return entry['games']
+
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('lastModified'):
+                headers['If-Modified-Since'] = entry['lastModified']
+
+        res = self.session.get(url, headers=headers)
+        if res.status_code == 304 and entry is not None:
+            entry = dict(entry, fetched=time.time())
+        else:
+            res.raise_for_status() # Check to see if we downloaded the page successfully.
+            entry = {
+                'url': url,
+                'etag': res.headers.get('ETag'),
+                'lastModified': res.headers.get('Last-Modified'),
+                'fetched': time.time(),
+                'games': parse(res.text),
+            }
+        self.write(url, entry)
+        return entry['games']
@@ -0,0 +1,304 @@
+#! /usr/bin/env python3
+# scoreboard.py - Publishes the live score of every game followed to a
+# memory-mapped file, so other programs on the machine can read the scores
+# without scraping anything themselves.
+# Usage: python3 scoreboard.py [--path FILE] [--watch SECONDS]
+
+import argparse, mmap, os, struct, tempfile, threading, time
+try:
+    import fcntl
+except ImportError:
+    fcntl = None # Windows, where only one tracker should publish to a scoreboard.
+
+# In shared memory where there is some, so publishing never waits on a disk.
+SCOREBOARD_PATH = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+                               'mlb-game-tracker-scoreboard')
+SCOREBOARD_SLOTS = 64 # Games the scoreboard holds, a day of games with doubleheaders.
+FINISHED_KEPT = 3600 # Seconds a final score stays up before its slot can be reused.
+ABANDONED_AFTER = 43200 # Seconds after which a game no one updates is dropped.
+READ_ATTEMPTS = 1000 # Reads of a record before giving up on a writer that died mid-write.
+
+MAGIC = b'MLBSCORE'
+LAYOUT = 1 # Changed whenever RECORD changes, readers check it.
+HEADER = struct.Struct('<8sIII') # MAGIC, LAYOUT, slots, size of a record.
+HEADER_SIZE = 64
+
+# Each record starts with its version, odd while the record is being written.
+# A reader reads the version, the fields, then the version again, and keeps
+# the fields only if both versions are the same even number.
+VERSION = struct.Struct('<Q')
+RECORD = struct.Struct(
+    '<d'   # updated, seconds since the epoch.
+    '48s'  # gameId, see schedule.makeGameId(), empty for a free slot.
+    '16s'  # homeTeam
+    '16s'  # awayTeam
+    '16s'  # inning, e.g. 'Top 5th'.
+    '12s'  # status, e.g. 'LIVE'.
+    'hh'   # homeRuns, awayRuns, -1 if not known.
+    'hh'   # homeHits, awayHits, -1 if not known.
+    'bb'   # outs, bases (1 first, 2 second, 4 third), -1 if not known.
+    'H'    # plays, the number of scoring plays so far.
+    'i'    # lastPlay, the id of the last scoring play, -1 if none or not a number.
+)
+FIELDS = ('updated', 'gameId', 'homeTeam', 'awayTeam', 'inning', 'status',
+          'homeRuns', 'awayRuns', 'homeHits', 'awayHits', 'outs', 'bases', 'plays', 'lastPlay')
+TEXT_FIELDS = ('gameId', 'homeTeam', 'awayTeam', 'inning', 'status')
+RECORD_SIZE = 192 # VERSION and RECORD rounded up to whole cache lines.
+
+def known(value) -> int:
+    return -1 if value is None else value
+
+def lastPlayId(plays) -> int:
+    # The stats api numbers its plays, the page feed does not.
+    if plays and isinstance(plays[-1][0], int):
+        return plays[-1][0]
+    return -1
+
+def openMap(path, writable):
+    """
+    This function maps a scoreboard file, making it if a writer opens it first.
+    param path: the scoreboard file.
+    param writable: True for a writer.
+    return: (file descriptor, mmap, number of slots).
+    raise: ValueError if the file is not a scoreboard of this LAYOUT.
+    """
+    if writable:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        with fileLock(fd):
+            if os.fstat(fd).st_size < HEADER_SIZE or os.pread(fd, len(MAGIC), 0) != MAGIC \
+                    or HEADER.unpack(os.pread(fd, HEADER.size, 0))[1] != LAYOUT:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, HEADER_SIZE + SCOREBOARD_SLOTS * RECORD_SIZE)
+                os.pwrite(fd, HEADER.pack(MAGIC, LAYOUT, SCOREBOARD_SLOTS, RECORD_SIZE), 0)
+    else:
+        fd = os.open(path, os.O_RDONLY)
+    magic, layout, slots, recordSize = HEADER.unpack(os.pread(fd, HEADER.size, 0))
+    if magic != MAGIC or layout != LAYOUT or recordSize != RECORD_SIZE:
+        os.close(fd)
+        raise ValueError(path + ' is not a scoreboard of layout ' + str(LAYOUT))
+    access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+    return fd, mmap.mmap(fd, HEADER_SIZE + slots * RECORD_SIZE, access=access), slots
+
+class fileLock:
+    """
+    Locks a file against the other processes for the length of a with block,
+    used when a slot is given to a game. Publishing never takes it.
+    """
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN)
+
+def readRecord(view, offset):
+    """
+    This function reads a record consistently while it may be written.
+    param view: the mapped scoreboard.
+    param offset: where the record starts.
+    return: the tuple of RECORD fields, None if no consistent copy could be read.
+    """
+    for attempt in range(READ_ATTEMPTS):
+        before, = VERSION.unpack_from(view, offset)
+        if before & 1:
+            continue
+        fields = RECORD.unpack_from(view, offset + VERSION.size)
+        after, = VERSION.unpack_from(view, offset)
+        if before == after:
+            return fields
+    return None
+
+def recordDict(fields) -> dict:
+    record = dict(zip(FIELDS, fields))
+    for name in TEXT_FIELDS:
+        record[name] = record[name].rstrip(b'\0').decode()
+    return record
+
+class Scoreboard:
+    """
+    Writes the latest snapshot of each game to its own fixed-size record of a
+    memory-mapped file. Each game thread or task only ever writes its own
+    record, so publishing takes no lock: a seqlock version lets readers notice
+    a record changing under them and read it again. Taking a free record for
+    a new game is the only step that locks, once per game.
+    """
+
+    def __init__(self, path=SCOREBOARD_PATH, clock=time.time):
+        """
+        param path: the scoreboard file, shared by every tracker on the machine.
+        param clock: function returning the current time in seconds.
+        """
+        self.path = path
+        self.clock = clock
+        self.fd, self.view, self.slots = openMap(path, writable=True)
+        self.offsets = {} # The record of each game published, by gameId.
+        self.versions = {} # The version of each record this tracker wrote last.
+        self.published = {} # The snapshot of each game published last, by gameId.
+        self.full = False
+        self.lock = threading.Lock()
+
+    def publish(self, gameId, snapshot):
+        """
+        This function writes the latest snapshot of a game to its record.
+        param gameId: the id of the game, see schedule.makeGameId().
+        param snapshot: the GameSnapshot just read, not written again after a
+        failed poll left it unchanged.
+        """
+        if self.published.get(gameId) is snapshot:
+            return
+        self.published[gameId] = snapshot
+        plays = snapshot.plays
+        fields = RECORD.pack(
+            self.clock(), gameId.encode(), str(snapshot.homeTeam).encode(),
+            str(snapshot.awayTeam).encode(), str(snapshot.inning).encode(), snapshot.status.encode(),
+            known(snapshot.homeRuns), known(snapshot.awayRuns),
+            known(snapshot.homeHits), known(snapshot.awayHits),
+            known(snapshot.outs), known(snapshot.bases), len(plays), lastPlayId(plays))
+        offset = self.offsets.get(gameId)
+        if offset is None:
+            # Written before the lock is let go, so no other tracker takes the record too.
+            with self.lock, fileLock(self.fd):
+                offset = self.claim(gameId)
+                if offset is not None:
+                    self.write(offset, fields)
+            return
+        self.write(offset, fields)
+
+    def write(self, offset, fields):
+        # Only the game's own thread or task writes its record.
+        version = self.versions[offset]
+        VERSION.pack_into(self.view, offset, version + 1)
+        self.view[offset + VERSION.size:offset + VERSION.size + RECORD.size] = fields
+        VERSION.pack_into(self.view, offset, version + 2)
+        self.versions[offset] = version + 2
+
+    def claim(self, gameId):
+        """
+        This function gives a game a record: the one it already had, e.g.
+        before a restart, a free one, or the one of the game that finished
+        first. A dead tracker's game left half written is fixed here too.
+        Must be called holding self.lock and the fileLock.
+        param gameId: the id of the game.
+        return: the offset of the record, None if the scoreboard is full.
+        """
+        now = self.clock()
+        chosen, chosenUpdated = None, None
+        for slot in range(self.slots):
+            offset = HEADER_SIZE + slot * RECORD_SIZE
+            fields = RECORD.unpack_from(self.view, offset + VERSION.size)
+            updated = fields[0]
+            slotGame = fields[1].rstrip(b'\0').decode()
+            status = fields[5].rstrip(b'\0').decode()
+            if slotGame == gameId:
+                chosen = offset
+                break
+            if offset in self.offsets.values(): # Taken by another game of this tracker.
+                continue
+            free = not slotGame or now - updated > ABANDONED_AFTER \
+                or (status in ('FINAL', 'POSTPONED') and now - updated > FINISHED_KEPT)
+            if free and (chosen is None or updated < chosenUpdated):
+                chosen, chosenUpdated = offset, updated
+        if chosen is None:
+            if not self.full:
+                print('The scoreboard is full, ' + gameId + ' is not published')
+                self.full = True
+            return None
+        version, = VERSION.unpack_from(self.view, chosen)
+        self.versions[chosen] = version + (version & 1) # Even again if a writer died mid-write.
+        self.offsets[gameId] = chosen
+        return chosen
+
+    def forget(self, gameId):
+        """
+        This function stops publishing a game. Its last score stays up until
+        its record is needed for another game.
+        param gameId: the id of the game.
+        """
+        with self.lock:
+            self.offsets.pop(gameId, None)
+            self.published.pop(gameId, None)
+
+    def close(self):
+        self.view.flush()
+        self.view.close()
+        os.close(self.fd)
+
+class ScoreboardReader:
+    """
+    Reads the scoreboard a tracker publishes. The file is mapped read only,
+    so any number of readers can read it while it is written without ever
+    holding up the tracker.
+    """
+
+    def __init__(self, path=SCOREBOARD_PATH):
+        """
+        param path: the scoreboard file.
+        raise: FileNotFoundError if no tracker made it yet.
+        """
+        self.path = path
+        self.fd, self.view, self.slots = openMap(path, writable=False)
+
+    def games(self) -> list:
+        """
+        This function reads every game on the scoreboard.
+        return: a list with a dictionary of FIELDS for each game, by start time.
+        """
+        games = []
+        for slot in range(self.slots):
+            fields = readRecord(self.view, HEADER_SIZE + slot * RECORD_SIZE)
+            if fields is not None and fields[1].strip(b'\0'):
+                games.append(recordDict(fields))
+        return sorted(games, key=lambda game: game['gameId'].rsplit('-', 1)[-1])
+
+    def game(self, gameId):
+        """
+        This function reads a single game.
+        param gameId: the id of the game, see schedule.makeGameId().
+        return: a dictionary of FIELDS, None if the game is not on the scoreboard.
+        """
+        for game in self.games():
+            if game['gameId'] == gameId:
+                return game
+        return None
+
+    def close(self):
+        self.view.close()
+        os.close(self.fd)
+
+def formatGame(game) -> str:
+    score = lambda runs: '-' if runs < 0 else str(runs)
+    line = '{:<12} {:>2}  {:<12} {:>2}  {}'.format(game['awayTeam'], score(game['awayRuns']),
+                                                    game['homeTeam'], score(game['homeRuns']),
+                                                    game['inning'] if game['status'] == 'LIVE' else game['status'])
+    if game['status'] == 'LIVE' and game['outs'] >= 0:
+        line += ', ' + str(game['outs']) + ' out'
+    return line
+
+def main():
+    parser = argparse.ArgumentParser(description='Prints the scores a running tracker publishes.')
+    parser.add_argument('--path', default=SCOREBOARD_PATH, help='the scoreboard file (default %(default)s)')
+    parser.add_argument('--watch', type=float, metavar='SECONDS', help='print the scores again every SECONDS')
+    args = parser.parse_args()
+
+    reader = ScoreboardReader(args.path)
+    try:
+        while True:
+            for game in reader.games():
+                print(formatGame(game))
+            if args.watch is None:
+                break
+            time.sleep(args.watch)
+            print()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+#! /usr/bin/env python3
+# seleniumFeed.py - Reads games by driving Chrome through mlb.com, the backend
+# used when the stats api can not find a game. Selenium is only imported once
+# this module is.
+
+import chromedriver_binary
+from gameFeed import GameFeed, GameFeedError
+from gameSnapshot import GameSnapshot, SNAPSHOT_SCRIPT, parsePageTexts
+from pageSelectors import SELECTORS, SNAPSHOT_SELECTORS
+from browserPool import BrowserPoolError
+from metrics import metrics
+from resilience import retry
+from teamPages import teamPage
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import WebDriverException
+
+# TimeoutException thrown by 'presence_of_element_located' if there is no element.
+# StaleElementReferenceException thrown if the page refreshes between 
+# getting the element and 'get_attribute'.
+# WebDriverException thrown if the page reaches an error (not loadable).
+
+def launchBrowser(url):
+    """
+    This functions launches Chrome using selenium webdriver with the provided url.
+    param url: the url to the team's homepage on mlb.com/[team]. 
+    return: a WebDriver object.
+    """
+    browser = webdriver.Chrome()
+    browser.implicitly_wait(30)
+    browser.get(url)
+    browser.maximize_window()
+    return browser
+
+class PageNotLoaded(GameFeedError):
+    """Raised when the game's scoreboard is not on the page, e.g. it did not load in time."""
+
+def retryFindClick(browser, selector, step='retryFindClick'):
+    """
+    This function handles the StaleElementException.
+    Attempts to locate the element by its css selector and click it, again
+    while it goes stale and the retry budget allows. The browser is left
+    open whatever happens, closing it is up to the feed.
+    param browser: WebDriver object.
+    param selector: css selector used to find the element on the website page.
+    raise GameFeedError: if the element is not on the page or stays stale.
+    """
+    def click():
+        wait = WebDriverWait(browser, 10)
+        elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+        elem.click()
+    findClick(click, selector, step)
+
+def retryFindInterceptedClick(browser, selector, step='retryFindInterceptedClick'):
+    """
+    This function handles the StaleElementException.
+    Attempts to locate the element by its css selector and click it, like
+    retryFindClick(). Used for elements that are not clickable because they
+    are obscured by another element.
+    param browser: WebDriver object.
+    param selector: css selector used to find the obscured element on the 
+    website page.
+    raise GameFeedError: if the element is not on the page or stays stale.
+    """
+    def click():
+        wait = WebDriverWait(browser, 10)
+        elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+        webdriver.ActionChains(browser).move_to_element(elem).click(elem).perform()
+    findClick(click, selector, step)
+
+def findClick(click, selector, step):
+    try:
+        retry(click, retryOn=StaleElementReferenceException, step=step)
+    except TimeoutException as exc:
+        metrics.increment('tracker_timeouts_total', step=step)
+        raise GameFeedError('Could not find ' + selector) from exc
+    except StaleElementReferenceException as exc:
+        raise GameFeedError('Could not click ' + selector) from exc
+
+def isTextPresent(browser, selector) -> str:
+    """
+    This function handles the StaleElementException.
+    Attempts to locate the element by its css selector and retrieve its text,
+    again while it goes stale and the retry budget allows.
+    param browser: WebDriver object.
+    param selector: css selector used to find the obscured element on the 
+    website page.
+    return: the text content from the element selected, 'N/A' if it could not be read.
+    """
+    def read():
+        wait = WebDriverWait(browser, 10)
+        text_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+        return text_elem.get_attribute('textContent')
+    try:
+        return retry(read, retryOn=StaleElementReferenceException, step='isTextPresent')
+    except TimeoutException:
+        metrics.increment('tracker_timeouts_total', step='isTextPresent')
+    except StaleElementReferenceException:
+        pass
+    return 'N/A'
+
+def waitForPage(browser, timeout=10):
+    """
+    This function waits until the game's scoreboard is on the page, instead of
+    sleeping for a fixed time after loading it.
+    param browser: WebDriver object.
+    param timeout: the longest time to wait (seconds).
+    return: True if the scoreboard loaded, False otherwise.
+    """
+    try:
+        wait = WebDriverWait(browser, timeout)
+        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, SNAPSHOT_SELECTORS['homeRuns'])))
+        return True
+    except TimeoutException:
+        metrics.increment('tracker_timeouts_total', step='waitForPage')
+        return False
+
+def readPageTexts(browser) -> dict:
+    """
+    This function reads the text of every element a snapshot is made of with
+    a single call to the browser.
+    param browser: WebDriver object.
+    return: a dictionary of field to text, None for missing elements.
+    """
+    return browser.execute_script(SNAPSHOT_SCRIPT, SNAPSHOT_SELECTORS)
+
+def captureSnapshot(browser) -> GameSnapshot:
+    """
+    This function reads the scoreboard and the scoring plays with a single call
+    to the browser and parses every field from what it returns.
+    param browser: WebDriver object.
+    return: a GameSnapshot object.
+    """
+    return parsePageTexts(readPageTexts(browser))
+
+class SeleniumGameFeed(GameFeed):
+    """
+    Reads a game by driving Chrome through the team's page on mlb.com. Used as
+    a fallback for when the stats api can not find the game.
+    """
+    kind = 'page'
+
+    def __init__(self, pool=None):
+        """
+        param pool: the BrowserPool to lease a browser from, a new browser is
+        launched for the game if None.
+        """
+        self.pool = pool
+        self.session = None
+        self.browser = None
+        self.loaded = False
+        self.healthy = True
+        self.wornOut = False # The leased browser is due to be replaced.
+        self.team = None
+        self.startTime = None
+        self.lastDocument = None
+
+    def open(self, team, startTime) -> bool:
+        self.team = team
+        self.startTime = startTime
+        try:
+            if self.pool is not None:
+                if self.session is None: # recycle() may have leased a warm one.
+                    self.session = self.pool.acquire()
+                self.browser = self.session.browser
+                self.browser.get(teamPage[team])
+                self.pageLoaded()
+            else:
+                self.browser = launchBrowser(teamPage[team])
+        except (BrowserPoolError, WebDriverException) as exc:
+            self.healthy = False
+            raise GameFeedError('Could not launch the browser') from exc
+        browser = self.browser
+
+        # Check if the game is postponed.
+        isPPDSelector = SELECTORS['postponed']
+        try:
+            wait = WebDriverWait(browser, 10)
+            isPPD_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, isPPDSelector))) 
+            isPPD = isPPD_elem.get_attribute('textContent').strip().upper()
+        except TimeoutException:
+            isPPD = 'N/A'
+        except StaleElementReferenceException:
+            isPPD = isTextPresent(browser, isPPDSelector).strip().upper()
+        
+        if isPPD == 'PPD':
+            return False
+
+        # Selects and clicks 'Gameday' link, then the 'PLAYS' tab. If either
+        # is missing the game can not be followed from this page, close() gives
+        # the browser back.
+        retryFindClick(browser, SELECTORS['gamedayLink'], step='gamedayLink')
+        retryFindInterceptedClick(browser, SELECTORS['playsTab'], step='playsTab')
+
+        waitForPage(browser)
+        self.loaded = True
+        return True
+
+    def pageLoaded(self):
+        """
+        This function counts a page the leased browser loaded. Once it is due
+        to be replaced a warm browser is launched in the background to switch
+        to, if the pool has room for one.
+        """
+        if self.session.pageLoaded() and not self.wornOut:
+            self.wornOut = True
+            self.pool.warmSpare()
+
+    def recycle(self):
+        """
+        This function swaps a browser that loaded too many pages or uses too
+        much memory for a warm one, and opens the game again in it. The old
+        browser keeps polling while the new one launches. Only when the pool
+        is full is the old one given back first, and the game waits for the
+        browser launched in its place. If opening the game fails, the next
+        fetch() tries again.
+        raise GameFeedError: if the game could not be opened again.
+        """
+        replacement = self.pool.tryAcquire() if self.session is not None else None
+        if replacement is None and self.session is not None and self.pool.warmSpare():
+            return
+        if self.session is not None:
+            metrics.increment('tracker_browsers_recycled_total')
+            self.pool.release(self.session, healthy=False)
+        self.session = replacement
+        self.browser = None
+        self.healthy = True
+        self.wornOut = False
+        if not self.open(self.team, self.startTime):
+            raise GameFeedError('The game was postponed while its browser was replaced')
+
+    def fetch(self) -> GameSnapshot:
+        if self.wornOut:
+            self.recycle()
+        browser = self.browser
+        try:
+            if not self.loaded:
+                with metrics.timer('refresh'):
+                    browser.refresh()
+                if self.session is not None:
+                    self.pageLoaded()
+                with metrics.timer('waitForPage'):
+                    if not waitForPage(browser):
+                        raise PageNotLoaded('The game page did not load in time')
+            self.loaded = False
+            with metrics.timer('readPageTexts'):
+                self.lastDocument = readPageTexts(browser)
+            # Parsing a page without a scoreboard would read as innings ending.
+            if self.lastDocument.get('homeRuns') is None:
+                raise PageNotLoaded('The scoreboard is not on the game page')
+            with metrics.timer('parse'):
+                return parsePageTexts(self.lastDocument)
+        except WebDriverException as exc:
+            self.healthy = False
+            raise GameFeedError('Could not read the game page') from exc
+
+    def close(self):
+        if self.session is not None:
+            self.pool.release(self.session, self.healthy)
+            self.session = None
+        elif self.browser is not None:
+            try:
+                self.browser.quit()
+            except WebDriverException:
+                pass
+        self.browser = None
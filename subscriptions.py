@@ -0,0 +1,149 @@
+#! /usr/bin/env python3
+# subscriptions.py - Keeps track of who wants texts about which team.
+
+import json, sqlite3, threading
+from teamIds import canonicalTeam
+
+# What each preference gets texted about, by event type.
+PREFERENCES = {
+    'ALL': {'RunScored', 'InningEnded', 'GameFinal', 'SituationAlert'},
+    'SCORING': {'RunScored'},
+    'FINAL': {'GameFinal'},
+    'ALERTS': {'SituationAlert', 'GameFinal'},
+}
+
+class SubscriptionRegistry:
+    """
+    Maps each team to the phone numbers subscribed to it and their preference
+    (one of the keys of PREFERENCES). Teams are kept by the name used in
+    teamId, so a feed's name for a team (e.g. 'D-BACKS') finds the
+    subscribers of 'DIAMONDBACKS'. Recipients are indexed by team and
+    preference, so finding who to text about an event does not look at
+    subscribers that do not want it.
+    """
+
+    def __init__(self):
+        self.subscribers = {} # team -> preference -> set of recipients.
+        self.lock = threading.Lock()
+
+    def subscribe(self, team, recipient, preference='ALL'):
+        """
+        This function subscribes a phone number to a team, replacing the
+        preference it had for the team if it was already subscribed.
+        param team: the team, any name of it canonicalTeam() knows.
+        param recipient: the phone number to text.
+        param preference: one of the keys of PREFERENCES.
+        raise ValueError: if the preference is not known.
+        """
+        preference = preference.upper()
+        if preference not in PREFERENCES:
+            raise ValueError('Unknown preference: ' + preference)
+        team = canonicalTeam(team)
+        with self.lock:
+            preferences = self.subscribers.setdefault(team, {})
+            for recipients in preferences.values():
+                recipients.discard(recipient)
+            preferences.setdefault(preference, set()).add(recipient)
+
+    def unsubscribe(self, team, recipient):
+        """
+        This function stops texting a phone number about a team.
+        param team: the team.
+        param recipient: the phone number.
+        """
+        team = canonicalTeam(team)
+        with self.lock:
+            preferences = self.subscribers.get(team, {})
+            for recipients in preferences.values():
+                recipients.discard(recipient)
+            if not any(preferences.values()):
+                self.subscribers.pop(team, None)
+
+    def teams(self) -> list:
+        """
+        This function gets the teams that have at least one subscriber.
+        return: a sorted list of teams.
+        """
+        with self.lock:
+            return sorted(team for team, preferences in self.subscribers.items() if any(preferences.values()))
+
+    def recipientsFor(self, event, teams) -> set:
+        """
+        This function finds who should be texted about an event.
+        param event: GameEvent object.
+        param teams: the teams playing in the game, by any of their names.
+        return: a set of phone numbers, each appears once even if it is
+        subscribed to both teams.
+        """
+        eventType = type(event).__name__
+        recipients = set()
+        with self.lock:
+            for team in set(map(canonicalTeam, teams)):
+                preferences = self.subscribers.get(team)
+                if not preferences:
+                    continue
+                for preference, subscribed in preferences.items():
+                    if eventType in PREFERENCES[preference]:
+                        recipients.update(subscribed)
+        return recipients
+
+    def rows(self) -> list:
+        """
+        This function lists every subscription.
+        return: a list of (team, recipient, preference) tuples.
+        """
+        with self.lock:
+            return [(team, recipient, preference)
+                    for team, preferences in sorted(self.subscribers.items())
+                    for preference, recipients in sorted(preferences.items())
+                    for recipient in sorted(recipients)]
+
+    @classmethod
+    def load(cls, path):
+        """
+        This function loads subscriptions from a json file or a SQLite database.
+        A json file maps each team to an object of phone number to preference,
+        e.g. {"PADRES": {"+15551234567": "ALL"}}. A SQLite database has a
+        subscriptions table with team, recipient and preference columns.
+        param path: the path to a .json file, or to a SQLite database.
+        return: a SubscriptionRegistry object.
+        """
+        registry = cls()
+        if path.endswith('.json'):
+            with open(path) as subscriptionsFile:
+                for team, recipients in json.load(subscriptionsFile).items():
+                    for recipient, preference in recipients.items():
+                        registry.subscribe(team, recipient, preference)
+        else:
+            connection = sqlite3.connect(path)
+            try:
+                for team, recipient, preference in connection.execute(
+                        'SELECT team, recipient, preference FROM subscriptions'):
+                    registry.subscribe(team, recipient, preference)
+            finally:
+                connection.close()
+        return registry
+
+    def save(self, path):
+        """
+        This function saves the subscriptions in the format load() reads.
+        param path: the path to a .json file, or to a SQLite database.
+        """
+        rows = self.rows()
+        if path.endswith('.json'):
+            document = {}
+            for team, recipient, preference in rows:
+                document.setdefault(team, {})[recipient] = preference
+            with open(path, 'w') as subscriptionsFile:
+                json.dump(document, subscriptionsFile, indent=4, sort_keys=True)
+        else:
+            connection = sqlite3.connect(path)
+            try:
+                with connection:
+                    connection.execute('CREATE TABLE IF NOT EXISTS subscriptions '
+                                       '(team TEXT, recipient TEXT, preference TEXT, '
+                                       'PRIMARY KEY (team, recipient))')
+                    connection.execute('DELETE FROM subscriptions')
+                    connection.executemany('INSERT INTO subscriptions VALUES (?, ?, ?)', rows)
+            finally:
+                connection.close()
@@ -0,0 +1,58 @@
+#! /usr/bin/env python3 
+# teamIds.py holds a dictionary with the teams as keys and their team id in the 
+# MLB stats api (statsapi.mlb.com) as the values.
+teamId = {
+    'WHITE SOX': 145,
+    'INDIANS': 114,
+    'TIGERS': 116,
+    'ROYALS': 118,
+    'TWINS': 142,
+    'ORIOLES': 110,
+    'RED SOX': 111,
+    'YANKEES': 147,
+    'RAYS': 139,
+    'BLUE JAYS': 141,
+    'ASTROS': 117,
+    'ANGELS': 108,
+    'ATHLETICS': 133,
+    'MARINERS': 136,
+    'RANGERS': 140,
+    'CUBS': 112,
+    'REDS': 113,
+    'BREWERS': 158,
+    'PIRATES': 134,
+    'CARDINALS': 138,
+    'BRAVES': 144,
+    'MARLINS': 146,
+    'METS': 121,
+    'PHILLIES': 143,
+    'NATIONALS': 120,
+    'DIAMONDBACKS': 109,
+    'ROCKIES': 115,
+    'DODGERS': 119,
+    'PADRES': 135,
+    'GIANTS': 137
+}
+# Other names the feeds use for the teams: the stats api's teamName, the
+# short names on mlb.com and the abbreviations.
+teamAlias = {
+    'D-BACKS': 'DIAMONDBACKS', 'DBACKS': 'DIAMONDBACKS', 'ARI': 'DIAMONDBACKS', 'AZ': 'DIAMONDBACKS',
+    'GUARDIANS': 'INDIANS', 'CLE': 'INDIANS',
+    "A'S": 'ATHLETICS', 'OAK': 'ATHLETICS',
+    'CWS': 'WHITE SOX', 'CHW': 'WHITE SOX', 'DET': 'TIGERS', 'KC': 'ROYALS', 'MIN': 'TWINS',
+    'BAL': 'ORIOLES', 'BOS': 'RED SOX', 'NYY': 'YANKEES', 'TB': 'RAYS', 'TOR': 'BLUE JAYS',
+    'HOU': 'ASTROS', 'LAA': 'ANGELS', 'SEA': 'MARINERS', 'TEX': 'RANGERS',
+    'CHC': 'CUBS', 'CIN': 'REDS', 'MIL': 'BREWERS', 'PIT': 'PIRATES', 'STL': 'CARDINALS',
+    'ATL': 'BRAVES', 'MIA': 'MARLINS', 'NYM': 'METS', 'PHI': 'PHILLIES', 'WSH': 'NATIONALS',
+    'COL': 'ROCKIES', 'LAD': 'DODGERS', 'SD': 'PADRES', 'SF': 'GIANTS'
+}
+
+def canonicalTeam(name):
+    """
+    This function turns any name of a team into the one used as a key of teamId.
+    param name: the team as a user typed it or a feed shows it (e.g. 'D-backs').
+    return: the team (e.g. 'DIAMONDBACKS'), or the name in upper case if it
+    is not a known team.
+    """
+    name = str(name).strip().upper()
+    return teamAlias.get(name, name)
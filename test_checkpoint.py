@@ -0,0 +1,99 @@
+#! /usr/bin/env python3
+# test_checkpoint.py - Tests that a restarted tracker resumes a recorded game
+# from its checkpoints, texting again only what was never sent.
+# Usage: python3 -m unittest test_checkpoint
+
+import datetime, os, tempfile, unittest
+from baseballUpdates import trackGame
+from checkpoint import CheckpointStore
+from gameRecorder import ReplayGameFeed, readRecording
+from notifier import StubTransport
+from subscriptions import SubscriptionRegistry
+
+RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'dodgers-at-padres.jsonl.gz')
+
+class FailingTransport(StubTransport):
+    """Fails to send the texts whose message contains failOn."""
+
+    def __init__(self, failOn=None):
+        super().__init__()
+        self.failOn = failOn
+
+    def send(self, recipient, message):
+        if self.failOn is not None and self.failOn in message:
+            raise OSError('Could not send')
+        super().send(recipient, message)
+
+class SentNow:
+    """
+    Stands in for the NotificationQueue and sends each text right away, so
+    which texts fail does not depend on how the queue coalesced them.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def notifyAll(self, recipients, message, key=None, delivery=None) -> int:
+        for recipient in recipients:
+            if delivery is not None:
+                delivery.add()
+            try:
+                self.transport.send(recipient, message)
+                sent = True
+            except OSError:
+                sent = False
+            if delivery is not None:
+                delivery.done(sent)
+        return len(recipients)
+
+class RestartTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records = readRecording(RECORDING)
+        self.startTime = datetime.datetime.now().astimezone()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'checkpoints.db')
+
+    def run_tracker(self, records, checkpoints, transport) -> list:
+        registry = SubscriptionRegistry()
+        registry.subscribe('PADRES', '+1')
+        trackGame('PADRES', self.startTime, ReplayGameFeed(records), notifications=SentNow(transport),
+                  registry=registry, sleep=lambda seconds: None, checkpoints=checkpoints)
+        return [message for recipient, message in transport.sent]
+
+    def test_resumes_without_texting_again(self):
+        full = self.run_tracker(self.records, None, StubTransport())
+        middle = len(self.records) // 2
+        checkpoints = CheckpointStore(self.path)
+        first = self.run_tracker(self.records[:middle], checkpoints, StubTransport())
+        checkpoints.close()
+        checkpoints = CheckpointStore(self.path)
+        second = self.run_tracker(self.records, checkpoints, StubTransport())
+        checkpoints.close()
+        self.assertEqual(first + second, full)
+
+    def test_unsent_text_sent_after_restart(self):
+        full = self.run_tracker(self.records, None, StubTransport())
+        lost = next(message for message in full if message.startswith('End Bottom 3rd'))
+        middle = len(self.records) // 2
+        checkpoints = CheckpointStore(self.path)
+        first = self.run_tracker(self.records[:middle], checkpoints, FailingTransport('End Bottom 3rd'))
+        checkpoints.close()
+        # Later texts were sent and checkpointed, the lost one still comes after the restart.
+        self.assertGreater(len(first), full.index(lost))
+        checkpoints = CheckpointStore(self.path)
+        second = self.run_tracker(self.records, checkpoints, StubTransport())
+        checkpoints.close()
+        self.assertIn(lost, second)
+        self.assertEqual(second[-1], full[-1])
+        self.assertEqual(set(first) | set(second), set(full))
+
+    def test_finished_game_not_texted_again(self):
+        checkpoints = CheckpointStore(self.path)
+        self.run_tracker(self.records, checkpoints, StubTransport())
+        self.assertEqual(self.run_tracker(self.records, checkpoints, StubTransport()), [])
+        checkpoints.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#! /usr/bin/env python3
+# test_coordinator.py - Tests that a game's lease moves to another worker when
+# the one following it stops heartbeating.
+# Usage: python3 -m unittest test_coordinator
+
+import datetime, os, tempfile, time, unittest
+from coordinator import Coordinator, LeasedGameFeed, preferredWorker
+from gameFeed import GameFeedEnded
+from gameRecorder import ReplayGameFeed, readRecording
+
+RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'dodgers-at-padres.jsonl.gz')
+GAME_ID = 'DODGERS@PADRES-20200803T0110Z'
+
+class LeaseTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.now = 1000.0
+        path = os.path.join(directory.name, 'leases.db')
+        workers = [Coordinator(path, workerId, ttl=30, clock=lambda: self.now) for workerId in ('a', 'b')]
+        for worker in workers:
+            worker.heartbeat()
+        # The game belongs to one of the workers, whichever it hashes to.
+        owner = preferredWorker(GAME_ID, ['a', 'b'])
+        self.owner, self.other = sorted(workers, key=lambda worker: worker.workerId != owner)
+
+    def test_only_the_owner_takes_a_new_game(self):
+        self.assertFalse(self.other.claim(GAME_ID))
+        self.assertTrue(self.owner.claim(GAME_ID))
+        self.assertTrue(self.owner.holds(GAME_ID))
+
+    def test_game_taken_over_when_the_owner_stops(self):
+        self.assertTrue(self.owner.claim(GAME_ID))
+        feed = LeasedGameFeed(ReplayGameFeed(readRecording(RECORDING)), self.owner, GAME_ID)
+        feed.open('PADRES', datetime.datetime.now().astimezone())
+        feed.fetch()
+
+        self.now += 15
+        self.other.heartbeat()
+        self.assertFalse(self.other.claim(GAME_ID)) # The lease has not expired yet.
+        self.now += 20
+        self.other.heartbeat()
+        self.assertTrue(self.other.claim(GAME_ID))
+
+        # The owner finds out on its next heartbeat and stops reading the game.
+        self.owner.heartbeat()
+        self.assertFalse(self.owner.holds(GAME_ID))
+        with self.assertRaises(GameFeedEnded):
+            feed.fetch()
+
+    def test_lease_given_up_when_heartbeats_stall(self):
+        self.assertTrue(self.owner.claim(GAME_ID))
+        self.owner.lastBeat = time.monotonic() - self.owner.ttl
+        self.assertFalse(self.owner.holds(GAME_ID))
+
+    def test_finished_game_not_taken_over(self):
+        self.assertTrue(self.owner.claim(GAME_ID))
+        self.owner.finish(GAME_ID)
+        self.now += 60
+        self.other.heartbeat()
+        self.assertTrue(self.other.isDone(GAME_ID))
+        self.assertFalse(self.other.claim(GAME_ID, anyWorker=True))
+
+if __name__ == '__main__':
+    unittest.main()
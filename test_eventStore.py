@@ -0,0 +1,34 @@
+#! /usr/bin/env python3
+# test_eventStore.py - Tests that the event store is queried by any name of a team.
+# Usage: python3 -m unittest test_eventStore
+
+import datetime, tempfile, unittest
+from eventStore import EventStore
+from gameEvents import RunScored
+from gameSnapshot import GameSnapshot
+
+class QueryTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = EventStore(directory.name, flushInterval=None)
+        self.addCleanup(self.store.close)
+        self.startTime = datetime.datetime.now().astimezone()
+
+    def append(self, homeTeam, awayTeam):
+        snapshot = GameSnapshot(homeTeam, awayTeam, 1, 0, 'Bottom 1st', False, 'LIVE', [(1, 'BOTTOM 1', 'Homer')])
+        self.store.append(homeTeam + '-' + awayTeam, self.startTime, [RunScored(1, snapshot, 1, 'BOTTOM 1', 'Homer')])
+        self.store.flush()
+
+    def test_feed_alias_found_by_team(self):
+        # The feed calls Arizona 'D-BACKS' and Cleveland 'GUARDIANS'.
+        self.append('D-BACKS', 'GUARDIANS')
+        for team in ('DIAMONDBACKS', 'd-backs', 'ARI', 'INDIANS', 'Guardians'):
+            rows = self.store.query(teams=[team])
+            self.assertEqual(len(rows), 1, team)
+        self.assertEqual((rows[0]['homeTeam'], rows[0]['awayTeam']), ('DIAMONDBACKS', 'INDIANS'))
+        self.assertEqual(self.store.query(teams=['PADRES']), [])
+
+if __name__ == '__main__':
+    unittest.main()
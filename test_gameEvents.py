@@ -0,0 +1,80 @@
+#! /usr/bin/env python3
+# test_gameEvents.py - Tests the events EventDiffer finds in sequences of snapshots.
+# Usage: python3 -m unittest test_gameEvents
+
+import unittest
+from gameEvents import EventDiffer, replay, isGameOver
+from gameSnapshot import GameSnapshot
+
+def snapshot(homeRuns, awayRuns, inning, inningOver=False, status='LIVE', plays=()):
+    return GameSnapshot('PADRES', 'DODGERS', homeRuns, awayRuns, inning, inningOver, status, plays)
+
+def kinds(events) -> list:
+    return [type(event).__name__ for event in events]
+
+class EventDifferTest(unittest.TestCase):
+
+    def test_each_run_found_once(self):
+        first = (1, 'BOTTOM 1', 'Homer')
+        second = (2, 'BOTTOM 2', 'Single')
+        differ = EventDiffer()
+        events = differ.diff(snapshot(1, 0, 'Bottom 1st', plays=[first]))
+        self.assertEqual(kinds(events), ['RunScored', 'LeadChange'])
+        self.assertEqual(differ.diff(snapshot(1, 0, 'Top 2nd', plays=[first])), [])
+        events = differ.diff(snapshot(2, 0, 'Bottom 2nd', plays=[first, second]))
+        self.assertEqual(kinds(events), ['RunScored'])
+        self.assertEqual(events[0].playId, 2)
+        self.assertEqual(events[0].sequence, 3)
+
+    def test_go_ahead_after_tie_is_a_lead_change(self):
+        differ = EventDiffer()
+        events = [event for state in (snapshot(1, 0, 'Bottom 1st'), snapshot(1, 1, 'Top 3rd'),
+                                      snapshot(2, 1, 'Bottom 8th'))
+                  for event in differ.diff(state)]
+        self.assertEqual([(event.leader, event.snapshot.inning) for event in events],
+                         [('HOME', 'Bottom 1st'), ('HOME', 'Bottom 8th')])
+
+    def test_unknown_score_keeps_the_lead(self):
+        differ = EventDiffer()
+        differ.diff(snapshot(1, 0, 'Bottom 1st'))
+        differ.diff(snapshot(None, None, 'Top 2nd'))
+        self.assertEqual(differ.diff(snapshot(1, 0, 'Bottom 2nd')), [])
+
+    def test_inning_ended_once(self):
+        differ = EventDiffer()
+        events = differ.diff(snapshot(0, 0, 'End 3rd', inningOver=True))
+        self.assertEqual(kinds(events), ['InningEnded'])
+        self.assertEqual(events[0].inning, 'End 3rd')
+        # Read again with the outs filled in, the inning has already ended.
+        again = GameSnapshot('PADRES', 'DODGERS', 0, 0, 'End 3rd', True, 'LIVE', (), outs=3)
+        self.assertEqual(differ.diff(again), [])
+
+    def test_game_over_from_the_score(self):
+        differ = EventDiffer()
+        differ.diff(snapshot(3, 2, 'Top 9th'))
+        events = differ.diff(snapshot(3, 2, 'Middle 9th', inningOver=True))
+        self.assertEqual(kinds(events), ['GameFinal'])
+        self.assertTrue(differ.final)
+        self.assertEqual(differ.diff(snapshot(3, 2, 'Final', status='FINAL')), [])
+
+    def test_game_over_from_the_status(self):
+        events = list(replay([snapshot(4, 5, 'Bottom 9th'), snapshot(4, 5, 'Final', status='FINAL')]))
+        self.assertEqual(kinds(events), ['LeadChange', 'GameFinal'])
+
+    def test_postponed(self):
+        differ = EventDiffer()
+        self.assertEqual(kinds(differ.diff(snapshot(None, None, 'N/A', status='POSTPONED'))), ['Postponed'])
+        self.assertEqual(differ.diff(snapshot(0, 0, 'Top 1st')), [])
+
+class IsGameOverTest(unittest.TestCase):
+
+    def test_innings(self):
+        self.assertFalse(isGameOver('End 8th', 5, 1))
+        self.assertTrue(isGameOver('Middle 9th', 2, 1))
+        self.assertFalse(isGameOver('Middle 9th', 1, 2))
+        self.assertFalse(isGameOver('End 9th', 2, 2))
+        self.assertTrue(isGameOver('End 11th', 2, 3))
+        self.assertTrue(isGameOver('Game Over', None, None))
+
+if __name__ == '__main__':
+    unittest.main()
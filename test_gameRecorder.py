@@ -0,0 +1,61 @@
+#! /usr/bin/env python3
+# test_gameRecorder.py - Tests that a recorded game replays to the same events.
+# Usage: python3 -m unittest test_gameRecorder
+
+import datetime, glob, os, tempfile, unittest
+from gameEvents import replay
+from gameFeed import GameFeedEnded
+from gameRecorder import PARSERS, RecordingGameFeed, ReplayGameFeed, readRecording
+
+RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'dodgers-at-padres.jsonl.gz')
+
+def snapshots(records) -> list:
+    return [PARSERS[kind](document) for seconds, kind, document in records]
+
+def kinds(events) -> list:
+    return [type(event).__name__ for event in events]
+
+class ReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records = readRecording(RECORDING)
+
+    def test_every_scoring_play_found_once(self):
+        states = snapshots(self.records)
+        events = list(replay(states))
+        playIds = [event.playId for event in events if type(event).__name__ == 'RunScored']
+        self.assertEqual(playIds, [play[0] for play in states[-1].plays])
+        self.assertEqual([event.sequence for event in events], list(range(1, len(events) + 1)))
+
+    def test_innings_end_once_and_the_game_ends_last(self):
+        events = list(replay(snapshots(self.records)))
+        innings = [event.inning for event in events if type(event).__name__ == 'InningEnded']
+        self.assertEqual(len(innings), len(set(innings)))
+        self.assertEqual(kinds(events).count('GameFinal'), 1)
+        self.assertEqual(kinds(events)[-1], 'GameFinal')
+
+    def test_lead_goes_to_the_winner(self):
+        leaders = [event.leader for event in replay(snapshots(self.records))
+                   if type(event).__name__ == 'LeadChange']
+        self.assertEqual(leaders, ['HOME']) # The Padres took the lead once and won 8-3.
+
+    def test_recording_replays_the_same(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        feed = RecordingGameFeed(ReplayGameFeed(self.records), directory.name)
+        feed.open('PADRES', datetime.datetime.now().astimezone())
+        read = []
+        try:
+            while True:
+                read.append(feed.fetch())
+        except GameFeedEnded:
+            pass
+        finally:
+            feed.close()
+        recorded = readRecording(glob.glob(os.path.join(directory.name, '*.jsonl.gz'))[0])
+        self.assertEqual([(kind, document) for seconds, kind, document in recorded],
+                         [(kind, document) for seconds, kind, document in self.records])
+        self.assertEqual(snapshots(recorded), read)
+
+if __name__ == '__main__':
+    unittest.main()
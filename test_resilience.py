@@ -0,0 +1,96 @@
+#! /usr/bin/env python3
+# test_resilience.py - Tests that a failing game's breaker opens, its feed is
+# reopened in the background and polling picks up again right after.
+# Usage: python3 -m unittest test_resilience
+
+import os, time, unittest
+from gameFeed import GameFeedError
+from gameRecorder import ReplayGameFeed, readRecording
+from pollScheduler import PollScheduler
+from resilience import CircuitBreaker, CircuitOpen, ResilientGameFeed, RECOVERY_CHECK
+
+RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'dodgers-at-padres.jsonl.gz')
+
+class BrokenReplay(ReplayGameFeed):
+    """A replay that fails every poll after the first few."""
+
+    def __init__(self, records, polls):
+        super().__init__(records)
+        self.polls = polls
+        self.closed = False
+
+    def fetch(self):
+        if self.position >= self.polls:
+            raise GameFeedError('Read timed out')
+        return super().fetch()
+
+    def close(self):
+        self.closed = True
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def test_opens_and_lets_one_poll_through(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failures=2, cooldown=60, clock=lambda: now[0])
+        self.assertFalse(breaker.failed())
+        self.assertTrue(breaker.failed())
+        self.assertFalse(breaker.allow())
+        now[0] = 45
+        self.assertEqual(breaker.remaining(), 15)
+        now[0] = 60
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow()) # Only one poll while half open.
+        self.assertTrue(breaker.failed())
+        self.assertEqual(breaker.remaining(), 60)
+
+class RecoveryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records = readRecording(RECORDING)
+
+    def waitForRecovery(self, feed):
+        deadline = time.monotonic() + 5
+        while feed.recovering and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(feed.recovering)
+
+    def test_reopened_feed_polled_right_after(self):
+        feeds = [BrokenReplay(self.records, polls=3), ReplayGameFeed(self.records)]
+        feed = ResilientGameFeed(lambda: feeds.pop(0), CircuitBreaker(failures=2, cooldown=60))
+        broken = feed.feed
+        feed.open('PADRES', None)
+        scheduler = PollScheduler()
+        for poll in range(3):
+            scheduler.succeeded(feed.fetch())
+        with self.assertRaises(GameFeedError):
+            feed.fetch()
+        with self.assertRaises(CircuitOpen) as opened:
+            feed.fetch()
+        # Waits for the recovery, not for a backoff grown over the failures.
+        self.assertEqual(scheduler.failed(opened.exception.retryAfter), RECOVERY_CHECK)
+        self.waitForRecovery(feed)
+        self.assertTrue(broken.closed)
+        self.assertEqual(feed.fetch(), ReplayGameFeed(self.records).fetch())
+        feed.close()
+
+    def test_failed_recovery_tried_again(self):
+        def makeFeed():
+            makeFeed.calls += 1
+            if makeFeed.calls == 2:
+                raise RuntimeError('No browser')
+            return BrokenReplay(self.records, polls=0)
+        makeFeed.calls = 0
+        feed = ResilientGameFeed(makeFeed, CircuitBreaker(failures=1, cooldown=0))
+        feed.open('PADRES', None)
+        with self.assertRaises(CircuitOpen):
+            feed.fetch()
+        self.waitForRecovery(feed)
+        self.assertTrue(feed.broken)
+        with self.assertRaises(CircuitOpen): # Starts the next recovery.
+            feed.fetch()
+        self.waitForRecovery(feed)
+        self.assertEqual(makeFeed.calls, 3)
+        feed.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+#! /usr/bin/env python3
+# test_subscriptions.py - Tests that subscribers are found by any name of their team.
+# Usage: python3 -m unittest test_subscriptions
+
+import unittest
+from gameEvents import RunScored
+from gameSnapshot import GameSnapshot
+from subscriptions import SubscriptionRegistry
+
+def runScored(homeTeam, awayTeam):
+    snapshot = GameSnapshot(homeTeam, awayTeam, 1, 0, 'Bottom 1st', False, 'LIVE', [(1, 'BOTTOM 1', 'Homer')])
+    return RunScored(1, snapshot, 1, 'BOTTOM 1', 'Homer')
+
+class RecipientsForTest(unittest.TestCase):
+
+    def test_opponent_found_by_feed_alias(self):
+        registry = SubscriptionRegistry()
+        registry.subscribe('PADRES', '+1')
+        registry.subscribe('diamondbacks', '+2')
+        # The game is followed for the Padres, the feed calls Arizona 'D-BACKS'.
+        recipients = registry.recipientsFor(runScored('PADRES', 'D-BACKS'), ('PADRES', 'PADRES', 'D-BACKS'))
+        self.assertEqual(recipients, {'+1', '+2'})
+
+    def test_subscribed_by_alias(self):
+        registry = SubscriptionRegistry()
+        registry.subscribe('D-backs', '+2', 'SCORING')
+        self.assertEqual(registry.teams(), ['DIAMONDBACKS'])
+        recipients = registry.recipientsFor(runScored('DIAMONDBACKS', 'GIANTS'), ('DIAMONDBACKS', 'GIANTS'))
+        self.assertEqual(recipients, {'+2'})
+        registry.unsubscribe('ARI', '+2')
+        self.assertEqual(registry.teams(), [])
+
+if __name__ == '__main__':
+    unittest.main()
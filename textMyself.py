@@ -8,8 +8,31 @@ authToken = ''
 myNumber = ''
 twilioNumber = ''
 
-from twilio.rest import Client
+import threading
+
+client = None
+clientLock = threading.Lock()
+
+def getClient():
+    """
+    This function makes the Twilio client the first time it is needed and
+    returns the same one after that, so its HTTP connection is reused.
+    return: a twilio.rest.Client object.
+    """
+    global client
+    with clientLock:
+        if client is None:
+            from twilio.rest import Client # Only loaded once a text is sent.
+            client = Client(accountSID, authToken)
+        return client
+
+class TwilioTransport:
+    """
+    Sends texts with Twilio, used by notifier.NotificationQueue.
+    """
+
+    def send(self, recipient, message):
+        getClient().messages.create(body = message, from_ = twilioNumber, to = recipient)
 
 def textmyself(message):
-    client = Client(accountSID, authToken)
-    client.messages.create(body = message, from_ = twilioNumber, to = myNumber)
\ No newline at end of file
+    getClient().messages.create(body = message, from_ = twilioNumber, to = myNumber)
\ No newline at end of file
@@ -0,0 +1,299 @@
+#! /usr/bin/env python3
+# winProbability.py - The chance the home team wins from the score, inning,
+# outs and runners, and the situations worth a text, for every live game at once.
+
+import json, threading
+import numpy as np
+from pageSelectors import NUMBER
+from gameEvents import SituationAlert
+
+# Runs scored in the rest of the half inning on average (RE24), by runners
+# (one row per value of GameSnapshot.bases) and outs, from recent MLB seasons.
+RUN_EXPECTANCY = (
+    (0.481, 0.254, 0.098), # Bases empty.
+    (0.859, 0.509, 0.224), # First.
+    (1.100, 0.664, 0.319), # Second.
+    (1.437, 0.884, 0.429), # First and second.
+    (1.350, 0.950, 0.353), # Third.
+    (1.784, 1.130, 0.478), # First and third.
+    (1.964, 1.376, 0.580), # Second and third.
+    (2.292, 1.541, 0.752), # Bases loaded.
+)
+# Chance of scoring at least one run in the rest of the half inning, same layout.
+SCORING_CHANCE = (
+    (0.268, 0.155, 0.067),
+    (0.416, 0.265, 0.127),
+    (0.614, 0.397, 0.216),
+    (0.610, 0.406, 0.222),
+    (0.843, 0.660, 0.268),
+    (0.860, 0.634, 0.270),
+    (0.841, 0.683, 0.259),
+    (0.860, 0.658, 0.318),
+)
+
+MAX_RUNS = 12 # Runs in a half inning the table goes up to, more are counted as this many.
+MAX_LEAD = 15 # Leads bigger than this are looked up as this.
+EXTRA_INNING = 10 # Every extra inning is looked up as the 10th.
+EXTRA_INNINGS_RUNNER = 2 # Bases extra half innings start with, a runner on second since 2020.
+
+LEADS = np.arange(-MAX_LEAD, MAX_LEAD + 1) # Home runs minus away runs, the last axis of WIN_TABLE.
+RUNS = np.arange(MAX_RUNS + 1)
+
+def runsDistribution(bases, outs):
+    """
+    This function estimates the chance of each number of runs scoring in the
+    rest of a half inning: no runs with 1 - SCORING_CHANCE, and a geometric
+    number of runs otherwise, with the mean that gives RUN_EXPECTANCY.
+    param bases: the runners, as in GameSnapshot.bases.
+    param outs: the outs.
+    return: an array of MAX_RUNS + 1 chances, the last one for MAX_RUNS or more.
+    """
+    chance = SCORING_CHANCE[bases][outs]
+    more = 1 - chance / RUN_EXPECTANCY[bases][outs] # Chance of another run once one scored.
+    distribution = chance * (1 - more) * more ** (RUNS - 1.0)
+    distribution[0] = 1 - chance
+    distribution[-1] = chance * more ** (MAX_RUNS - 1)
+    return distribution
+
+def afterRuns(leads, sign):
+    # Indexes into LEADS of each lead after 0..MAX_RUNS runs for (1) or against (-1) the home team.
+    return np.clip(leads[:, None] + sign * RUNS[None, :], -MAX_LEAD, MAX_LEAD) + MAX_LEAD
+
+def buildTable():
+    """
+    This function works out the chance the home team wins from every
+    situation, from the last inning back to the first.
+    return: an array indexed by [inning - 1, half (0 top, 1 bottom), bases,
+    outs, lead + MAX_LEAD], the 10th inning standing for every extra inning.
+    """
+    runs = np.array([[runsDistribution(bases, outs) for outs in range(3)] for bases in range(8)])
+    ghost = runs[EXTRA_INNINGS_RUNNER, 0]
+    down = afterRuns(LEADS, -1) # The away team scores.
+    up = afterRuns(LEADS, 1) # The home team scores.
+    tie = MAX_LEAD
+
+    # Extra innings repeat until a half inning ends untied, so the chance of
+    # winning a tied extra inning, x, solves x = a + b * x.
+    def bottomExtra(tied):
+        # Chance from the start of an extra bottom half by lead, if a tie after it is worth tied.
+        after = np.where(LEADS > 0, 1.0, np.where(LEADS < 0, 0.0, tied))
+        return np.where(LEADS > 0, 1.0, (ghost * after[up]).sum(axis=1))
+    a = (ghost * bottomExtra(0.0)[down[tie]]).sum()
+    b = (ghost * (bottomExtra(1.0) - bottomExtra(0.0))[down[tie]]).sum()
+    tiedExtra = a / (1 - b)
+
+    table = np.zeros((EXTRA_INNING, 2, 8, 3, len(LEADS)))
+    startTop = None # Chance from the start of the next inning by lead.
+    for inning in range(EXTRA_INNING, 0, -1):
+        if inning >= 9:
+            # The game ends as soon as the home team leads, or tied it goes on.
+            endBottom = np.where(LEADS > 0, 1.0, np.where(LEADS < 0, 0.0, tiedExtra))
+        else:
+            endBottom = startTop
+        for bases in range(8):
+            for outs in range(3):
+                table[inning - 1, 1, bases, outs] = (runs[bases, outs] * endBottom[up]).sum(axis=1)
+        firstBases = EXTRA_INNINGS_RUNNER if inning >= EXTRA_INNING else 0
+        startBottom = table[inning - 1, 1, firstBases, 0]
+        if inning >= 9:
+            startBottom = np.where(LEADS > 0, 1.0, startBottom) # Ahead after the top, the home team does not bat.
+        for bases in range(8):
+            for outs in range(3):
+                table[inning - 1, 0, bases, outs] = (runs[bases, outs] * startBottom[down]).sum(axis=1)
+        startTop = table[inning - 1, 0, firstBases, 0]
+    return table
+
+WIN_TABLE = buildTable()
+
+def winProbabilities(innings, halves, bases, outs, leads):
+    """
+    This function looks up the chance the home team wins for many games at once.
+    param innings: the innings, from 1.
+    param halves: 0 for the top of the inning, 1 for the bottom.
+    param bases: the runners, as in GameSnapshot.bases.
+    param outs: the outs, 0 to 2.
+    param leads: home runs minus away runs.
+    return: an array of chances between 0 and 1.
+    """
+    innings = np.clip(innings, 1, EXTRA_INNING) - 1
+    leads = np.clip(leads, -MAX_LEAD, MAX_LEAD) + MAX_LEAD
+    return WIN_TABLE[innings, halves, bases, np.clip(outs, 0, 2), leads]
+
+def gameState(snapshot):
+    """
+    This function finds where a game is at, the next half inning if one just ended.
+    param snapshot: GameSnapshot object.
+    return: (inning, half, bases, outs, lead), None if the game is not live
+    or its score or inning is not known.
+    """
+    if snapshot.status != 'LIVE' or snapshot.homeRuns is None or snapshot.awayRuns is None:
+        return None
+    inningMatch = NUMBER.search(snapshot.inning)
+    if not inningMatch:
+        return None
+    inning = int(inningMatch.group())
+    half = 1 if snapshot.inning.upper().startswith(('BOT', 'END')) else 0
+    bases, outs = snapshot.bases or 0, snapshot.outs or 0
+    if snapshot.inningOver:
+        inning, half = (inning + 1, 0) if half else (inning, 1)
+        bases = EXTRA_INNINGS_RUNNER if inning >= EXTRA_INNING else 0
+        outs = 0
+    return inning, half, bases, outs, snapshot.homeRuns - snapshot.awayRuns
+
+# The conditions an alert can have, and the value that lets every game through.
+CONDITIONS = {
+    'minInning': 0,
+    'maxInning': 99,
+    'minLead': 0, # The lead of whichever team is ahead.
+    'maxLead': 99,
+    'bases': -1, # Exactly these runners, as in GameSnapshot.bases.
+    'minOuts': 0,
+    'maxOuts': 2,
+    'noHitterThrough': 0, # A team has no hits after this many innings.
+    'minWinProbability': 0.0, # Of the home team.
+    'maxWinProbability': 1.0,
+}
+REPEATS = ('game', 'inning', 'halfInning') # How often an alert can be texted in a game.
+
+DEFAULT_ALERTS = {
+    'CLOSE_LATE': {'message': 'Close game in the {inning}', 'minInning': 8, 'maxLead': 1},
+    'NO_HITTER': {'message': '{pitching} have a no-hitter through {completed}',
+                  'noHitterThrough': 6, 'repeat': 'inning'},
+    'BASES_LOADED_TIE': {'message': 'Bases loaded in a tie game, {inning}', 'bases': 7, 'maxLead': 0,
+                         'repeat': 'halfInning'},
+}
+
+def loadAlerts(path=None) -> dict:
+    """
+    This function reads alerts from a json file shaped like DEFAULT_ALERTS.
+    param path: the file, DEFAULT_ALERTS if None.
+    return: a dictionary of alert name to its conditions.
+    """
+    if path is None:
+        return DEFAULT_ALERTS
+    with open(path) as alertsFile:
+        return json.load(alertsFile)
+
+class AlertEngine:
+    """
+    Keeps the state of every live game in arrays, one row per game, and checks
+    every alert against a game in one vectorized pass each time it is read,
+    evaluate() takes any number of games at once. An alert is only found once per game, or per inning or half inning,
+    as its repeat says. Safe to use from several threads.
+    """
+
+    def __init__(self, alerts=DEFAULT_ALERTS, capacity=16):
+        """
+        param alerts: a dictionary of alert name to its conditions, a message
+        and how often it repeats, see DEFAULT_ALERTS.
+        param capacity: the number of games there is room for, grows as needed.
+        raise ValueError: if an alert has a condition or repeat that is not known.
+        """
+        self.names = list(alerts)
+        self.messages = []
+        self.repeats = []
+        rules = {condition: [] for condition in CONDITIONS}
+        for name in self.names:
+            alert = dict(alerts[name])
+            self.messages.append(alert.pop('message', name))
+            repeat = alert.pop('repeat', 'game')
+            if repeat not in REPEATS:
+                raise ValueError('Unknown repeat for alert ' + name + ': ' + repeat)
+            self.repeats.append(repeat)
+            for condition in alert:
+                if condition not in CONDITIONS:
+                    raise ValueError('Unknown condition for alert ' + name + ': ' + condition)
+            for condition, anything in CONDITIONS.items():
+                rules[condition].append(alert.get(condition, anything))
+        # One column per alert, so they broadcast against one row per game.
+        self.rules = {condition: np.array(values)[:, None] for condition, values in rules.items()}
+
+        self.rows = {} # Key of each game -> its row.
+        self.free = list(range(capacity - 1, -1, -1))
+        self.live = np.zeros(capacity, dtype=bool)
+        self.games = np.zeros((7, capacity), dtype=np.int16) # The columns below, one row per game.
+        self.lock = threading.Lock()
+
+    # Rows of self.games.
+    INNING, HALF, BASES, OUTS, LEAD, COMPLETED, FEWEST_HITS = range(7)
+
+    def grow(self):
+        capacity = len(self.live)
+        self.live = np.concatenate([self.live, np.zeros(capacity, dtype=bool)])
+        self.games = np.concatenate([self.games, np.zeros_like(self.games)], axis=1)
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def evaluate(self, rows=slice(None)):
+        """
+        This function checks every alert against some of the games.
+        param rows: the rows of the games, e.g. a list, every game by default.
+        return: (matches, chances), matches has a row per alert and a column
+        per game, chances is the win probability of the home team in each game.
+        Must be called holding self.lock.
+        """
+        games, rules = self.games[:, rows], self.rules
+        inning, bases, outs, completed = games[self.INNING], games[self.BASES], games[self.OUTS], games[self.COMPLETED]
+        chances = winProbabilities(inning, games[self.HALF], bases, outs, games[self.LEAD])
+        lead = np.abs(games[self.LEAD])
+        noHitter = rules['noHitterThrough']
+        matches = (self.live[rows] & (inning >= rules['minInning']) & (inning <= rules['maxInning']) &
+                   (lead >= rules['minLead']) & (lead <= rules['maxLead']) &
+                   ((bases == rules['bases']) | (rules['bases'] < 0)) &
+                   (outs >= rules['minOuts']) & (outs <= rules['maxOuts']) &
+                   ((noHitter == 0) | ((completed >= noHitter) & (games[self.FEWEST_HITS] == 0))) &
+                   (chances >= rules['minWinProbability']) & (chances <= rules['maxWinProbability']))
+        return matches, chances
+
+    def check(self, key, snapshot, differ) -> list:
+        """
+        This function updates a game and finds the alerts it newly matches.
+        param key: the id of the game, see schedule.makeGameId().
+        param snapshot: the GameSnapshot just read.
+        param differ: the EventDiffer of the game, numbers the alerts and
+        remembers the ones already found.
+        return: a list of SituationAlert events.
+        """
+        state = gameState(snapshot)
+        with self.lock:
+            if state is None:
+                self.forget(key)
+                return []
+            row = self.rows.get(key)
+            if row is None:
+                if not self.free:
+                    self.grow()
+                row = self.rows[key] = self.free.pop()
+            inning, half, bases, outs, lead = state
+            hits = [count for count in (snapshot.homeHits, snapshot.awayHits) if count is not None]
+            self.games[:, row] = (inning, half, bases, outs, lead,
+                                  inning - 1, # Innings both teams finished batting.
+                                  min(hits) if len(hits) == 2 else 99)
+            self.live[row] = True
+            # Only this game's column, the others did not change.
+            matches, chances = self.evaluate([row])
+            matched = matches[:, 0].nonzero()[0]
+            chance = float(chances[0])
+
+        alerts = []
+        for index in matched:
+            name = self.names[index]
+            repeat = self.repeats[index]
+            alertKey = 0 if repeat == 'game' else (inning if repeat == 'inning' else inning * 2 + half)
+            if (name, alertKey) in differ.firedAlerts:
+                continue
+            differ.firedAlerts.add((name, alertKey))
+            pitching = snapshot.homeTeam if snapshot.awayHits == 0 else snapshot.awayTeam
+            message = self.messages[index].format(inning=snapshot.inning, completed=inning - 1, pitching=pitching,
+                                                  homeTeam=snapshot.homeTeam, awayTeam=snapshot.awayTeam)
+            alerts.append(SituationAlert(differ.nextSequence(), snapshot, name, alertKey, message, chance))
+        return alerts
+
+    def forget(self, key):
+        """
+        This function frees the row of a game that is over.
+        Must be called holding self.lock.
+        """
+        row = self.rows.pop(key, None)
+        if row is not None:
+            self.live[row] = False
+            self.free.append(row)